@@ -0,0 +1,145 @@
+"""
+Local stand-in for datatracker, serving the /doc/{id}/bibtex/ and /doc/{id}/{version}/bibtex/
+endpoints with generated entries. The latency, error rate, share of drafts which have become RFCs
+and size of the responses are configurable, so that runs are reproducible and need no network.
+"""
+import random
+import re
+import socket
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+RFC_FMT = ('@misc{{rfc{number},\n\tseries =\t{{Request for Comments}},\n\tnumber =\t{number},\n'
+           '\thowpublished =\t{{RFC {number}}},\n\tpublisher =\t{{RFC Editor}},\n\tdoi =\t\t{{10.17487/RFC{number}}},\n'
+           '\turl =\t\t{{https://rfc-editor.org/rfc/rfc{number}.txt}},\n\tauthor =\t{{Jane Doe and John Doe}},\n'
+           '\ttitle =\t\t{{{{Specification Number {number}}}}},\n\tpagetotal =\t42,\n\tyear =\t\t2018,\n\tmonth =\t\taug,\n'
+           '\tabstract =\t{{{abstract}}},\n}}\n')
+DRAFT_FMT = ('{prefix}@techreport{{I-D.{short_name},\n\tnumber =\t{{{name}-{version}}},\n\ttype =\t\t{{Internet-Draft}},\n'
+             '\tinstitution =\t{{Internet Engineering Task Force}},\n\tpublisher =\t{{Internet Engineering Task Force}},\n'
+             '\tnote =\t\t{{Work in Progress}},\n\turl =\t\t{{https://datatracker.ietf.org/doc/html/{name}-{version}}},\n'
+             '\tauthor =\t{{Jane Doe}},\n\ttitle =\t\t{{{{Draft {name}}}}},\n\tpagetotal =\t12,\n\tyear =\t\t2019,\n'
+             '\tmonth =\t\tmar,\n\tday =\t\t1,\n\tabstract =\t{{{abstract}}},\n}}\n')
+UPDATED_PREFIX_FMT = '%% You should probably cite rfc{number} instead of this I-D.\n\n'
+LATEST_DRAFT_VERSION = '05'
+
+
+class FakeDatatracker(object):
+    """
+    Serves generated BibTex entries on 127.0.0.1, on a free port unless one is given. Whether an
+    id fails or has been updated to an RFC is derived from a hash of the id, so it is the same
+    across runs and processes.
+    """
+    PATH_RE = re.compile(r'^/doc/(?P<name>[^/]+)/(?:(?P<version>\d+)/)?bibtex/$')
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    @property
+    def requests_served(self):
+        return self._requests_served
+
+    def __init__(self, latency=0.0, error_rate=0.0, transient_error_rate=0.0, updated_rate=0.0, response_size=800, port=0):
+        """
+        latency: seconds to wait before answering each request
+        error_rate: share of the ids answered with a 404
+        transient_error_rate: share of the ids whose first request is answered with a 503
+        updated_rate: share of the drafts answered with a "You should probably cite rfcXXXX" comment
+        response_size: approximate size, in bytes, of each entry
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.transient_error_rate = transient_error_rate
+        self.updated_rate = updated_rate
+        self.response_size = response_size
+
+        self._requests_served = 0
+        self._failed_once = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @staticmethod
+    def _chance(name, salt):
+        """Deterministic number in [0, 1) for the given id"""
+        return zlib.crc32('{}:{}'.format(salt, name).encode()) / 2 ** 32
+
+    def _abstract(self, name):
+        words = random.Random(name).choices(['transport', 'security', 'layer', 'protocol', 'message', 'version'], k=self.response_size // 8)
+        return ' '.join(words)
+
+    def respond(self, path):
+        """Return (status, body) for the requested path"""
+        with self._lock:
+            self._requests_served += 1
+
+        match = self.PATH_RE.match(path)
+        if not match:
+            return 404, 'Not Found'
+        name, version = match.group('name'), match.group('version')
+        full_id = name if version is None else '{}-{}'.format(name, version)
+
+        if self._chance(full_id, 'error') < self.error_rate:
+            return 404, '<html><title>404 Not Found</title></html>'
+        if self._chance(full_id, 'transient') < self.transient_error_rate:
+            with self._lock:
+                first_request = full_id not in self._failed_once
+                self._failed_once.add(full_id)
+            if first_request:
+                return 503, 'Service Unavailable'
+
+        abstract = self._abstract(full_id)
+        if name.lower().startswith('rfc'):
+            return 200, RFC_FMT.format(number=name[3:], abstract=abstract)
+
+        prefix = ''
+        if self._chance(full_id, 'updated') < self.updated_rate:
+            prefix = UPDATED_PREFIX_FMT.format(number=zlib.crc32(full_id.encode()) % 9000 + 1)
+        return 200, DRAFT_FMT.format(prefix=prefix, name=name, short_name=name[len('draft-'):],
+                                     version=version or LATEST_DRAFT_VERSION, abstract=abstract)
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # the headers and the body are written separately, avoid waiting for delayed ACKs in between
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status, body = fake.respond(self.path)
+                body = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
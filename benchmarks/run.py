@@ -0,0 +1,167 @@
+"""
+End-to-end benchmark of RFCBibtex.generate_bibtex against the local FakeDatatracker.
+
+For each number of ids, a fresh process generates the BibTex of that many ids (a mix of RFCs,
+versioned and unversioned drafts) into a temporary file, and reports its wall time, the number of
+requests per second, its peak RSS and the mean time spent post-processing each entry. The results
+are printed (or written to --output) as JSON, and can be compared against the results of a previous
+version with --baseline:
+
+    python -m benchmarks.run --jobs 8 --latency 0.02 --output results.json
+    python -m benchmarks.run --jobs 8 --latency 0.02 --baseline results.json
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from .fake_datatracker import FakeDatatracker
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+DEFAULT_MAX_SLOWDOWN = 1.2
+
+
+def make_ids(count):
+    """Deterministic mix of ids: 2/3 RFCs, the rest versioned and unversioned drafts"""
+    ids = []
+    for i in range(count):
+        if i % 3 != 2:
+            ids.append('rfc{}'.format(i + 1))
+        elif i % 2:
+            ids.append('draft-bench-document{}-{:02d}'.format(i, i % 30))
+        else:
+            ids.append('draft-bench-document{}'.format(i))
+    return ids
+
+
+def peak_rss_kb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_client(base_url, count, jobs, max_per_host, rate, result_queue):
+    """Generate the BibTex of count ids from base_url, in a separate process"""
+    from rfc_bibtex.backends import MirrorBackend
+    from rfc_bibtex.bibfile import BibFile
+    from rfc_bibtex.fetcher import Fetcher
+    from rfc_bibtex.rfc_bibtex import RFCBibtex
+    from rfc_bibtex.scheduler import RequestScheduler
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_file_name = os.path.join(tmp_dir, 'out.bib')
+        fetcher = Fetcher(jobs=jobs, max_per_host=max_per_host, scheduler=RequestScheduler(rate=rate))
+        # the same concurrency as against datatracker, so that the results compare with older ones
+        backend = MirrorBackend(base_url, max_concurrency=max_per_host, batch_size=1)
+        rfc_bibtex = RFCBibtex(make_ids(count), out_file_name=out_file_name, fetcher=fetcher, backend=backend)
+
+        start = time.perf_counter()
+        # the warnings and errors are not part of the benchmark
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            rfc_bibtex.generate_bibtex()
+        wall_time = time.perf_counter() - start
+        fetcher.close()
+
+        entries = len(BibFile.read(out_file_name))
+
+    post_process = rfc_bibtex.stats.summary()['phases'].get('post_process')
+    result_queue.put({'wall_time': wall_time, 'entries': entries, 'peak_rss_kb': peak_rss_kb(),
+                      'post_process_us_per_entry': post_process['mean'] * 1e6 if post_process else None})
+
+
+def run_benchmark(count, args):
+    with FakeDatatracker(latency=args.latency, error_rate=args.error_rate, transient_error_rate=args.transient_error_rate,
+                         updated_rate=args.updated_rate, response_size=args.response_size) as fake:
+        # a fresh interpreter per run, so that the peak RSS of each run is measured separately
+        context = multiprocessing.get_context('spawn')
+        result_queue = context.Queue()
+        process = context.Process(target=run_client, args=(fake.base_url, count, args.jobs, args.max_per_host, args.rate,
+                                                                  result_queue))
+        process.start()
+        result = result_queue.get()
+        process.join()
+
+        result['ids'] = count
+        result['requests'] = fake.requests_served
+        result['requests_per_second'] = fake.requests_served / result['wall_time']
+        return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_slowdown):
+    """Return the list of regressions: runs which are more than max_slowdown times slower than in the baseline"""
+    baseline_times = {run['ids']: run['wall_time'] for run in baseline['results']}
+    regressions = []
+    for run in results['results']:
+        previous = baseline_times.get(run['ids'])
+        if previous and run['wall_time'] > previous * max_slowdown:
+            regressions.append('{} ids: {:.3f}s, was {:.3f}s'.format(run['ids'], run['wall_time'], previous))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmark rfcbibtex against a local fake datatracker.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, metavar='N', help='numbers of ids to benchmark')
+    parser.add_argument('--jobs', type=int, default=8, help='concurrent fetches (default: %(default)s)')
+    parser.add_argument('--max-per-host', type=int, default=8, help='concurrent requests to the server (default: %(default)s)')
+    parser.add_argument('--rate', type=float, default=0, help='client rate limit, 0 for none (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=0.01, help='server latency in seconds (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=0.02, help='share of 404 responses (default: %(default)s)')
+    parser.add_argument('--transient-error-rate', type=float, default=0.0,
+                        help='share of ids failing once with a 503 (default: %(default)s)')
+    parser.add_argument('--updated-rate', type=float, default=0.1,
+                        help='share of drafts which have become RFCs (default: %(default)s)')
+    parser.add_argument('--response-size', type=int, default=800, help='size of each entry in bytes (default: %(default)s)')
+    parser.add_argument('--output', metavar='FILE_NAME', help='write the JSON results to a file instead of stdout')
+    parser.add_argument('--baseline', metavar='FILE_NAME', help='JSON results of a previous run to compare against; '
+                        'exits with status 1 if any run got slower than --max-slowdown times the baseline')
+    parser.add_argument('--max-slowdown', type=float, default=DEFAULT_MAX_SLOWDOWN,
+                        help='tolerated slowdown against the baseline (default: %(default)s)')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    from rfc_bibtex import __version__
+
+    results = {
+        'version': __version__,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'max_slowdown')},
+        'results': [run_benchmark(count, args) for count in args.sizes],
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_slowdown)
+        for regression in regressions:
+            print('REGRESSION: {}'.format(regression), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
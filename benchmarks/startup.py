@@ -0,0 +1,112 @@
+"""
+Startup benchmark of the rfcbibtex command line.
+
+Runs bin/rfcbibtex repeatedly in fresh interpreters, for --help and for an offline run answered from
+a small archive (no network, like a run served from the cache), and reports the median wall time
+of each, the overhead over a bare `python -c pass`, and the slowest imports reported by
+`python -X importtime`. Exits with status 1 if the offline run's overhead exceeds --target-ms:
+
+    python -m benchmarks.startup --repeat 20 --target-ms 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT_DIR, 'bin', 'rfcbibtex')
+DEFAULT_REPEAT = 20
+DEFAULT_TARGET_MS = 50
+ARCHIVED_IDS = ['rfc{}'.format(number) for number in range(1, 11)]
+
+
+def environment(pycache_dir):
+    """No daemon, and bytecode caches (kept out of the tree), like an installed copy has"""
+    env = dict(os.environ, RFCBIBTEX_NO_DAEMON='1', PYTHONPYCACHEPREFIX=pycache_dir)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_DIR, env.get('PYTHONPATH')]))
+    return env
+
+
+def time_command(args, repeat, env):
+    """Median and minimum wall time of running the interpreter with args, in milliseconds"""
+    times = []
+    # the first run writes the bytecode caches
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env,
+                       check=False)
+        times.append((time.perf_counter() - start) * 1000)
+    times = times[1:]
+    return {'median_ms': statistics.median(times), 'min_ms': min(times)}
+
+
+def slowest_imports(args, count, env):
+    """The count imports with the highest cumulative time, mapped to their time in milliseconds"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime'] + args, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, env=env).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((module.strip(), int(cumulative) / 1000))
+    return dict(sorted(imports, key=lambda item: item[1], reverse=True)[:count])
+
+
+def build_archive(file_name):
+    sys.path.insert(0, ROOT_DIR)
+    from rfc_bibtex.archive import Archive
+    Archive.write(file_name, {id_name: '@misc{{{0},\n\ttitle = {{Title of {0}}},\n}}\n'.format(id_name)
+                              for id_name in ARCHIVED_IDS})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of rfcbibtex.')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per command (default: %(default)s)')
+    parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                        help='maximum overhead of an offline run over a bare interpreter (default: %(default)s)')
+    parser.add_argument('--imports', type=int, default=15, help='number of slowest imports to report (default: %(default)s)')
+    parser.add_argument('--output', metavar='FILE_NAME', help='write the JSON results to a file instead of stdout')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive = os.path.join(tmp_dir, 'bench.rfcbib')
+        build_archive(archive)
+        offline = [SCRIPT, '--no-cache', '--offline', archive] + ARCHIVED_IDS
+        env = environment(os.path.join(tmp_dir, 'pycache'))
+
+        results = {
+            'python': time_command(['-c', 'pass'], args.repeat, env),
+            'help': time_command([SCRIPT, '--help'], args.repeat, env),
+            'offline': time_command(offline, args.repeat, env),
+            'slowest_imports': slowest_imports(offline, args.imports, env),
+        }
+    for name in ('help', 'offline'):
+        results[name]['overhead_ms'] = results[name]['median_ms'] - results['python']['median_ms']
+    results['target_ms'] = args.target_ms
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if results['offline']['overhead_ms'] > args.target_ms:
+        print('SLOW STARTUP: offline run takes {:.1f} ms more than the interpreter, the target is {:.1f} ms'.format(
+            results['offline']['overhead_ms'], args.target_ms), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import asyncio
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+from .errors import BibEntry
+from .rfc_bibtex import RFCBibtex
+
+
+class EntryResult(object):
+    """
+    Outcome of a single id: its BibEntry record and its entry, or None if it could not be
+    obtained, in which case the status of the record is the Errors category of the error.
+    """
+    __slots__ = ('record', 'entry')
+
+    @property
+    def id_name(self):
+        return self.record.id_name
+
+    @property
+    def ok(self):
+        return self.entry is not None
+
+    @property
+    def error(self):
+        """Errors category of the error (None if the entry was obtained or is not valid BibTex)"""
+        return None if self.ok or self.record.status == BibEntry.OK else self.record.status
+
+    def __init__(self, record, entry=None):
+        self.record = record
+        self.entry = entry
+
+    def __repr__(self):
+        return 'EntryResult({!r}, ok={})'.format(self.record, self.ok)
+
+
+class AsyncRFCBibtex(RFCBibtex):
+    """
+    RFCBibtex for asyncio programs. aiter_entries() is an asynchronous generator of the results
+    of the ids as they complete: the responses are fetched in a pool of worker threads, at most
+    concurrency at a time, so the event loop is never blocked. Like RFCBibtex, each instance keeps
+    its own errors and stats, and the same document is fetched once however it is spelled.
+    """
+    DEFAULT_CONCURRENCY = 8
+
+    @property
+    def concurrency(self):
+        return self._concurrency
+
+    def __init__(self, id_names=None, in_file_names=None, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+        """The keyword arguments are the ones of RFCBibtex."""
+        super().__init__(id_names, in_file_names, **kwargs)
+        self._concurrency = max(1, concurrency)
+
+    async def _resolve(self, record, future):
+        try:
+            await future
+        except urllib.error.URLError:
+            # recorded by _get_bibtex_from_response()
+            pass
+        return EntryResult(record, self._get_bibtex_from_response(record, future.result))
+
+    async def aiter_entries(self, id_names=None):
+        """
+        Yield the EntryResult of each id (by default, the ones given to the constructor) in the
+        order in which they complete, invalid ids first. Closing the generator, or cancelling
+        the task iterating over it, cancels the fetches which have not started yet.
+        """
+        if id_names is None:
+            id_names = self._id_names
+        else:
+            id_names = self._remove_duplicate_ids_preserving_order(id_names)
+
+        # the running loop (asyncio.get_running_loop() is not available before Python 3.7)
+        loop = asyncio.get_event_loop()
+        # no more than the backend serves well at the same time
+        max_concurrency = self._backend.max_concurrency
+        executor = ThreadPoolExecutor(max_workers=min(self._concurrency, max_concurrency or self._concurrency))
+        fetches = {} # canonical id -> future of the response of the document
+        pending = set()
+        try:
+            for id_name in id_names:
+                record = self._new_record(id_name)
+                if record.status is not BibEntry.PENDING:
+                    yield EntryResult(record)
+                    continue
+                future = fetches.get(record.canonical_id)
+                if future is None:
+                    future = loop.run_in_executor(executor, self._get_response, record)
+                    fetches[record.canonical_id] = future
+                else:
+                    self._stats.incr('coalesced')
+                pending.add(asyncio.ensure_future(self._resolve(record, future)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            for future in fetches.values():
+                future.cancel()
+            # the fetches already running complete in the background
+            executor.shutdown(wait=False)
+
+    async def entries(self, id_names=None):
+        """Return the list of the EntryResult of the ids, in the order of the ids."""
+        results = {}
+        async for result in self.aiter_entries(id_names):
+            results[result.id_name] = result
+        order = self._id_names if id_names is None else self._remove_duplicate_ids_preserving_order(id_names)
+        return [results[id_name] for id_name in order]
@@ -0,0 +1,121 @@
+import mmap
+import os
+import struct
+import zlib
+
+from .exceptions import ArchiveFormatException
+from .utils import atomic_open
+
+
+class Archive(object):
+    """
+    Read-only, memory-mapped archive of datatracker responses keyed by canonical id, built by
+    `rfcbibtex mirror` and used by --offline runs.
+
+    The file starts with a header (magic, number of entries, number of slots), followed by an
+    open addressing hash table and by the records. Each slot holds a 64-bit hash of a key (its
+    Adler-32 and CRC-32, which unlike hashlib do not load OpenSSL at startup) and the offset and
+    length of its record (empty slots have an offset of 0), each record the length of its key, the
+    key and the response, all UTF-8 encoded. A lookup hashes the key and probes the slots linearly
+    from hash % slots, the table being at most half full; the number of slots is a power of two.
+    """
+    MAGIC = b'RFCBIB\x00\x02'
+    HEADER = struct.Struct('<8sQQ')
+    SLOT = struct.Struct('<QQQ')
+    KEY_LENGTH = struct.Struct('<H')
+
+    @staticmethod
+    def _hash(key):
+        return zlib.adler32(key) << 32 | zlib.crc32(key)
+
+    @classmethod
+    def write(cls, filename, responses):
+        """Write the archive of responses, a dict mapping canonical ids to response texts, atomically."""
+        slot_count = 8
+        while slot_count < 2 * len(responses):
+            slot_count *= 2
+
+        slots = [(0, 0, 0)] * slot_count
+        records = []
+        offset = cls.HEADER.size + slot_count * cls.SLOT.size
+        for key, response in responses.items():
+            key = key.encode('utf-8')
+            record = cls.KEY_LENGTH.pack(len(key)) + key + response.encode('utf-8')
+            key_hash = cls._hash(key)
+            index = key_hash % slot_count
+            while slots[index][1]:
+                index = (index + 1) % slot_count
+            slots[index] = (key_hash, offset, len(record))
+            records.append(record)
+            offset += len(record)
+
+        with atomic_open(filename, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(responses), slot_count))
+            f.write(b''.join(cls.SLOT.pack(*slot) for slot in slots))
+            for record in records:
+                f.write(record)
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < self.HEADER.size:
+                raise ArchiveFormatException('{} is not an rfcbibtex archive'.format(filename))
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, self._slot_count = self.HEADER.unpack_from(self._data)
+        if magic != self.MAGIC:
+            self._data.close()
+            raise ArchiveFormatException('{} is not an rfcbibtex archive'.format(filename))
+        if self._slot_count <= 0 or self._slot_count & (self._slot_count - 1) or 2 * self._count > self._slot_count:
+            self._data.close()
+            raise ArchiveFormatException('{} is corrupted: {} entries in {} slots'.format(
+                filename, self._count, self._slot_count))
+        if self.HEADER.size + self._slot_count * self.SLOT.size > size:
+            self._data.close()
+            raise ArchiveFormatException('{} is truncated'.format(filename))
+
+    def _read_record(self, offset, length):
+        """Return the (key, response) bytes of the record"""
+        key_length, = self.KEY_LENGTH.unpack_from(self._data, offset)
+        key_end = offset + self.KEY_LENGTH.size + key_length
+        return self._data[offset + self.KEY_LENGTH.size:key_end], self._data[key_end:offset + length]
+
+    def get(self, key, default=None):
+        """Return the response archived under the canonical id, or default."""
+        key = key.encode('utf-8')
+        key_hash = self._hash(key)
+        index = key_hash % self._slot_count
+        # a corrupted table may have no empty slot
+        for _ in range(self._slot_count):
+            slot_hash, offset, length = self.SLOT.unpack_from(self._data, self.HEADER.size + index * self.SLOT.size)
+            if not offset:
+                return default
+            if slot_hash == key_hash:
+                record_key, response = self._read_record(offset, length)
+                if record_key == key:
+                    return response.decode('utf-8')
+            index = (index + 1) % self._slot_count
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        """Iterate over the (canonical id, response) pairs, in no particular order"""
+        for index in range(self._slot_count):
+            _, offset, length = self.SLOT.unpack_from(self._data, self.HEADER.size + index * self.SLOT.size)
+            if offset:
+                key, response = self._read_record(offset, length)
+                yield key.decode('utf-8'), response.decode('utf-8')
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,184 @@
+import re
+import urllib.error
+
+from .fetcher import Fetcher
+from .scheduler import RequestScheduler
+
+
+class Backend(object):
+    """
+    Where the responses (the BibTex of the documents, in datatracker's format) come from. The backend
+    builds the URL of each document, which identifies it in the response cache and in the error
+    reports, and returns the response of such a URL.
+
+    It also declares how it is best fetched from, which the fetcher and its scheduler follow:
+    max_concurrency is the number of requests it serves well at the same time (None: as many as
+    the fetching jobs, 1: the responses are obtained in the calling thread), batch_size the number
+    of ids each fetching job looks up in a row, and rate the number of requests per second it is
+    sent (None: no limit), which the default fetcher of RFCBibtex follows, as the command line does
+    unless --rate says otherwise. Batches send as many requests, and make the
+    ids wait for the ones before them: batch_size should stay 1, unless the backend looks up
+    several ids at once. The responses of the cacheable backends go
+    through the response cache.
+    """
+    NAME = None
+    # the paths of datatracker, which all of the backends use
+    PATH_FMT = '/doc/{id_name}/bibtex/'
+    VERSION_PATH_FMT = '/doc/{id_name}/{version}/bibtex/'
+    PATH_RE = re.compile(r'/doc/(?P<id_name>[^/]+)/(?:(?P<version>\d+)/)?bibtex/$')
+
+    DEFAULT_MAX_CONCURRENCY = None
+    DEFAULT_BATCH_SIZE = 1
+    DEFAULT_RATE = None
+    CACHEABLE = True
+
+    @property
+    def base_url(self):
+        return self._base_url
+
+    @property
+    def max_concurrency(self):
+        return self._max_concurrency
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def cacheable(self):
+        return self.CACHEABLE
+
+    def __init__(self, base_url, max_concurrency=DEFAULT_MAX_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE, rate=DEFAULT_RATE):
+        self._base_url = base_url.rstrip('/')
+        self._max_concurrency = max_concurrency
+        self._batch_size = max(1, batch_size)
+        self._rate = rate
+
+    def url(self, id_name, version=None):
+        """URL of the document id_name (an RFC or a draft without its version), at the given version if any"""
+        if version is None:
+            return self._base_url + self.PATH_FMT.format(id_name=id_name)
+        return self._base_url + self.VERSION_PATH_FMT.format(id_name=id_name, version=version)
+
+    def key(self, url):
+        """Canonical id of the document at url (see RFCBibtex.canonical_id()), or None if url is not one of a document"""
+        match = self.PATH_RE.search(url)
+        if match is None:
+            return None
+        if match.group('version') is None:
+            return match.group('id_name').lower()
+        return '{}-{}'.format(match.group('id_name'), match.group('version')).lower()
+
+    def get(self, url, headers=None, fetcher=None):
+        """
+        Return the body of the response of url and its headers, sending the request with fetcher
+        (a Fetcher) if it goes over the network. Raise urllib.error.HTTPError for the error statuses,
+        and urllib.error.URLError when the response cannot be obtained.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._base_url)
+
+
+class DatatrackerBackend(Backend):
+    """The IETF datatracker, over HTTPS, which is sent few requests at a time and rate limited by default."""
+    NAME = 'datatracker'
+    BASE_URL = 'https://datatracker.ietf.org'
+    DEFAULT_MAX_CONCURRENCY = Fetcher.DEFAULT_MAX_PER_HOST
+    DEFAULT_RATE = RequestScheduler.DEFAULT_RATE
+
+    def __init__(self, base_url=BASE_URL, max_concurrency=DEFAULT_MAX_CONCURRENCY, batch_size=Backend.DEFAULT_BATCH_SIZE,
+                 rate=DEFAULT_RATE):
+        super().__init__(base_url, max_concurrency=max_concurrency, batch_size=batch_size, rate=rate)
+
+    def get(self, url, headers=None, fetcher=None):
+        return fetcher.get(url, headers)
+
+
+class MirrorBackend(DatatrackerBackend):
+    """
+    A mirror serving the BibTex endpoints of datatracker at another base URL, e.g. a caching proxy
+    run next to the build machines. It is not rate limited, and is sent more requests at a time.
+    """
+    NAME = 'mirror'
+    DEFAULT_MAX_CONCURRENCY = 16
+    DEFAULT_RATE = None
+
+    def __init__(self, base_url, max_concurrency=DEFAULT_MAX_CONCURRENCY, batch_size=Backend.DEFAULT_BATCH_SIZE,
+                 rate=DEFAULT_RATE):
+        super().__init__(base_url, max_concurrency=max_concurrency, batch_size=batch_size, rate=rate)
+
+
+class ArchiveBackend(Backend):
+    """
+    An Archive built by `rfcbibtex mirror` (offline mode): nothing is sent over the network. Its
+    lookups take microseconds, so they are made in the calling thread and not cached. The URLs
+    are the ones of datatracker, under which the responses were downloaded.
+    """
+    NAME = 'archive'
+    DEFAULT_MAX_CONCURRENCY = 1
+    CACHEABLE = False
+
+    @property
+    def archive(self):
+        return self._archive
+
+    def __init__(self, archive, base_url=DatatrackerBackend.BASE_URL):
+        super().__init__(base_url, max_concurrency=self.DEFAULT_MAX_CONCURRENCY)
+        self._archive = archive
+
+    def get(self, url, headers=None, fetcher=None):
+        key = self.key(url)
+        response = self._archive.get(key) if key is not None else None
+        if response is None:
+            raise urllib.error.URLError('{} is not in the offline archive'.format(key or url))
+        return response, {}
+
+    def close(self):
+        self._archive.close()
+
+
+class FixtureBackend(Backend):
+    """
+    Responses held in memory, for the tests and benchmarks: responses maps canonical ids (e.g.
+    rfc5246, draft-ietf-tls-tls13-21, or draft-ietf-tls-tls13 for the latest version) to their
+    response, or to the HTTP status they fail with. The other ids get default instead: a response,
+    a status (a 404 unless given), or a function returning either from the name of the document in
+    the URL (e.g. RFC5246, or draft-ietf-tls-tls13 for all of its versions), which may also raise
+    the exceptions of get(). Like datatracker, it is cacheable; the requested URLs are recorded in
+    requests.
+    """
+    NAME = 'fixture'
+    BASE_URL = 'https://fixture.invalid'
+    DEFAULT_MAX_CONCURRENCY = 1
+
+    @property
+    def requests(self):
+        return self._requests
+
+    def __init__(self, responses=None, base_url=BASE_URL, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 batch_size=Backend.DEFAULT_BATCH_SIZE, default=404):
+        super().__init__(base_url, max_concurrency=max_concurrency, batch_size=batch_size)
+        self._responses = {key.lower(): response for key, response in (responses or {}).items()}
+        self._default = default
+        self._requests = []
+
+    def get(self, url, headers=None, fetcher=None):
+        # list.append is atomic, the fixture may be read by several fetching threads
+        self._requests.append(url)
+        response = self._responses.get(self.key(url))
+        if response is None:
+            response = self._default
+            if callable(response):
+                response = response(self.PATH_RE.search(url).group('id_name'))
+        if isinstance(response, int):
+            raise urllib.error.HTTPError(url, response, 'Fixture status', {}, None)
+        return response, {}
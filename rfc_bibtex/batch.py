@@ -0,0 +1,103 @@
+import json
+import os.path
+import sys
+
+from .backends import DatatrackerBackend
+from .exceptions import ManifestException
+from .rfc_bibtex import RFCBibtex, default_fetcher
+from .stats import Stats
+
+
+class Batch(object):
+    """
+    Generates the BibTex of several projects, each with its own inputs and output file, in one run.
+    The ids of all of the projects are merged into a single deduplicated fetch plan, which is
+    fetched once (concurrently, with the given Fetcher), and the responses are then handed out to
+    the output of every project citing them.
+
+    A manifest is a JSON file listing the projects, whose paths are relative to the manifest:
+
+        {"projects": [
+            {"files": ["paper/main.tex"], "output": "paper/refs.bib"},
+            {"ids": ["rfc8446"], "files": ["slides/talk.aux"], "output": "slides/refs.bib", "update": true}
+        ]}
+    """
+    PROJECT_KEYS = ('files', 'ids', 'output', 'update')
+
+    @property
+    def projects(self):
+        """List of the RFCBibtex objects of the projects, in the order of the manifest"""
+        return self._projects
+
+    @classmethod
+    def read_manifest(cls, filename):
+        """Return the list of projects of the manifest, as dicts with their paths resolved."""
+        try:
+            with open(filename, 'r') as f:
+                manifest = json.load(f)
+        except ValueError as e:
+            raise ManifestException('{} is not valid JSON: {}'.format(filename, e))
+
+        projects = manifest.get('projects') if isinstance(manifest, dict) else None
+        if not isinstance(projects, list):
+            raise ManifestException('{} must hold an object with a list of "projects"'.format(filename))
+
+        base_dir = os.path.dirname(filename)
+        resolved = []
+        for i, project in enumerate(projects):
+            if not isinstance(project, dict) or not isinstance(project.get('output'), str):
+                raise ManifestException('project {} of {} has no "output" file'.format(i, filename))
+            unknown = set(project) - set(cls.PROJECT_KEYS)
+            if unknown:
+                raise ManifestException('project {} of {} has unknown keys: {}'.format(i, filename, ', '.join(sorted(unknown))))
+            resolved.append({
+                'files': [os.path.join(base_dir, name) for name in project.get('files', [])],
+                'ids': list(project.get('ids', [])),
+                'output': os.path.join(base_dir, project['output']),
+                'update': project.get('update'),
+            })
+        return resolved
+
+    def __init__(self, projects, fetcher=None, cache=None, rfc_index=None, update=False, stats=None, backend=None,
+                 follow_updates=None, output_format=None, rfc_bibtex_class=RFCBibtex):
+        """
+        projects is a list of dicts such as the ones returned by read_manifest(); update is used
+        for the projects which do not say whether to update their output.
+        """
+        if stats is None:
+            stats = fetcher.stats if fetcher is not None and fetcher.stats is not None else Stats(keep_spans=False)
+        if fetcher is None:
+            # shared by all of the projects
+            fetcher = default_fetcher(backend if backend is not None else DatatrackerBackend(), stats)
+
+        self._responses = {}
+        self._options = {'fetcher': fetcher, 'cache': cache, 'rfc_index': rfc_index, 'stats': stats,
+                         'backend': backend}
+        self._rfc_bibtex_class = rfc_bibtex_class
+        # reads the inputs of every project
+        self._projects = [rfc_bibtex_class(project['ids'], project['files'], project['output'],
+                                           update=update if project['update'] is None else project['update'],
+                                           prefetched=self._responses, follow_updates=follow_updates,
+                                           output_format=output_format, **self._options)
+                          for project in projects]
+
+    def plan(self):
+        """The ids to fetch for all of the projects, without the different spellings of a document."""
+        planned = set()
+        plan = []
+        for project in self._projects:
+            for id_name in project.planned_ids():
+                key = self._rfc_bibtex_class.canonical_id(id_name)
+                if key not in planned:
+                    planned.add(key)
+                    plan.append(id_name)
+        return plan
+
+    def generate_bibtex(self):
+        """Fetch the plan, then write the output (and print the warnings and errors) of each project."""
+        planner = self._rfc_bibtex_class(self.plan(), **self._options)
+        self._responses.update(planner.fetch_responses())
+
+        for project in self._projects:
+            print('==> {} <=='.format(project.out_file_name), file=sys.stderr)
+            project.generate_bibtex()
@@ -0,0 +1,81 @@
+import re
+
+
+class BibFile(object):
+    """
+    A .bib file split into chunks, one per entry, which are indexed by the entry key.
+    Each chunk holds the text between the end of the previous entry and the end of its
+    own entry, so joining the chunks back reproduces the original file byte-for-byte.
+    Entries can be replaced or added, without touching the rest of the file.
+    """
+    ENTRY_START_RE = re.compile(r'^@\w+\s*\{\s*(?P<key>[^,\s]+)\s*,', re.M)
+
+    @classmethod
+    def read(cls, filename):
+        with open(filename, 'r') as f:
+            return cls(f.read())
+
+    def __init__(self, text=''):
+        self._chunks = []
+        self._keys = {} # key -> index of its chunk
+        self._tail = ''
+
+        position = 0
+        for match in self.ENTRY_START_RE.finditer(text):
+            if match.start() < position:
+                # '@' at the beginning of a line inside of the previous entry (e.g. in an abstract)
+                continue
+            end = self._find_entry_end(text, match.end())
+            self._keys.setdefault(match.group('key'), len(self._chunks))
+            self._chunks.append(text[position:end])
+            position = end
+        self._tail = text[position:]
+
+    @staticmethod
+    def _find_entry_end(text, start):
+        """Return the position right after the brace closing the entry whose body begins at start."""
+        depth = 1
+        for position in range(start, len(text)):
+            char = text[position]
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return position + 1
+        return len(text)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._chunks)
+
+    @property
+    def keys(self):
+        return list(self._keys)
+
+    def get(self, key):
+        """The text of the entry with the given key (without the whitespace preceding it), or None."""
+        index = self._keys.get(key)
+        if index is None:
+            return None
+        return self._chunks[index].lstrip()
+
+    def set(self, key, entry):
+        """Replace the entry with the given key, keeping the whitespace before it, or add it at the end."""
+        index = self._keys.get(key)
+        if index is None:
+            self._keys[key] = len(self._chunks)
+            separator = '' if not self._chunks or self._tail else '\n\n'
+            # the new entry goes after the tail, which then moves after the new entry
+            self._chunks.append(separator + self._tail + entry)
+            self._tail = '\n\n'
+            return
+
+        chunk = self._chunks[index]
+        if chunk.lstrip() != entry:
+            self._chunks[index] = chunk[:len(chunk) - len(chunk.lstrip())] + entry
+
+    def __str__(self):
+        return ''.join(self._chunks) + self._tail
@@ -0,0 +1,249 @@
+import os
+import os.path
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'last_modified', 'fetched_at', 'permanent'])
+# the highest RFC number listed in an RFC index, and the time the index was downloaded
+RFCIndexSync = namedtuple('RFCIndexSync', ['highest_rfc_number', 'synced_at'])
+
+
+class ResponseCache(object):
+    """
+    Persistent cache of the responses obtained from datatracker, keyed by URL and stored
+    in a single SQLite database. Permanent responses (RFCs and explicitly versioned drafts)
+    never expire, the remaining ones are considered fresh for ttl seconds, after which
+    they must be revalidated with the server.
+
+    The failures (ids unknown to datatracker) are cached for the shorter negative_ttl, as well
+    as the highest RFC number of the last RFC index, since both change when documents are published.
+    """
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_NEGATIVE_TTL = 60 * 60
+    FILE_NAME = 'responses.sqlite3'
+
+    @staticmethod
+    def default_dir():
+        """The rfcbibtex directory inside of $XDG_CACHE_HOME (~/.cache by default)."""
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'rfcbibtex')
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @property
+    def negative_ttl(self):
+        return self._negative_ttl
+
+    @property
+    def refresh(self):
+        return self._refresh
+
+    def __init__(self, cache_dir=None, ttl=DEFAULT_TTL, refresh=False, negative_ttl=DEFAULT_NEGATIVE_TTL):
+        """
+        If refresh is True, the cached responses are ignored (but still updated), forcing
+        every resource to be downloaded again.
+        """
+        if cache_dir is None:
+            cache_dir = self.default_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._refresh = refresh
+        self._lock = threading.Lock()
+        import sqlite3
+        # the connection is shared between the fetching threads, access to it is serialized by _lock
+        self._db = sqlite3.connect(os.path.join(cache_dir, self.FILE_NAME), check_same_thread=False)
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                             'url TEXT PRIMARY KEY, body TEXT NOT NULL, etag TEXT, last_modified TEXT, '
+                             'fetched_at REAL NOT NULL, permanent INTEGER NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS failures (url TEXT PRIMARY KEY, status INTEGER NOT NULL, '
+                             'failed_at REAL NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS rfc_index_syncs (highest_rfc_number INTEGER NOT NULL, '
+                             'synced_at REAL NOT NULL)')
+
+    def get(self, url):
+        """Return the CachedResponse for url, or None if there is none (or if refreshing)."""
+        if self._refresh:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT body, etag, last_modified, fetched_at, permanent FROM responses WHERE url = ?',
+                                   (url,)).fetchone()
+        if row is None:
+            return None
+        return CachedResponse(row[0], row[1], row[2], row[3], bool(row[4]))
+
+    def is_fresh(self, cached):
+        """Whether the cached response can be used without revalidating it."""
+        return cached.permanent or time.time() - cached.fetched_at < self._ttl
+
+    def put(self, url, body, etag=None, last_modified=None, permanent=False):
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                             (url, body, etag, last_modified, time.time(), int(permanent)))
+            self._db.execute('DELETE FROM failures WHERE url = ?', (url,))
+
+    def get_failure(self, url):
+        """Return the status of the failure of url cached less than negative_ttl seconds ago, or None."""
+        if self._refresh:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT status, failed_at FROM failures WHERE url = ?', (url,)).fetchone()
+        if row is None or time.time() - row[1] >= self._negative_ttl:
+            return None
+        return row[0]
+
+    def put_failure(self, url, status):
+        """Remember that url failed with the (HTTP) status."""
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO failures VALUES (?, ?, ?)', (url, status, time.time()))
+
+    def get_rfc_index_sync(self):
+        """Return the RFCIndexSync of the last RFC index, if it was downloaded less than negative_ttl seconds ago."""
+        with self._lock:
+            row = self._db.execute('SELECT highest_rfc_number, synced_at FROM rfc_index_syncs').fetchone()
+        if row is None or time.time() - row[1] >= self._negative_ttl:
+            return None
+        return RFCIndexSync(row[0], row[1])
+
+    def put_rfc_index_sync(self, sync):
+        """Record the RFCIndexSync of an RFC index, unless a more recent one is recorded."""
+        with self._lock, self._db:
+            row = self._db.execute('SELECT synced_at FROM rfc_index_syncs').fetchone()
+            if row is None or row[0] < sync.synced_at:
+                self._db.execute('DELETE FROM rfc_index_syncs')
+                self._db.execute('INSERT INTO rfc_index_syncs VALUES (?, ?)', sync)
+
+    def touch(self, url):
+        """Mark the cached response as fresh again, after the server confirmed it is unmodified."""
+        with self._lock, self._db:
+            self._db.execute('UPDATE responses SET fetched_at = ? WHERE url = ?', (time.time(), url))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class MemoryCache(object):
+    """
+    In-memory LRU of the most recently used responses, in front of an optional ResponseCache
+    (written through, and read on a miss). It has the same interface as ResponseCache, and is
+    used by the daemon to answer repeated runs without querying the database.
+    """
+    DEFAULT_CAPACITY = 10000
+
+    @property
+    def ttl(self):
+        return self._ttl
+
+    @property
+    def negative_ttl(self):
+        return self._negative_ttl
+
+    @property
+    def refresh(self):
+        return False
+
+    def __init__(self, backend=None, capacity=DEFAULT_CAPACITY, ttl=ResponseCache.DEFAULT_TTL,
+                 negative_ttl=ResponseCache.DEFAULT_NEGATIVE_TTL):
+        """If a backend (ResponseCache) is given, its ttl and negative_ttl are used."""
+        self._backend = backend
+        self._capacity = max(1, capacity)
+        self._ttl = backend.ttl if backend is not None else ttl
+        self._negative_ttl = backend.negative_ttl if backend is not None else negative_ttl
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()
+        # without a backend, url -> (status, failed_at) of the most recent failures, and the last RFCIndexSync
+        self._failures = OrderedDict()
+        self._rfc_index_sync = None
+
+    def __len__(self):
+        return len(self._responses)
+
+    def _store(self, url, cached):
+        with self._lock:
+            self._responses[url] = cached
+            self._responses.move_to_end(url)
+            while len(self._responses) > self._capacity:
+                self._responses.popitem(last=False)
+
+    def get(self, url):
+        """Return the CachedResponse for url, or None if there is none."""
+        with self._lock:
+            cached = self._responses.get(url)
+            if cached is not None:
+                self._responses.move_to_end(url)
+                return cached
+        if self._backend is None:
+            return None
+        cached = self._backend.get(url)
+        if cached is not None:
+            self._store(url, cached)
+        return cached
+
+    def is_fresh(self, cached):
+        """Whether the cached response can be used without revalidating it."""
+        return cached.permanent or time.time() - cached.fetched_at < self._ttl
+
+    def put(self, url, body, etag=None, last_modified=None, permanent=False):
+        self._store(url, CachedResponse(body, etag, last_modified, time.time(), permanent))
+        if self._backend is not None:
+            self._backend.put(url, body, etag, last_modified, permanent)
+        else:
+            with self._lock:
+                self._failures.pop(url, None)
+
+    def get_failure(self, url):
+        """Return the status of the failure of url cached less than negative_ttl seconds ago, or None."""
+        if self._backend is not None:
+            return self._backend.get_failure(url)
+        with self._lock:
+            failure = self._failures.get(url)
+        if failure is None or time.time() - failure[1] >= self._negative_ttl:
+            return None
+        return failure[0]
+
+    def put_failure(self, url, status):
+        """Remember that url failed with the (HTTP) status."""
+        if self._backend is not None:
+            self._backend.put_failure(url, status)
+            return
+        with self._lock:
+            self._failures[url] = (status, time.time())
+            self._failures.move_to_end(url)
+            while len(self._failures) > self._capacity:
+                self._failures.popitem(last=False)
+
+    def get_rfc_index_sync(self):
+        """Return the RFCIndexSync of the last RFC index, if it was downloaded less than negative_ttl seconds ago."""
+        if self._backend is not None:
+            return self._backend.get_rfc_index_sync()
+        sync = self._rfc_index_sync
+        if sync is None or time.time() - sync.synced_at >= self._negative_ttl:
+            return None
+        return sync
+
+    def put_rfc_index_sync(self, sync):
+        """Record the RFCIndexSync of an RFC index, unless a more recent one is recorded."""
+        if self._backend is not None:
+            self._backend.put_rfc_index_sync(sync)
+        elif self._rfc_index_sync is None or self._rfc_index_sync.synced_at < sync.synced_at:
+            self._rfc_index_sync = sync
+
+    def touch(self, url):
+        """Mark the cached response as fresh again, after the server confirmed it is unmodified."""
+        with self._lock:
+            cached = self._responses.get(url)
+            if cached is not None:
+                self._responses[url] = cached._replace(fetched_at=time.time())
+        if self._backend is not None:
+            self._backend.touch(url)
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
@@ -0,0 +1,113 @@
+"""
+Forwarding of command lines to a running `rfcbibtex daemon`. This module is imported before
+anything else by bin/rfcbibtex, so it only depends on the standard library, until a daemon is
+found to be listening.
+"""
+import os
+import stat
+import sys
+
+# subcommands which always run in the calling process
+LOCAL_COMMANDS = ('mirror', 'daemon')
+
+
+def default_socket_path():
+    """
+    $RFCBIBTEX_SOCKET, or a socket private to the user in $XDG_RUNTIME_DIR (or in the temporary
+    directory). None on the platforms without Unix sockets (and users), e.g. Windows.
+    """
+    # socket is not imported to check for AF_UNIX, the platforms with os.getuid() are the ones with it
+    if not hasattr(os, 'getuid'):
+        return None
+    if os.environ.get('RFCBIBTEX_SOCKET'):
+        return os.environ['RFCBIBTEX_SOCKET']
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], 'rfcbibtex.sock')
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'rfcbibtex-{}.sock'.format(os.getuid()))
+
+
+def _daemon_socket_path(socket_path=None):
+    """
+    socket_path (by default, default_socket_path()) if it exists and is the user's, None otherwise,
+    i.e. when no daemon may be listening on it.
+    """
+    if not hasattr(os, 'getuid'):
+        return None
+    if socket_path is None:
+        socket_path = default_socket_path()
+    # checked first, since most runs have no daemon to talk to and socket is slow to import
+    try:
+        status = os.stat(socket_path)
+    except OSError:
+        return None
+    if status.st_uid != os.getuid() or status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return None
+    return socket_path
+
+
+def _runs_locally(args):
+    """
+    Whether the command line args ask for a watch, which keeps running and whose output cannot wait
+    for the end of the run, or read the ids from stdin. They are parsed like the run would, so that
+    combined short options (e.g. -uw) are recognized. Invalid args are left to the daemon to report.
+    """
+    import io
+    from contextlib import redirect_stderr, redirect_stdout
+    from .parser import Parser
+    try:
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            parser = Parser().parse_args(args)
+    except SystemExit:
+        return False
+    return parser.watch or '-' in parser.in_files
+
+
+def send(request, socket_path=None):
+    """
+    Send a request (a dict) to the daemon and return its response (a dict), or None if no daemon
+    is listening on the socket, or if the socket is not the user's (e.g. one created by someone else
+    in the shared temporary directory, who would receive the requests).
+    """
+    socket_path = _daemon_socket_path(socket_path)
+    if socket_path is None:
+        return None
+    import json
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return None
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks).decode('utf-8'))
+
+
+def forward(args, socket_path=None):
+    """
+    Run the command line args in the daemon, writing its output to stdout and stderr, and return
+    its exit status. Return None if the command has to run locally: RFCBIBTEX_NO_DAEMON is set,
+    the command is a subcommand, a watch or reads stdin, or no daemon is running.
+    """
+    if os.environ.get('RFCBIBTEX_NO_DAEMON') or args[:1] and args[0] in LOCAL_COMMANDS:
+        return None
+    # the args are only parsed when there is a daemon to forward them to, to keep the startup fast
+    socket_path = _daemon_socket_path(socket_path)
+    if socket_path is None or _runs_locally(args):
+        return None
+    response = send({'args': list(args), 'cwd': os.getcwd()}, socket_path)
+    if response is None:
+        return None
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['status']
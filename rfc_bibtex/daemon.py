@@ -0,0 +1,195 @@
+import json
+import os
+import os.path
+import socket
+import socketserver
+import sqlite3
+import sys
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+from .cache import MemoryCache, ResponseCache
+from .client import default_socket_path, send
+from .fetcher import Fetcher
+from .http_client import HTTPConnectionPool
+from .parser import DaemonParser, Parser
+from .rfc_bibtex import RFCBibtex, generate, open_cache
+from .scheduler import RequestScheduler
+from .stats import Stats
+from .utils import print_green, print_red, print_yellow
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON request line and answers with one JSON response"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # a client checking whether the daemon is listening
+            return
+        request = json.loads(line.decode('utf-8'))
+        response = self.server.daemon.handle(request)
+        self.wfile.write(json.dumps(response).encode('utf-8'))
+
+
+class Daemon(object):
+    """
+    Resident process running the command lines forwarded by bin/rfcbibtex (see client.forward()),
+    so that repeated runs, e.g. from an editor or latexmk, skip the interpreter startup and share a
+    connection pool and an in-memory LRU of the responses.
+
+    The requests are served one at a time: each runs in the working directory of its caller, with
+    its stdout and stderr captured and sent back. The runs use their own fetching options (jobs,
+    retries, rate, deadline), but the connections are the daemon's, with its timeout. A run asking
+    for another cache directory or ttls, or to refresh the cache, opens that cache as usual.
+    """
+
+    def __init__(self, socket_path=None, cache=None, connection_pool=None, rfc_bibtex_class=RFCBibtex):
+        """
+        cache is the MemoryCache shared by the runs (one without a backend by default), and its
+        backend's directory (if any) the one the runs without a --cache-dir use.
+        """
+        if socket_path is None:
+            socket_path = default_socket_path()
+        if cache is None:
+            cache = MemoryCache()
+        if connection_pool is None:
+            connection_pool = HTTPConnectionPool(timeout=Fetcher.DEFAULT_TIMEOUT)
+
+        self._socket_path = socket_path
+        self._cache = cache
+        self._connection_pool = connection_pool
+        self._rfc_bibtex_class = rfc_bibtex_class
+        self._server = None
+        self._stopping = False
+
+    @property
+    def socket_path(self):
+        return self._socket_path
+
+    def _shares_cache(self, parser):
+        """Whether the run can use the daemon's cache, i.e. it asks for the default cache"""
+        return (parser.cache_dir is None and not parser.refresh and parser.cache_ttl == self._cache.ttl
+                and parser.negative_ttl == self._cache.negative_ttl)
+
+    def _run(self, args):
+        parser = Parser().parse_args(args)
+        if not args:
+            parser.print_help()
+
+        stats = Stats(keep_spans=parser.stats or parser.trace_json is not None)
+        scheduler = RequestScheduler(retries=parser.retries, deadline=parser.deadline, rate=parser.rate, stats=stats)
+        # not closed, since it would close the shared connection pool
+        fetcher = Fetcher(jobs=parser.jobs, max_per_host=parser.max_per_host, scheduler=scheduler,
+                          connection_pool=self._connection_pool, stats=stats)
+        if parser.no_cache or parser.offline is not None:
+            cache = None
+        elif self._shares_cache(parser):
+            cache = self._cache
+        else:
+            cache = open_cache(parser)
+        try:
+            generate(parser, fetcher, cache, stats, rfc_bibtex_class=self._rfc_bibtex_class)
+        finally:
+            if cache is not None and cache is not self._cache:
+                cache.close()
+
+    def handle(self, request):
+        """
+        Run the request, a dict with the command line 'args' and the 'cwd' of the caller, and return
+        the response, a dict with its 'stdout', 'stderr' and exit 'status'. {'stop': True} stops the daemon.
+        """
+        if request.get('stop'):
+            self._stopping = True
+            return {'stdout': '', 'stderr': '', 'status': 0}
+
+        stdout, stderr = StringIO(), StringIO()
+        status = 0
+        cwd = os.getcwd()
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    os.chdir(request['cwd'])
+                    self._run(request['args'])
+                except SystemExit as e:
+                    # argparse errors and --help
+                    status = e.code if isinstance(e.code, int) else int(e.code is not None)
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+        finally:
+            os.chdir(cwd)
+        return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'status': status}
+
+    def bind(self):
+        """Listen on the socket, replacing a stale one. Raise OSError if a daemon is already listening."""
+        if os.path.exists(self._socket_path):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.connect(self._socket_path)
+                except OSError:
+                    # left behind by a daemon which did not exit cleanly
+                    os.remove(self._socket_path)
+                else:
+                    raise OSError('a daemon is already listening on {}'.format(self._socket_path))
+
+        # only the user may connect, since the requests run with their permissions
+        umask = os.umask(0o077)
+        try:
+            self._server = socketserver.UnixStreamServer(self._socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+
+    def serve(self):
+        """Serve the requests until a stop request is received."""
+        if self._server is None:
+            self.bind()
+        while not self._stopping:
+            self._server.handle_request()
+
+    def close(self):
+        if self._server is not None:
+            self._server.server_close()
+            os.remove(self._socket_path)
+            self._server = None
+        self._connection_pool.close()
+        self._cache.close()
+
+
+def run_daemon(args=None):
+    parser = DaemonParser().parse_args(args)
+    socket_path = parser.socket if parser.socket is not None else default_socket_path()
+    if socket_path is None:
+        print_red('The daemon requires Unix sockets, which this platform does not have', file=sys.stderr)
+        sys.exit(1)
+
+    if parser.stop:
+        if send({'stop': True}, socket_path) is None:
+            print_red('No daemon is listening on {}'.format(socket_path), file=sys.stderr)
+            sys.exit(1)
+        return
+
+    backend = None
+    if not parser.no_cache:
+        try:
+            backend = ResponseCache(parser.cache_dir, ttl=parser.cache_ttl, negative_ttl=parser.negative_ttl)
+        except (OSError, sqlite3.Error) as e:
+            print_yellow('Could not open the cache, keeping the responses in memory only: {}'.format(e), file=sys.stderr)
+    cache = MemoryCache(backend, capacity=parser.entries, ttl=parser.cache_ttl, negative_ttl=parser.negative_ttl)
+    connection_pool = HTTPConnectionPool(max_idle_per_host=parser.max_per_host, timeout=parser.timeout)
+
+    daemon = Daemon(socket_path, cache=cache, connection_pool=connection_pool)
+    try:
+        daemon.bind()
+    except OSError as e:
+        print_red('Could not listen on {}: {}'.format(socket_path, e), file=sys.stderr)
+        sys.exit(1)
+    print_green('Listening on {}'.format(socket_path), file=sys.stderr)
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
@@ -0,0 +1,167 @@
+import re
+
+
+class ParsedEntry(object):
+    """
+    A BibTex response parsed in a single pass into its structure: the comments before the entry,
+    its type and key, the position of its fields, and whatever follows it.
+
+    The response text itself is kept, and changes (of the key and of field values) are spliced into
+    it when converted back with str(), so everything else is reproduced exactly. Fields are located
+    on demand: looking up a single field is a targeted search, and the index of all the fields is
+    only built when fields is accessed.
+    """
+    __slots__ = ('key', 'updated_id', '_text', '_header', '_edits', '_fields')
+
+    HEADER_RE = re.compile(r'@(?P<type>\w+)\s*(?P<opening>\{)\s*(?P<key>[^,\s]+)')
+    # start of a field, matched right at a comma; the ones inside of a value (e.g. "a, b = c" in an
+    # abstract) are told apart by the braces before them not being balanced
+    FIELD_START_RE = re.compile(r',\s*(?P<name>[\w-]+)\s*=\s*')
+    BARE_VALUE_RE = re.compile(r'[^,\s}]*')
+    UPDATED_ID_RE = re.compile(r'%% You should probably cite (?P<new_id>(rfc|draft)[-\d\w]+)')
+    _field_res = {}
+
+    @classmethod
+    def parse(cls, text):
+        """Return the ParsedEntry of the first entry in text, or None if text holds no entry."""
+        header = cls.HEADER_RE.search(text)
+        if header is None:
+            return None
+        # datatracker announces the RFC or newer draft replacing a draft in a comment before the entry
+        updated = cls.UPDATED_ID_RE.search(text, 0, header.start()) if '%' in text[:header.start()] else None
+        return cls(text, header, updated.group('new_id') if updated is not None else None)
+
+    def __init__(self, text, header, updated_id=None):
+        self.key = header.group('key')
+        self.updated_id = updated_id
+        self._text = text
+        self._header = header
+        self._edits = {} # field name -> (start, end, new value)
+        self._fields = None # field name -> (start, end) of its value, once indexed
+
+    @property
+    def prefix(self):
+        """Text preceding the entry, such as datatracker's comments"""
+        return self._text[:self._header.start()]
+
+    @property
+    def entry_type(self):
+        return self._header.group('type')
+
+    @property
+    def trailing(self):
+        """Text following the entry, such as comments"""
+        return self._text[self._find_value_end(self._text, self._header.start('opening')):]
+
+    @property
+    def fields(self):
+        """List of the (lowercase name, raw value) pairs of the fields"""
+        return [(name, self.get(name)) for name in self._index_fields()]
+
+    def get(self, name, default=None):
+        """Raw value (including its braces or quotes) of the field"""
+        if name in self._edits:
+            return self._edits[name][2]
+        span = self._find_field(name)
+        return self._text[span[0]:span[1]] if span is not None else default
+
+    def set(self, name, value):
+        """Replace the raw value of an existing field"""
+        span = self._find_field(name)
+        if span is None:
+            raise KeyError(name)
+        self._edits[name] = (span[0], span[1], value)
+
+    def brace_title(self):
+        """
+        Enclose the title in an extra pair of braces, so that BibTex keeps its capitalization,
+        unless it already is.
+        """
+        value = self.get('title')
+        if value is None:
+            return
+        if value.startswith('"'):
+            self.set('title', '{{' + value[1:-1] + '}}')
+        elif value.startswith('{') and not self._is_braced_group(value[1:-1]):
+            self.set('title', '{' + value + '}')
+
+    def _find_field(self, name):
+        """Return the (start, end) of the value of the field, or None if the entry has no such field."""
+        if self._fields is not None:
+            return self._fields.get(name)
+
+        field_re = self._field_res.get(name)
+        if field_re is None:
+            field_re = self._field_res[name] = re.compile(r',\s*{}\s*=\s*'.format(re.escape(name)), re.I)
+        text = self._text
+        body_start = self._header.end()
+        for match in field_re.finditer(text, body_start):
+            if self._is_complete(text[body_start:match.start()]):
+                return match.end(), self._find_value_end(text, match.end())
+        return None
+
+    def _index_fields(self):
+        if self._fields is not None:
+            return self._fields
+
+        fields = {}
+        text = self._text
+        value_start = None
+        # jumping from comma to comma with str.find is much cheaper than searching with a regex
+        comma = text.find(',', self._header.end())
+        if comma >= 0 and text[self._header.end():comma].strip():
+            # something else than a field follows the key
+            comma = -1
+        while comma >= 0:
+            field = self.FIELD_START_RE.match(text, comma)
+            if field is not None and (value_start is None or self._is_complete(text[value_start:comma])):
+                value_start = field.end()
+                end = self._find_value_end(text, value_start)
+                fields.setdefault(field.group('name').lower(), (value_start, end))
+                comma = text.find(',', end)
+            else:
+                comma = text.find(',', comma + 1)
+
+        self._fields = fields
+        return fields
+
+    @staticmethod
+    def _is_complete(text):
+        """Whether text, which may span several fields, does not end in the middle of a value"""
+        return text.count('{') == text.count('}') and text.count('"') % 2 == 0
+
+    @classmethod
+    def _find_value_end(cls, text, start):
+        """Return the end of the value starting at start."""
+        if text.startswith('{', start):
+            depth = 1
+            position = start + 1
+            while True:
+                close = text.find('}', position)
+                if close < 0:
+                    return len(text)
+                # every brace opened before the closing one
+                depth += text.count('{', position, close) - 1
+                if depth == 0:
+                    return close + 1
+                position = close + 1
+        if text.startswith('"', start):
+            end = text.find('"', start + 1)
+            return end + 1 if end >= 0 else len(text)
+        return cls.BARE_VALUE_RE.match(text, start).end()
+
+    @classmethod
+    def _is_braced_group(cls, text):
+        """Whether text is a single group, i.e. '{...}' with the first brace closed by the last one"""
+        return text.startswith('{') and cls._find_value_end(text, 0) == len(text)
+
+    def __str__(self):
+        text = self._text
+        parts = [text[:self._header.start('key')], self.key]
+        position = self._header.end('key')
+        for start, end, value in sorted(self._edits.values()):
+            parts.append(text[position:start])
+            parts.append(value)
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
@@ -2,40 +2,128 @@ class UpdatedEntity(object):
     """
     Data object encopsuling the information regarding updated drafts.
     """
+    __slots__ = ('_old_id', '_new_id')
+
     @property
     def old_id(self):
         return self._old_id
-        
+
     @property
     def new_id(self):
         return self._new_id
-    
+
     def __init__(self, old_id, new_id):
         self._old_id = old_id
         self._new_id = new_id
 
+class BibEntry(object):
+    """
+    Record of a single id: its canonical form, its type, the URL it is fetched from, its status (OK,
+    or the Errors category of its error), the HTTP status it failed with if any and, for drafts which
+    have been updated, the id of the new document.
+    """
+    __slots__ = ('id_name', 'canonical_id', 'id_type', 'url', 'status', 'http_status', 'new_id')
+
+    PENDING = None
+    OK = -1
+
+    @property
+    def old_id(self):
+        """The id as given, so that updated entries can be reported like UpdatedEntity objects"""
+        return self.id_name
+
+    def __init__(self, id_name, id_type=None, url=None, canonical_id=None):
+        self.id_name = id_name
+        self.canonical_id = canonical_id if canonical_id is not None else id_name.lower()
+        self.id_type = id_type
+        self.url = url
+        self.status = self.PENDING
+        self.http_status = None
+        self.new_id = None
+
+    def __repr__(self):
+        return 'BibEntry({!r}, {!r}, {!r})'.format(self.id_name, self.id_type, self.url)
+
 class Errors(object):
     """
     Class encapsulating the errors to be reported at the end of the program's execution.
+
+    The records are put in one bucket per category as they come in, so that each report
+    is a single pass over its bucket.
     """
+    # categories, which are also the indexes of the buckets
+    INVALID_ID = 0
+    REMOTE_FETCH_ERROR = 1
+    URL_ERROR = 2
+    DRAFT_WITHOUT_VERSION = 3
+    UPDATED_TO_DRAFT = 4
+    UPDATED_TO_RFC = 5
+    CATEGORY_COUNT = 6
+    CATEGORY_NAMES = ('invalid_id', 'remote_fetch_error', 'url_error', 'draft_without_version', 'updated_to_draft',
+                      'updated_to_rfc')
+
     @property
     def updated_entity(self):
         """Iterator over all of the updated entity errors"""
-        return iter(self._updated_entity_errors)
+        return iter(self._buckets[self.UPDATED_TO_DRAFT] + self._buckets[self.UPDATED_TO_RFC])
 
     @property
     def draft_updated_to_rfc(self):
         """Entity errors subset in which drafts were updated to RFCs"""
-        return filter(lambda x: x.new_id.startswith('rfc'), self.updated_entity)
-    
+        return iter(self._buckets[self.UPDATED_TO_RFC])
+
     @property
     def draft_updated_to_draft(self):
         """Entity errors subset in which drafts were updated to a new draft"""
-        return filter(lambda x: x.new_id.startswith('draft'), self.updated_entity)
-
+        return iter(self._buckets[self.UPDATED_TO_DRAFT])
 
     def __init__(self):
-        self._updated_entity_errors = []
+        self._buckets = tuple([] for _ in range(self.CATEGORY_COUNT))
+
+    def add(self, category, record):
+        """Record a BibEntry in the category. Errors also become the status of the record."""
+        if category <= self.URL_ERROR:
+            record.status = category
+        self._buckets[category].append(record)
 
     def add_updated_entity(self, old_id, new_id):
-        self._updated_entity_errors.append(UpdatedEntity(old_id, new_id))
+        category = self.UPDATED_TO_RFC if new_id.startswith('rfc') else self.UPDATED_TO_DRAFT
+        self._buckets[category].append(UpdatedEntity(old_id, new_id))
+
+    def add_updated_entry(self, record, new_id):
+        """Record that the draft of the BibEntry has been updated to new_id"""
+        record.new_id = new_id
+        self._buckets[self.UPDATED_TO_RFC if new_id.startswith('rfc') else self.UPDATED_TO_DRAFT].append(record)
+
+    def extend(self, other):
+        """Add the records of another Errors (e.g. of a worker process), category by category"""
+        for bucket, records in zip(self._buckets, other._buckets):
+            bucket.extend(records)
+
+    def clear(self):
+        """Forget the records of every category"""
+        for bucket in self._buckets:
+            bucket.clear()
+
+    def reports(self):
+        """
+        Dicts describing the records, e.g. for JSON output: their level (error or warning), category
+        name, id, and URL or new id when there is one. The errors come first, each category in order.
+        """
+        for category, bucket in enumerate(self._buckets):
+            level = 'error' if category <= self.URL_ERROR else 'warning'
+            for record in bucket:
+                report = {'level': level, 'category': self.CATEGORY_NAMES[category], 'id': record.old_id}
+                if getattr(record, 'url', None) is not None:
+                    report['url'] = record.url
+                if record.new_id is not None:
+                    report['new_id'] = record.new_id
+                yield report
+
+    def get(self, category):
+        """List of the records of the category, in the order they were added"""
+        return self._buckets[category]
+
+    def __contains__(self, category):
+        """Whether there is any record in the category"""
+        return bool(self._buckets[category])
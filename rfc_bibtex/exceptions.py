@@ -6,3 +6,9 @@ class URLFetchException(ValueError):
 
 class BadRFCNumberException(ValueError):
     pass
+
+class ManifestException(ValueError):
+    pass
+
+class ArchiveFormatException(ValueError):
+    pass
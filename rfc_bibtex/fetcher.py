@@ -0,0 +1,193 @@
+import threading
+from collections import deque
+
+from .scheduler import RequestScheduler
+
+
+class _CompletedCall(object):
+    """
+    Outcome of a call made in the calling thread, with the part of the concurrent.futures.Future
+    interface that the consumers of Fetcher.imap() use.
+    """
+    __slots__ = ('_result', '_exception')
+
+    def __init__(self, func, *args):
+        self._result = None
+        self._exception = None
+        try:
+            self._result = func(*args)
+        except Exception as e:
+            self._exception = e
+
+    def done(self):
+        return True
+
+    def cancel(self):
+        return False
+
+    def exception(self):
+        return self._exception
+
+    def result(self):
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class _BatchedCall(object):
+    """
+    Outcome of one of the calls of a batch, run by a single job (see Fetcher.imap()), with the same
+    interface as _CompletedCall. It waits for the whole batch.
+    """
+    __slots__ = ('_future', '_index')
+
+    def __init__(self, future, index):
+        self._future = future
+        self._index = index
+
+    def done(self):
+        return self._future.done()
+
+    def cancel(self):
+        return self._future.cancel()
+
+    def exception(self):
+        return self._future.result()[self._index].exception()
+
+    def result(self):
+        return self._future.result()[self._index].result()
+
+
+class Fetcher(object):
+    """
+    Runs blocking fetch calls on a bounded thread pool, while capping the number of
+    simultaneous requests made to the same host. Results are handed back in the
+    same order in which the work was submitted, regardless of completion order.
+
+    The requests themselves go through a pool of persistent connections, which holds
+    at most max_per_host idle connections per host, and are retried and rate limited
+    by a RequestScheduler.
+    """
+    DEFAULT_JOBS = 1
+    DEFAULT_MAX_PER_HOST = 4
+    WINDOW_FACTOR = 2
+    DEFAULT_TIMEOUT = 30
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    @property
+    def max_per_host(self):
+        return self._max_per_host
+
+    @property
+    def connection_pool(self):
+        """The HTTPConnectionPool, created on first use since runs served from a cache never need it"""
+        if self._connection_pool is None:
+            from .http_client import HTTPConnectionPool
+            self._connection_pool = HTTPConnectionPool(max_idle_per_host=self._max_per_host, timeout=self._timeout,
+                                                       stats=self._stats)
+        return self._connection_pool
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def __init__(self, jobs=DEFAULT_JOBS, max_per_host=DEFAULT_MAX_PER_HOST, timeout=DEFAULT_TIMEOUT,
+                 scheduler=None, connection_pool=None, stats=None):
+        """
+        timeout is the number of seconds after which a request with no activity is abandoned.
+        If stats (a Stats object) is given, the default connection pool and scheduler record their metrics in it.
+        """
+        self._jobs = max(1, jobs)
+        self._max_per_host = max(1, max_per_host)
+        self._timeout = timeout
+        self._stats = stats
+        if scheduler is None:
+            scheduler = RequestScheduler(stats=stats)
+        self._connection_pool = connection_pool
+        self._scheduler = scheduler
+        self._host_semaphores = {}
+        self._host_semaphores_lock = threading.Lock()
+
+    def _get_host_semaphore(self, url):
+        from urllib.parse import urlsplit
+        host = urlsplit(url).netloc.lower()
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self._max_per_host)
+                self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _call(self, func, item, url):
+        with self._get_host_semaphore(url):
+            return func(item)
+
+    def _call_batch(self, func, items, url):
+        with self._get_host_semaphore(url):
+            return [_CompletedCall(func, item) for item in items]
+
+    def get(self, url, headers=None):
+        """GET url over a pooled connection, returning the decoded body and the response headers."""
+        connection_pool = self.connection_pool
+        return self._scheduler.call(lambda: connection_pool.request(url, headers), url)
+
+    def close(self):
+        if self._connection_pool is not None:
+            self._connection_pool.close()
+
+    def imap(self, func, items, url_of=lambda item: item, max_jobs=None, batch_size=1):
+        """
+        Call func(item) for every item and yield (item, future) pairs in input order. url_of(item)
+        is the URL that func will request, used to enforce the per-host limit.
+        Exceptions raised by func are not swallowed: they are raised by future.result().
+
+        Items are consumed lazily: at most WINDOW_FACTOR * jobs of them are in flight (or done,
+        but not yet handed back) at any time, so memory does not grow with the number of items.
+
+        The capabilities of the backend the items are fetched from lower the number of jobs to
+        max_jobs (if not None), and group the items by batch_size, each batch being fetched in a
+        row by a single job (counting as one request for the per-host limit).
+        """
+        jobs = self._jobs if max_jobs is None else max(1, min(self._jobs, max_jobs))
+        if jobs == 1:
+            # nothing to overlap the calls with: make them in this thread, which also spares
+            # importing concurrent.futures when the responses come from a cache or an archive
+            for item in items:
+                yield item, _CompletedCall(func, item)
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+        window = self.WINDOW_FACTOR * jobs * batch_size
+        pending = deque()
+        batch = []
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            def submit_batch():
+                future = executor.submit(self._call_batch, func, list(batch), url_of(batch[0]))
+                pending.extend((item, _BatchedCall(future, index)) for index, item in enumerate(batch))
+                batch.clear()
+
+            try:
+                for item in items:
+                    if batch_size == 1:
+                        pending.append((item, executor.submit(self._call, func, item, url_of(item))))
+                    else:
+                        batch.append(item)
+                        if len(batch) == batch_size:
+                            submit_batch()
+                    if len(pending) >= window:
+                        yield pending.popleft()
+                if batch:
+                    submit_batch()
+                while pending:
+                    yield pending.popleft()
+            finally:
+                # the consumer stopped early, do not start the work nobody is waiting for
+                for _, future in pending:
+                    future.cancel()
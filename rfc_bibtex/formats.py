@@ -0,0 +1,181 @@
+import re
+
+
+class BibtexFormat(object):
+    """
+    Serializes the ParsedEntry of each id into the output format. The entries are written one after
+    the other, between the HEADER and the FOOTER, each followed by the TERMINATOR and separated by
+    the SEPARATOR.
+
+    This one writes the entries as returned by datatracker, with the cited key and the braced title.
+    """
+    NAME = 'bibtex'
+    HEADER = ''
+    SEPARATOR = ''
+    TERMINATOR = '\n\n'
+    FOOTER = ''
+    # whether the output is a .bib file, which --update can merge new entries into
+    BIB_FILE = True
+    # whether the warnings and errors are reported as JSON records, instead of as colored text
+    STRUCTURED_REPORTS = False
+
+    def format_entry(self, entry):
+        return str(entry).strip()
+
+    def join(self, entries):
+        """The whole output holding the formatted entries"""
+        return self.HEADER + self.SEPARATOR.join(entry + self.TERMINATOR for entry in entries) + self.FOOTER
+
+
+MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+BRACE_RE = re.compile(r'(?<!\\)[{}]')
+LATEX_ESCAPE_RE = re.compile(r'\\([&%$#_{}])')
+NAME_SEPARATOR_RE = re.compile(r'\s+and\s+')
+
+
+def plain_value(value):
+    """Text of a raw field value, without its quotes or braces, LaTeX escapes and line breaks"""
+    if len(value) > 1 and value.startswith('"') and value.endswith('"'):
+        value = value[1:-1]
+    value = LATEX_ESCAPE_RE.sub(r'\1', BRACE_RE.sub('', value))
+    return ' '.join(value.split())
+
+
+def date_parts(fields):
+    """[year, month, day] (as far as they are known) from the raw year, month and day fields, or None"""
+    year = plain_value(fields.get('year', ''))
+    if not year.isdigit():
+        return None
+    parts = [int(year)]
+    month = plain_value(fields.get('month', '')).lower()
+    if month.isdigit():
+        parts.append(int(month))
+    elif month[:3] in MONTHS:
+        parts.append(MONTHS.index(month[:3]) + 1)
+    else:
+        return parts
+    day = plain_value(fields.get('day', ''))
+    if day.isdigit():
+        parts.append(int(day))
+    return parts
+
+
+class BiblatexFormat(BibtexFormat):
+    """
+    The entries with the types and fields of biblatex: @techreport becomes @report, the year, month
+    and day become a date, journal becomes journaltitle and address location.
+    """
+    NAME = 'biblatex'
+    TYPES = {'techreport': 'report', 'phdthesis': 'thesis', 'mastersthesis': 'thesis', 'conference': 'inproceedings',
+             'electronic': 'online', 'www': 'online'}
+    # the types which biblatex tells apart with a type field
+    SUBTYPES = {'techreport': '{techreport}', 'phdthesis': '{phdthesis}', 'mastersthesis': '{mathesis}'}
+    FIELDS = {'journal': 'journaltitle', 'address': 'location', 'school': 'institution'}
+    DATE_FIELDS = ('year', 'month', 'day')
+
+    def format_entry(self, entry):
+        entry_type = entry.entry_type.lower()
+        fields = entry.fields
+        date = date_parts(dict(fields))
+
+        lines = []
+        for name, value in fields:
+            if not value:
+                # e.g. the dates of some drafts
+                continue
+            if date is not None and name in self.DATE_FIELDS:
+                if name == 'year':
+                    lines.append(('date', '{{{}}}'.format('-'.join('{:02d}'.format(part) for part in date))))
+                continue
+            lines.append((self.FIELDS.get(name, name), value))
+        if entry_type in self.SUBTYPES and 'type' not in dict(fields):
+            lines.append(('type', self.SUBTYPES[entry_type]))
+
+        prefix = entry.prefix.strip()
+        return '{}@{}{{{},\n{}\n}}'.format(prefix + '\n\n' if prefix else '', self.TYPES.get(entry_type, entry_type), entry.key,
+                                          ',\n'.join('\t{} = {}'.format(name, value) for name, value in lines))
+
+
+class JSONLinesFormat(BibtexFormat):
+    """
+    One JSON object per line and entry, with its id, BibTex type, the plain text of its fields and,
+    for the drafts which have been updated, the id of the new document.
+    """
+    NAME = 'jsonl'
+    TERMINATOR = '\n'
+    BIB_FILE = False
+    STRUCTURED_REPORTS = True
+
+    def __init__(self):
+        # only imported by the runs writing JSON
+        import json
+        self._dumps = json.dumps
+
+    def format_entry(self, entry):
+        record = {'id': entry.key, 'type': entry.entry_type.lower(),
+                  'fields': {name: plain_value(value) for name, value in entry.fields}}
+        if entry.updated_id is not None:
+            record['updated_id'] = entry.updated_id
+        return self._dumps(record, ensure_ascii=False)
+
+
+class CSLJSONFormat(JSONLinesFormat):
+    """
+    A CSL-JSON array, the input format of citeproc processors (pandoc, Zotero, citation.js), with one
+    item per entry. RFCs and Internet Drafts are reports.
+    """
+    NAME = 'csl-json'
+    HEADER = '[\n'
+    SEPARATOR = ',\n'
+    TERMINATOR = ''
+    FOOTER = '\n]\n'
+    STRUCTURED_REPORTS = False
+
+    TYPES = {'article': 'article-journal', 'book': 'book', 'inproceedings': 'paper-conference', 'phdthesis': 'thesis',
+             'mastersthesis': 'thesis', 'techreport': 'report', 'misc': 'report'}
+    DEFAULT_TYPE = 'document'
+    # BibTex field -> CSL variable, for the fields holding plain text
+    VARIABLES = {'title': 'title', 'abstract': 'abstract', 'doi': 'DOI', 'url': 'URL', 'publisher': 'publisher',
+                 'institution': 'publisher', 'series': 'collection-title', 'number': 'number', 'type': 'genre',
+                 'pagetotal': 'number-of-pages', 'note': 'note', 'journal': 'container-title', 'booktitle': 'container-title',
+                 'address': 'publisher-place', 'pages': 'page', 'volume': 'volume'}
+    NAME_FIELDS = ('author', 'editor')
+
+    @classmethod
+    def _names(cls, value):
+        """CSL names of a raw author or editor field"""
+        names = []
+        for name in NAME_SEPARATOR_RE.split(plain_value(value)):
+            if ', ' in name:
+                family, given = name.split(', ', 1)
+                names.append({'family': family, 'given': given})
+            elif ' ' in name:
+                given, family = name.rsplit(' ', 1)
+                names.append({'family': family, 'given': given})
+            elif name:
+                names.append({'literal': name})
+        return names
+
+    def format_entry(self, entry):
+        fields = entry.fields
+        item = {'id': entry.key, 'type': self.TYPES.get(entry.entry_type.lower(), self.DEFAULT_TYPE)}
+        for name, value in fields:
+            if not value:
+                continue
+            if name in self.NAME_FIELDS:
+                item[name] = self._names(value)
+            elif name in self.VARIABLES:
+                # the first field wins, e.g. publisher over institution
+                item.setdefault(self.VARIABLES[name], plain_value(value))
+        date = date_parts(dict(fields))
+        if date is not None:
+            item['issued'] = {'date-parts': [date]}
+        return self._dumps(item, ensure_ascii=False)
+
+
+FORMATS = {output_format.NAME: output_format for output_format in (BibtexFormat, BiblatexFormat, JSONLinesFormat, CSLJSONFormat)}
+
+
+def get_format(name):
+    """Return an instance of the output format with the given name (one of FORMATS)."""
+    return FORMATS[name]()
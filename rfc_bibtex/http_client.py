@@ -0,0 +1,162 @@
+import http.client
+import io
+import threading
+import urllib.error
+from urllib.parse import urljoin, urlsplit
+
+
+class HTTPConnectionPool(object):
+    """
+    Minimal HTTP/1.1 client keeping persistent (keep-alive) connections, so that
+    consecutive requests to the same host do not pay a new TCP and TLS handshake.
+    Connections are returned to the pool after the response has been fully read and
+    are never shared by two requests at the same time.
+    """
+    DEFAULT_MAX_IDLE_PER_HOST = 4
+    MAX_REDIRECTS = 5
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+    @property
+    def connections_opened(self):
+        """Number of new connections established"""
+        return self._connections_opened
+
+    @property
+    def requests_sent(self):
+        """Number of requests sent, including the ones following redirects"""
+        return self._requests_sent
+
+    @property
+    def connections_reused(self):
+        """Number of requests which were sent over an already established connection"""
+        return self._connections_reused
+
+    def __init__(self, headers=None, max_idle_per_host=DEFAULT_MAX_IDLE_PER_HOST, timeout=None, stats=None):
+        """
+        headers are sent with every request, in addition to the ones given to request().
+        If stats (a Stats object) is given, the connection and request times are recorded in it.
+        """
+        self._headers = dict(headers or {})
+        self._max_idle_per_host = max_idle_per_host
+        self._timeout = timeout
+        self._stats = stats
+        self._idle = {} # (scheme, netloc) -> list of idle connections
+        self._lock = threading.Lock()
+
+        self._connections_opened = 0
+        self._requests_sent = 0
+        self._connections_reused = 0
+
+    def _new_connection(self, scheme, netloc):
+        # looked up on every call (instead of imported once), so that the classes can be patched in tests
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        with self._lock:
+            self._connections_opened += 1
+        connection = connection_class(netloc, timeout=self._timeout)
+        if self._stats is not None:
+            self._stats.incr('connections_opened')
+            self._time_connect(connection, netloc)
+        return connection
+
+    def _time_connect(self, connection, netloc):
+        """Record the time spent in DNS resolution and the TCP and TLS handshakes, when the connection is opened."""
+        connect = connection.connect
+
+        def timed_connect(*args, **kwargs):
+            with self._stats.span('connect', netloc):
+                return connect(*args, **kwargs)
+        connection.connect = timed_connect
+
+    def _get_connection(self, scheme, netloc):
+        """Return (connection, reused)"""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                self._connections_reused += 1
+                connection = idle.pop()
+            else:
+                connection = None
+        if connection is not None:
+            if self._stats is not None:
+                self._stats.incr('connections_reused')
+            return connection, True
+        return self._new_connection(scheme, netloc), False
+
+    def _release_connection(self, scheme, netloc, connection):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self._max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    @staticmethod
+    def _send_on(connection, path, headers):
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def _send(self, scheme, netloc, path, headers):
+        """Send a single GET request and return (status, reason, response headers, body)"""
+        connection, reused = self._get_connection(scheme, netloc)
+        try:
+            with self._lock:
+                self._requests_sent += 1
+            if self._stats is None:
+                response, body = self._send_on(connection, path, headers)
+            else:
+                # includes the connect span of new connections, which are opened by their first request
+                with self._stats.span('request', path):
+                    response, body = self._send_on(connection, path, headers)
+                self._stats.incr('requests_sent')
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            if not reused:
+                raise
+            # the server closed the idle connection in the meantime, retry on a new one
+            return self._send(scheme, netloc, path, headers)
+        except BaseException:
+            connection.close()
+            raise
+
+        if getattr(response, 'will_close', True):
+            connection.close()
+        else:
+            self._release_connection(scheme, netloc, connection)
+        return response.status, response.reason, response.msg, body
+
+    def request(self, url, headers=None):
+        """
+        GET url, following redirects. Return the decoded body and the response headers.
+        Like urllib.request.urlopen(), raise urllib.error.HTTPError for error status codes
+        and urllib.error.URLError when the server cannot be reached.
+        """
+        request_headers = dict(self._headers)
+        if headers:
+            request_headers.update(headers)
+
+        for _ in range(self.MAX_REDIRECTS + 1):
+            split_url = urlsplit(url)
+            path = split_url.path or '/'
+            if split_url.query:
+                path += '?' + split_url.query
+            try:
+                status, reason, response_headers, body = self._send(split_url.scheme, split_url.netloc, path, request_headers)
+            except (OSError, http.client.HTTPException) as e:
+                raise urllib.error.URLError(e)
+
+            if status in self.REDIRECT_CODES and response_headers.get('Location'):
+                url = urljoin(url, response_headers['Location'])
+                continue
+            if status >= 300:
+                raise urllib.error.HTTPError(url, status, reason, response_headers, io.BytesIO(body))
+            return body.decode(response_headers.get_content_charset() or 'utf-8'), response_headers
+
+        raise urllib.error.HTTPError(url, status, 'Too many redirects', response_headers, io.BytesIO(body))
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
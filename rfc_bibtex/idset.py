@@ -0,0 +1,50 @@
+import re
+
+
+class IdSet(object):
+    """
+    Set of ids, compared case-insensitively, used to deduplicate streams of millions of ids.
+
+    The RFCs spelled rfcN, which make up most of such streams, take a single bit each in a bitmap
+    indexed by their number (about 1KB per 8000 RFCs); the other ids (drafts, other spellings of RFCs)
+    are kept in a set. Memory grows with the highest RFC number and with the number of distinct other
+    ids, not with the number of ids added.
+    """
+    # no leading zeros, so that rfc0123 is not mistaken for rfc123
+    RFC_RE = re.compile(r'rfc([1-9]\d{0,5}|0)$')
+
+    def __init__(self, id_names=()):
+        self._rfcs = bytearray()
+        self._others = set()
+        for id_name in id_names:
+            self.add(id_name)
+
+    def add(self, id_name):
+        """Add the id, and return whether it was not in the set yet."""
+        key = id_name.lower()
+        match = self.RFC_RE.match(key)
+        if match is None:
+            if key in self._others:
+                return False
+            self._others.add(key)
+            return True
+
+        number = int(match.group(1))
+        index, mask = number >> 3, 1 << (number & 7)
+        if index >= len(self._rfcs):
+            self._rfcs.extend(bytes(index + 1 - len(self._rfcs)))
+        if self._rfcs[index] & mask:
+            return False
+        self._rfcs[index] |= mask
+        return True
+
+    def __contains__(self, id_name):
+        key = id_name.lower()
+        match = self.RFC_RE.match(key)
+        if match is None:
+            return key in self._others
+        number = int(match.group(1))
+        return number >> 3 < len(self._rfcs) and bool(self._rfcs[number >> 3] & 1 << (number & 7))
+
+    def __len__(self):
+        return sum(bin(byte).count('1') for byte in self._rfcs) + len(self._others)
@@ -0,0 +1,108 @@
+import os.path
+import sqlite3
+import sys
+
+from .archive import Archive
+from .cache import ResponseCache
+from .entry import ParsedEntry
+from .exceptions import ArchiveFormatException
+from .fetcher import Fetcher
+from .parser import MirrorParser
+from .rfc_bibtex import RFCBibtex
+from .rfc_index import RFCIndex
+from .scheduler import RequestScheduler
+from .stats import Stats
+from .utils import print_green, print_red, print_yellow
+
+
+class Mirror(object):
+    """
+    Downloads the responses of a list of ids into an Archive, so that later runs can resolve them
+    offline. The ids already in the archive are not downloaded again, the archive is extended.
+    """
+
+    @property
+    def failed(self):
+        """List of the (id, reason) pairs of the ids which could not be mirrored by the last build()"""
+        return self._failed
+
+    @staticmethod
+    def rfc_ids(start, end):
+        """Ids of the RFCs numbered from start to end, both included"""
+        return ['rfc{}'.format(number) for number in range(start, end + 1)]
+
+    def __init__(self, id_names=None, in_file_names=None, fetcher=None, cache=None, rfc_index=None, stats=None,
+                 rfc_bibtex_class=RFCBibtex):
+        if stats is None:
+            stats = fetcher.stats if fetcher is not None and fetcher.stats is not None else Stats(keep_spans=False)
+        if fetcher is None:
+            fetcher = Fetcher(stats=stats)
+
+        self._options = {'fetcher': fetcher, 'cache': cache, 'rfc_index': rfc_index, 'stats': stats}
+        self._rfc_bibtex_class = rfc_bibtex_class
+        # reads the input files
+        self._ids = rfc_bibtex_class(id_names, in_file_names, **self._options).planned_ids()
+        self._failed = []
+
+    def build(self, filename):
+        """Extend (or create) the archive with the ids missing from it, and return the number of ids added."""
+        responses = {}
+        if os.path.exists(filename):
+            with Archive(filename) as archive:
+                responses.update(archive.items())
+
+        canonical_id = self._rfc_bibtex_class.canonical_id
+        missing = [id_name for id_name in self._ids if canonical_id(id_name) not in responses]
+        rfc_bibtex = self._rfc_bibtex_class(missing, **self._options)
+        fetched = rfc_bibtex.fetch_responses()
+
+        self._failed = [(record.id_name, 'invalid id') for record in rfc_bibtex.errors.get(rfc_bibtex.errors.INVALID_ID)]
+        added = 0
+        for key, future in fetched.items():
+            if future.exception() is not None:
+                self._failed.append((key, str(future.exception())))
+                continue
+            response = future.result()
+            if response.startswith(RFCBibtex.URL_ERROR_MSG) or ParsedEntry.parse(response) is None:
+                self._failed.append((key, 'no BibTex entry in the response'))
+                continue
+            responses[key] = response
+            added += 1
+
+        if added or not os.path.exists(filename):
+            Archive.write(filename, responses)
+        return added
+
+
+def run_mirror(args=None):
+    parser = MirrorParser().parse_args(args)
+
+    stats = Stats(keep_spans=False)
+    scheduler = RequestScheduler(retries=parser.retries, deadline=parser.deadline, rate=parser.rate, stats=stats)
+    fetcher = Fetcher(jobs=parser.jobs, max_per_host=parser.max_per_host, timeout=parser.timeout, scheduler=scheduler,
+                      stats=stats)
+    cache = None
+    if not parser.no_cache:
+        try:
+            cache = ResponseCache(parser.cache_dir)
+        except (OSError, sqlite3.Error) as e:
+            print_yellow('Could not open the cache, continuing without it: {}'.format(e), file=sys.stderr)
+    rfc_index = RFCIndex.from_file(parser.rfc_index) if parser.rfc_index is not None else None
+
+    id_names = list(parser.inline_args)
+    for start, end in parser.rfc_ranges:
+        id_names.extend(Mirror.rfc_ids(start, end))
+
+    mirror = Mirror(id_names, parser.in_files, fetcher=fetcher, cache=cache, rfc_index=rfc_index, stats=stats)
+    try:
+        added = mirror.build(parser.archive)
+    except ArchiveFormatException as e:
+        parser.error(str(e))
+    finally:
+        fetcher.close()
+        if cache is not None:
+            cache.close()
+
+    for id_name, reason in mirror.failed:
+        print_red('Could not mirror {}: {}'.format(id_name, reason), file=sys.stderr)
+    print_green('Added {} entries to {}'.format(added, parser.archive), file=sys.stderr)
@@ -1,9 +1,49 @@
 import argparse
+import re
+import sys
+
+from .backends import ArchiveBackend, DatatrackerBackend, MirrorBackend
+from .fetcher import Fetcher
+from .formats import FORMATS, BibtexFormat
+from .cache import MemoryCache, ResponseCache
+from .scheduler import RequestScheduler
+
+def add_fetching_arguments(parser):
+    """Add the arguments controlling how the ids are fetched (concurrency, timeouts, retries) to parser."""
+    parser.add_argument('-j', '--jobs', default=Fetcher.DEFAULT_JOBS, type=int, metavar='N', help='number of IDs to fetch concurrently '
+                        '(default: %(default)s)')
+    parser.add_argument('--max-per-host', default=None, type=int, metavar='N',
+                        help='maximum number of concurrent requests to the same host (default: the one of the backend, '
+                        '{} for datatracker)'.format(DatatrackerBackend.DEFAULT_MAX_CONCURRENCY))
+    parser.add_argument('--timeout', default=Fetcher.DEFAULT_TIMEOUT, type=float, metavar='SECONDS',
+                        help='abandon a request after this many seconds without a response (default: %(default)s)')
+    parser.add_argument('--retries', default=RequestScheduler.DEFAULT_RETRIES, type=int, metavar='N',
+                        help='number of times a request failing with a network error, a timeout or a transient HTTP '
+                        'error (429, 5xx) is retried (default: %(default)s)')
+    parser.add_argument('--deadline', default=None, type=float, metavar='SECONDS',
+                        help='stop sending requests after this many seconds, the IDs not fetched by then are reported as errors')
+    parser.add_argument('--rate', default=None, type=float, metavar='N',
+                        help='maximum number of requests per second, automatically lowered when the server throttles '
+                        'the requests. 0 means no limit (default: the one of the backend, {} for datatracker and no '
+                        'limit for a --mirror)'.format(DatatrackerBackend.DEFAULT_RATE))
+
+def resolve_fetching_arguments(args, backend_class):
+    """Set the fetching arguments which were not given to the defaults of backend_class (see backends.py)."""
+    if args.max_per_host is None:
+        args.max_per_host = backend_class.DEFAULT_MAX_CONCURRENCY or Fetcher.DEFAULT_MAX_PER_HOST
+    if args.rate is None:
+        # 0 for no limit
+        args.rate = backend_class.DEFAULT_RATE or 0
 
 class Parser(object):
     """
     A wrapper class around the Python's argparse.parser.
     """
+    @property
+    def args(self):
+        """The command line args, as given to parse_args()"""
+        return self._args
+
     @property
     def inline_args(self):
         return self._inline_args
@@ -16,9 +56,101 @@ class Parser(object):
     def out_file(self):
         return self._out_file
 
+    @property
+    def jobs(self):
+        return self._jobs
+
+    @property
+    def processes(self):
+        return self._processes
+
+    @property
+    def max_per_host(self):
+        return self._max_per_host
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @property
+    def no_cache(self):
+        return self._no_cache
+
+    @property
+    def refresh(self):
+        return self._refresh
+
+    @property
+    def cache_ttl(self):
+        return self._cache_ttl
+
+    @property
+    def negative_ttl(self):
+        return self._negative_ttl
+
+    @property
+    def rfc_index(self):
+        return self._rfc_index
+
+    @property
+    def update(self):
+        return self._update
+
+    @property
+    def manifest(self):
+        return self._manifest
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def retries(self):
+        return self._retries
+
+    @property
+    def deadline(self):
+        return self._deadline
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def offline(self):
+        return self._offline
+
+    @property
+    def mirror(self):
+        return self._mirror
+
+    @property
+    def watch(self):
+        return self._watch
+
+    @property
+    def follow_updates(self):
+        return self._follow_updates
+
+    @property
+    def output_format(self):
+        return self._output_format
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def trace_json(self):
+        return self._trace_json
+
     def print_help(self):
         self._parser.print_help()
 
+    def error(self, message):
+        """Print the usage and message to stderr, and exit with status 2"""
+        self._parser.error(message)
+
 
     def build_parser(self):
             """Setup and return the argument parser."""
@@ -26,22 +158,320 @@ class Parser(object):
                                                          '(including .tex and .aux) or directly from command-line arguments.')
             parser.add_argument('inline_args', nargs='*', help='list of RFC and/or Internet Draft IDs, in any order.', default=[])
             parser.add_argument('-f', '--files', default=[], metavar='FILE_NAMES', nargs='+', help='read list of RFC and/or Internet Draft IDs from a file. ' 
-                                'Supported file formats are the following: .tex, .aux and .txt (one ID per line). '
+                                'Supported file formats are the following: .tex, .aux, .bcf and .txt (one ID per line). '
                                 'If a file with any other extension is provided, the tool attempts to read it as a .txt file, '
-                                'containing one ID per line.')
+                                'containing one ID per line. "-" reads the IDs from stdin, one per line: they are fetched '
+                                'as they are read, in bounded memory.')
             parser.add_argument('-o', '--output', default=None, metavar='FILE_NAME', nargs=1, help='output the resulting BibTex to a file')
+            parser.add_argument('--format', default=BibtexFormat.NAME, choices=list(FORMATS), metavar='FORMAT',
+                                help='format of the output: "bibtex" (as returned by datatracker), "biblatex", "jsonl" '
+                                '(one JSON object per entry, and the warnings and errors as JSON records on stderr) or '
+                                '"csl-json" (default: %(default)s)')
+            add_fetching_arguments(parser)
+            parser.add_argument('--processes', default=1, type=int, metavar='N', help='split the IDs between N worker '
+                                'processes, each fetching with -j threads and its own connections and share of --rate, for '
+                                'lists of thousands of IDs (default: %(default)s)')
+            parser.add_argument('--cache-dir', default=None, metavar='DIR', help='directory of the persistent response cache '
+                                '(default: $XDG_CACHE_HOME/rfcbibtex)')
+            parser.add_argument('--no-cache', action='store_true', help='neither read from nor write to the response cache')
+            parser.add_argument('--refresh', action='store_true', help='ignore the cached responses and download every entry again, '
+                                'updating the cache')
+            parser.add_argument('--cache-ttl', default=ResponseCache.DEFAULT_TTL, type=int, metavar='SECONDS',
+                                help='number of seconds during which a cached draft without an explicit version is used before '
+                                'being revalidated. RFCs and drafts with an explicit version are cached permanently (default: %(default)s)')
+            parser.add_argument('--negative-ttl', default=ResponseCache.DEFAULT_NEGATIVE_TTL, type=int, metavar='SECONDS',
+                                help='number of seconds during which an ID unknown to datatracker is reported as an error '
+                                'without asking again, and during which the RFCs numbered above the last one of a downloaded '
+                                '--rfc-index are rejected without any request (default: %(default)s)')
+            parser.add_argument('--rfc-index', default=None, metavar='FILE_NAME', help='build the BibTex of RFCs from a local copy of '
+                                'the RFC Editor index (rfc-index.xml), instead of fetching them one by one. Drafts are still '
+                                'fetched from datatracker, and so are the RFCs missing from the index, except the ones '
+                                'numbered above its last RFC while the file was modified (downloaded) less than '
+                                '--negative-ttl seconds ago, which are rejected without any request')
+            parser.add_argument('-u', '--update', action='store_true', help='update the output file (-o) in place: only the IDs '
+                                'missing from it and the drafts without an explicit version are obtained, the remaining '
+                                'entries are kept as they are')
+            parser.add_argument('-m', '--manifest', default=None, metavar='FILE_NAME', help='generate the BibTex of several '
+                                'projects in one run, from a JSON manifest mapping input files (and IDs) to output files. '
+                                'The IDs of all of the projects are fetched once, then written to every output citing them')
+            parser.add_argument('--follow-updates', default=None, choices=('add', 'replace'), metavar='MODE',
+                                help='when a draft has been updated to a new draft or an RFC, fetch the new document in the '
+                                'same run and either "add" its entry after the draft\'s one, or "replace" the draft\'s entry '
+                                'with it (keeping the cited key)')
+            parser.add_argument('--offline', default=None, metavar='ARCHIVE', help='read the entries from an archive built '
+                                'with `rfcbibtex mirror` instead of fetching them. No request is sent, the IDs missing from the '
+                                'archive are reported as errors')
+            parser.add_argument('--mirror', default=None, metavar='BASE_URL', help='fetch the entries from a mirror serving '
+                                'the BibTex endpoints of datatracker (/doc/ID/bibtex/) at BASE_URL, e.g. a caching proxy, '
+                                'instead of from datatracker. Unless --max-per-host or --rate are given, it is sent up to {} '
+                                'requests at a time (one per ID, as many as --jobs allows), without rate limit'.format(MirrorBackend.DEFAULT_MAX_CONCURRENCY))
+            parser.add_argument('-w', '--watch', action='store_true', help='keep running, and rewrite the output file (-o) '
+                                'whenever the input files (-f), or the files they \\input, change. Only the new IDs are '
+                                'obtained. Stop with Ctrl+C')
+            parser.add_argument('--stats', action='store_true', help='print a summary of the time spent in each phase (reading the '
+                                'input, connecting, fetching, post-processing, writing), with histograms, and of the cache hits, '
+                                'misses and retries to stderr')
+            parser.add_argument('--trace-json', default=None, metavar='FILE_NAME', help='write a timing span for each ID and phase, '
+                                'and the counters, to a JSON file in the Trace Event format (viewable in chrome://tracing or Perfetto)')
             self._parser = parser
 
             return parser
 
-    def parse_args(self):
-        """ Parse and process command line args """
+    def parse_args(self, args=None):
+        """ Parse and process command line args (sys.argv by default) """
         parser = self.build_parser()
-        args = parser.parse_args()
+        self._args = list(args) if args is not None else sys.argv[1:]
+        args = parser.parse_args(self._args)
+        if args.offline is not None:
+            resolve_fetching_arguments(args, ArchiveBackend)
+        elif args.mirror is not None:
+            resolve_fetching_arguments(args, MirrorBackend)
+        else:
+            resolve_fetching_arguments(args, DatatrackerBackend)
         # Bind command line args to global vars
         self._inline_args = args.inline_args
 
         self._in_file = args.files
         self._out_file = args.output[0] if args.output is not None else None
+        self._jobs = args.jobs
+        self._processes = args.processes
+        self._max_per_host = args.max_per_host
+        self._timeout = args.timeout
+        self._retries = args.retries
+        self._deadline = args.deadline
+        self._rate = args.rate
+        self._cache_dir = args.cache_dir
+        self._no_cache = args.no_cache
+        self._refresh = args.refresh
+        self._cache_ttl = args.cache_ttl
+        self._negative_ttl = args.negative_ttl
+        self._rfc_index = args.rfc_index
+        self._update = args.update
+        self._stats = args.stats
+        self._trace_json = args.trace_json
+        self._offline = args.offline
+        self._mirror = args.mirror
+        self._follow_updates = args.follow_updates
+        self._output_format = args.format
+        self._watch = args.watch
+
+        self._manifest = args.manifest
+
+        if self._manifest is not None and (self._inline_args or self._in_file or self._out_file is not None):
+            parser.error('--manifest cannot be combined with IDs, -f or -o, which are given by the manifest')
+        if self._update and self._out_file is None and self._manifest is None:
+            parser.error('--update requires an output file (-o)')
+        if self._update and not FORMATS[self._output_format].BIB_FILE:
+            parser.error('--update requires a BibTex output format')
+        if self._watch and (self._out_file is None or not self._in_file):
+            parser.error('--watch requires input files (-f) and an output file (-o)')
+        if '-' in self._in_file and (self._watch or self._processes > 1):
+            parser.error('reading the IDs from stdin (-f -) cannot be combined with --watch or --processes')
+        if self._offline is not None and self._mirror is not None:
+            parser.error('--offline cannot be combined with --mirror')
+        if self._processes < 1:
+            parser.error('--processes must be at least 1')
+        if self._processes > 1 and (self._manifest is not None or self._watch):
+            parser.error('--processes cannot be combined with --manifest or --watch')
+
+        return self
+
+
+class MirrorParser(object):
+    """
+    Argument parser of the `rfcbibtex mirror` subcommand.
+    """
+    RFC_RANGE_RE = re.compile(r'^(?:rfc)?(?P<start>\d+)-(?:rfc)?(?P<end>\d+)$', re.I)
+
+    @property
+    def inline_args(self):
+        return self._inline_args
+
+    @property
+    def in_files(self):
+        return self._in_file
+
+    @property
+    def rfc_ranges(self):
+        """List of the (start, end) RFC number ranges, both ends included"""
+        return self._rfc_ranges
+
+    @property
+    def archive(self):
+        return self._archive
+
+    @property
+    def jobs(self):
+        return self._jobs
+
+    @property
+    def max_per_host(self):
+        return self._max_per_host
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def retries(self):
+        return self._retries
+
+    @property
+    def deadline(self):
+        return self._deadline
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @property
+    def no_cache(self):
+        return self._no_cache
+
+    @property
+    def rfc_index(self):
+        return self._rfc_index
+
+    def error(self, message):
+        """Print the usage and message to stderr, and exit with status 2"""
+        self._parser.error(message)
+
+    def build_parser(self):
+        """Setup and return the argument parser."""
+        parser = argparse.ArgumentParser(prog='rfcbibtex mirror', description='Download the BibTex of a list or range of RFCs '
+                                         'and Internet Drafts into an archive, used by `rfcbibtex --offline ARCHIVE`. If the '
+                                         'archive exists, only the IDs missing from it are downloaded.')
+        parser.add_argument('inline_args', nargs='*', help='list of RFC and/or Internet Draft IDs, in any order.', default=[])
+        parser.add_argument('-f', '--files', default=[], metavar='FILE_NAMES', nargs='+', help='read list of RFC and/or '
+                            'Internet Draft IDs from a file, in any of the formats supported by rfcbibtex')
+        parser.add_argument('-r', '--rfc-range', default=[], action='append', metavar='START-END', help='mirror the RFCs '
+                            'numbered from START to END (both included), e.g. 1-9000. May be given several times')
+        parser.add_argument('-o', '--output', required=True, metavar='ARCHIVE', help='archive to create or extend')
+        add_fetching_arguments(parser)
+        parser.add_argument('--cache-dir', default=None, metavar='DIR', help='directory of the persistent response cache '
+                            '(default: $XDG_CACHE_HOME/rfcbibtex)')
+        parser.add_argument('--no-cache', action='store_true', help='neither read from nor write to the response cache')
+        parser.add_argument('--rfc-index', default=None, metavar='FILE_NAME', help='build the BibTex of RFCs from a local copy '
+                            'of the RFC Editor index (rfc-index.xml), instead of fetching them one by one')
+        self._parser = parser
+
+        return parser
+
+    def parse_args(self, args=None):
+        """ Parse and process command line args """
+        parser = self.build_parser()
+        args = parser.parse_args(args)
+        resolve_fetching_arguments(args, DatatrackerBackend)
+        self._inline_args = args.inline_args
+        self._in_file = args.files
+        self._archive = args.output
+        self._jobs = args.jobs
+        self._max_per_host = args.max_per_host
+        self._timeout = args.timeout
+        self._retries = args.retries
+        self._deadline = args.deadline
+        self._rate = args.rate
+        self._cache_dir = args.cache_dir
+        self._no_cache = args.no_cache
+        self._rfc_index = args.rfc_index
+
+        self._rfc_ranges = []
+        for rfc_range in args.rfc_range:
+            match = self.RFC_RANGE_RE.match(rfc_range.strip())
+            if match is None or int(match.group('start')) > int(match.group('end')):
+                parser.error('invalid RFC range: {}'.format(rfc_range))
+            self._rfc_ranges.append((int(match.group('start')), int(match.group('end'))))
+
+        if not (self._inline_args or self._in_file or self._rfc_ranges):
+            parser.error('nothing to mirror: give IDs, -f or --rfc-range')
+
+        return self
+
+
+class DaemonParser(object):
+    """
+    Argument parser of the `rfcbibtex daemon` subcommand.
+    """
+    @property
+    def socket(self):
+        return self._socket
+
+    @property
+    def stop(self):
+        return self._stop
+
+    @property
+    def entries(self):
+        return self._entries
+
+    @property
+    def max_per_host(self):
+        return self._max_per_host
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @property
+    def no_cache(self):
+        return self._no_cache
+
+    @property
+    def cache_ttl(self):
+        return self._cache_ttl
+
+    @property
+    def negative_ttl(self):
+        return self._negative_ttl
+
+    def build_parser(self):
+        """Setup and return the argument parser."""
+        parser = argparse.ArgumentParser(prog='rfcbibtex daemon', description='Serve the rfcbibtex command lines of the '
+                                         'current user from a resident process, which keeps its connections to datatracker '
+                                         'open and the recent entries in memory. While it runs, rfcbibtex forwards its '
+                                         'command line to it (unless RFCBIBTEX_NO_DAEMON is set).')
+        parser.add_argument('--socket', default=None, metavar='PATH', help='Unix socket to listen on (default: '
+                            '$RFCBIBTEX_SOCKET, or rfcbibtex.sock in $XDG_RUNTIME_DIR)')
+        parser.add_argument('--stop', action='store_true', help='stop the daemon listening on the socket')
+        parser.add_argument('--entries', default=MemoryCache.DEFAULT_CAPACITY, type=int, metavar='N',
+                            help='number of responses kept in memory (default: %(default)s)')
+        parser.add_argument('--max-per-host', default=Fetcher.DEFAULT_MAX_PER_HOST, type=int, metavar='N',
+                            help='maximum number of idle connections kept open to each host (default: %(default)s)')
+        parser.add_argument('--timeout', default=Fetcher.DEFAULT_TIMEOUT, type=float, metavar='SECONDS',
+                            help='abandon a request after this many seconds without a response (default: %(default)s)')
+        parser.add_argument('--cache-dir', default=None, metavar='DIR', help='directory of the persistent response cache '
+                            '(default: $XDG_CACHE_HOME/rfcbibtex)')
+        parser.add_argument('--no-cache', action='store_true', help='only keep the responses in memory')
+        parser.add_argument('--cache-ttl', default=ResponseCache.DEFAULT_TTL, type=int, metavar='SECONDS',
+                            help='number of seconds during which a draft without an explicit version is used before being '
+                            'revalidated (default: %(default)s)')
+        parser.add_argument('--negative-ttl', default=ResponseCache.DEFAULT_NEGATIVE_TTL, type=int, metavar='SECONDS',
+                            help='number of seconds during which an ID unknown to datatracker is reported as an error '
+                            'without asking again (default: %(default)s)')
+        self._parser = parser
+
+        return parser
+
+    def parse_args(self, args=None):
+        """ Parse and process command line args """
+        parser = self.build_parser()
+        args = parser.parse_args(args)
+        self._socket = args.socket
+        self._stop = args.stop
+        self._entries = args.entries
+        self._max_per_host = args.max_per_host
+        self._timeout = args.timeout
+        self._cache_dir = args.cache_dir
+        self._no_cache = args.no_cache
+        self._cache_ttl = args.cache_ttl
+        self._negative_ttl = args.negative_ttl
 
         return self
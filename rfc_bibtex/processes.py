@@ -0,0 +1,125 @@
+import itertools
+import os
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from .parser import Parser
+from .rfc_bibtex import RFCBibtex, open_cache, open_fetcher, open_sources
+from .stats import Stats
+
+# the RFCBibtex of a worker process, created by _init_worker()
+_worker = None
+
+
+def _init_worker(args, rfc_bibtex_class, processes):
+    global _worker
+    parser = Parser().parse_args(args)
+    stats = Stats(keep_spans=parser.stats or parser.trace_json is not None)
+    backend, rfc_index = open_sources(parser)
+    # each worker has its own connections and cache connection, which go away with the process
+    # (the cache commits every write), and its share of the request rate
+    _worker = rfc_bibtex_class(fetcher=open_fetcher(parser, stats, share=processes), cache=open_cache(parser),
+                               rfc_index=rfc_index, stats=stats, backend=backend, follow_updates=parser.follow_updates,
+                               output_format=parser.output_format)
+
+
+def _process_chunk(jobs):
+    """
+    Obtain the entries of a chunk of (position, id) jobs in the worker, and return the (id, entry)
+    pairs of each position, the errors, and the new spans (if kept), phases and counters of the
+    worker's stats.
+    """
+    stats = _worker.stats
+    spans_before, phases_before, counters_before = len(stats.spans), stats.phases, Counter(stats.counters)
+    _worker.errors.clear()
+
+    positions = {id_name: position for position, id_name in jobs}
+    results = {position: [] for position, _ in jobs}
+    position = None
+    for id_name, entry in _worker.iter_entries([id_name for _, id_name in jobs]):
+        # the successor of an updated draft (see --follow-updates) comes right after it
+        position = positions.get(id_name, position)
+        results[position].append((id_name, entry))
+
+    phases = OrderedDict()
+    for phase, (count, total, maximum) in stats.phases.items():
+        count_before, total_before, _ = phases_before.get(phase, (0, 0.0, 0.0))
+        if count > count_before:
+            # the maximum of the worker so far, which the merge takes the max() of all the same
+            phases[phase] = (count - count_before, total - total_before, maximum)
+    return (results, _worker.errors, stats.spans[spans_before:], phases, Counter(stats.counters) - counters_before,
+            stats.origin)
+
+
+class ShardedRFCBibtex(RFCBibtex):
+    """
+    RFCBibtex spreading the fetching and post-processing of its ids over a pool of worker processes,
+    for lists of thousands of ids which would keep a single interpreter busy. Each worker builds its
+    own fetcher (with its share of the request rate), connection pool and cache connection from the
+    command line args, and runs a plain RFCBibtex.
+
+    The ids are split into chunks of documents, the spellings of a document going to the same chunk
+    so that it is fetched once. The entries are merged back in the order of the ids, along with the
+    errors and the stats of the workers.
+    """
+    DEFAULT_CHUNK_SIZE = 64
+
+    @property
+    def processes(self):
+        return self._processes
+
+    def __init__(self, id_names=None, in_file_names=None, out_file_name=None, processes=None, worker_args=None,
+                 worker_class=RFCBibtex, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        """
+        processes defaults to the number of CPUs, worker_args are the command line args configuring the
+        workers (by default, the ones of a plain run) and worker_class is the RFCBibtex they run.
+        The other keyword arguments are the ones of RFCBibtex.
+        """
+        super().__init__(id_names, in_file_names, out_file_name, **kwargs)
+        self._processes = processes or os.cpu_count() or 1
+        self._worker_args = worker_args if worker_args is not None else []
+        self._worker_class = worker_class
+        self._chunk_size = chunk_size
+
+    def _chunks(self, id_names):
+        """Split the ids into lists of (position, id) jobs, holding all of the spellings of their documents."""
+        documents = OrderedDict() # canonical id -> jobs of its spellings
+        for position, id_name in enumerate(id_names):
+            documents.setdefault(self.canonical_id(id_name), []).append((position, id_name))
+        documents = list(documents.values())
+        # small lists are spread over every worker too
+        size = max(1, min(self._chunk_size, -(-len(documents) // self._processes)))
+        return [list(itertools.chain.from_iterable(documents[start:start + size]))
+                for start in range(0, len(documents), size)]
+
+    def _iter_entries(self, id_names):
+        results = {} # position -> its (id, entry) pairs
+        next_position = 0
+        # documents with an entry, to which the successors of updated drafts are not added again
+        emitted = {self.canonical_id(id_name) for id_name in id_names}
+        executor = ProcessPoolExecutor(self._processes, initializer=_init_worker,
+                                       initargs=(self._worker_args, self._worker_class, self._processes))
+        futures = []
+        try:
+            # the chunks complete roughly in order, the entries are yielded as soon as the ones before them are
+            futures.extend(executor.submit(_process_chunk, chunk) for chunk in self._chunks(id_names))
+            for future in futures:
+                chunk_results, errors, spans, phases, counters, origin = future.result()
+                self._errors.extend(errors)
+                self._stats.merge(spans, counters, origin, phases=phases)
+                results.update(chunk_results)
+                while next_position in results:
+                    for id_name, entry in results.pop(next_position):
+                        if id_name != id_names[next_position]:
+                            # the successor of an updated draft, which may have been cited or added by another chunk
+                            key = self.canonical_id(id_name)
+                            if key in emitted:
+                                continue
+                            emitted.add(key)
+                        yield id_name, entry
+                    next_position += 1
+        finally:
+            # the consumer may have stopped early (shutdown(cancel_futures=True) needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
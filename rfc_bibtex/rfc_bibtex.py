@@ -1,24 +1,35 @@
 #!/usr/bin/env python3
 import sys, re
-import pathlib
 import os, os.path
-from urllib import request
 import urllib.error
 import random
+import itertools
+import time
+from collections import Counter, OrderedDict
 
-from .exceptions import BadIDNameException, URLFetchException, BadRFCNumberException
-from .utils import print_red, print_yellow
+from .exceptions import BadIDNameException, URLFetchException, BadRFCNumberException, ManifestException, ArchiveFormatException
+from .utils import print_red, print_yellow, atomic_open
 from .parser import Parser
-from .errors import Errors
+from .errors import Errors, BibEntry
+from .fetcher import Fetcher
+from .scheduler import RequestScheduler
+from .backends import ArchiveBackend, Backend, DatatrackerBackend, MirrorBackend
+from .cache import ResponseCache, RFCIndexSync
+from .bibfile import BibFile
+from .entry import ParsedEntry
+from .formats import BibtexFormat, get_format
+from .idset import IdSet
+from .stats import Stats
 
 
 class RFCBibtex(object):
 
-    URL_FMT_RFC_OR_DRAFT_WITHOUT_ID       = 'https://datatracker.ietf.org/doc/{id_name}/bibtex/'
-    URL_FMT_DRAFT                         = 'https://datatracker.ietf.org/doc/{id_name}/{version}/bibtex/'
     URL_ERROR_MSG = 'Failed to read RFC or Internt-Draft resource'
     ID_TYPE_RFC   = 'rfc'
     ID_TYPE_INTERNET_DRAFT = 'draft'
+    # kept for backwards compatibility, the URLs are built by the backend (datatracker by default)
+    URL_FMT_RFC_OR_DRAFT_WITHOUT_ID       = DatatrackerBackend.BASE_URL + Backend.PATH_FMT
+    URL_FMT_DRAFT                         = DatatrackerBackend.BASE_URL + Backend.VERSION_PATH_FMT
 
     USER_AGENTS = ['Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36',
                    'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36',
@@ -32,185 +43,659 @@ class RFCBibtex(object):
                    'Mozilla/5.0 (Windows NT 6.3; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36',
                    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36']
 
-    # If scanning a .aux file, look for RFC or Internet draft citations with this regular expression
+    # Simple single-citation regular expressions, kept for backwards compatibility. Files are scanned
+    # by the CitationScanner, which also handles multiple keys, other citation commands and \input.
     AUX_CITATION_RE = re.compile(r"\\citation\{((rfc.+?)|(draft-.+?))\}",re.I)
     TEX_CITATION_RE = re.compile(r"\\cite\{((rfc.+?)|(draft-.+?))\}",re.I)
     TEX_EXTENSION = '.tex'
     AUX_EXTENSION = '.aux'
-
-    def __init__(self, id_names=None, in_file_names=None, out_file_name=None):
+    BCF_EXTENSION = '.bcf'
+
+    RFC_ID_RE = re.compile(ID_TYPE_RFC, re.I)
+    DRAFT_ID_RE = re.compile(ID_TYPE_INTERNET_DRAFT, re.I)
+    # RFC5246, rfc5246, rfc-5246 and "RFC 5246" are the same document
+    RFC_NUMBER_RE = re.compile(r'rfc[\s_-]*(?P<number>\d+)$', re.I)
+    # the ids which can be used as BibTex keys as they are (e.g. not "RFC 5246")
+    BIBTEX_KEY_RE = re.compile(r'[^\s,{}"#%\\]+$')
+
+    # HTTP statuses meaning that the document does not exist, whose failures are cached (see ResponseCache.put_failure())
+    MISSING_STATUSES = (404, 410)
+    # status of the cached failures of the responses starting with URL_ERROR_MSG, which datatracker answers with a 200
+    ERROR_PAGE_STATUS = 200
+
+    # what to do with the drafts which have been updated (see --follow-updates)
+    FOLLOW_UPDATES_ADD = 'add'
+    FOLLOW_UPDATES_REPLACE = 'replace'
+
+    # input file name standing for the standard input, whose ids are streamed
+    STDIN_FILE_NAME = '-'
+    # number of recently fetched documents shared with their other spellings, when the ids are streamed
+    STREAM_SHARED_DOCUMENTS = 1024
+
+    def __init__(self, id_names=None, in_file_names=None, out_file_name=None, fetcher=None, cache=None, rfc_index=None, update=False,
+                 stats=None, prefetched=None, backend=None, follow_updates=None, output_format=None):
+        """
+        prefetched optionally maps canonical ids to the (completed) futures of their responses,
+        fetched beforehand (see fetch_responses()); those ids are not fetched again.
+        backend (see backends.py) is where the responses come from, datatracker by default; an
+        ArchiveBackend reads them from an offline archive instead.
+        follow_updates is None, or FOLLOW_UPDATES_ADD/FOLLOW_UPDATES_REPLACE to fetch the documents which
+        replaced updated drafts right away, and emit their entries after/instead of the drafts' entries.
+        output_format is the name of the format of the entries (see formats.FORMATS), BibTex by default.
+
+        If one of the input files is STDIN_FILE_NAME, the ids are streamed: they are read (from the
+        plain files and stdin, line by line) as the entries are fetched, and id_names is an iterator.
+        """
         if id_names is None:
             id_names = []
+        in_file_names = [str(in_file_name) for in_file_name in in_file_names or ()]
+        if stats is None:
+            stats = fetcher.stats if fetcher is not None and fetcher.stats is not None else Stats(keep_spans=False)
+        if backend is None:
+            backend = DatatrackerBackend()
+        if fetcher is None:
+            fetcher = default_fetcher(backend, stats)
 
-        self._id_names      = id_names
         self._out_file_name = out_file_name
-
-        self._id_name_err_list = []
-        self._remote_fetch_err_list = [] # (type, name, url)
-        self._urllib_err_list = [] # urllib errors when trying to access the urls
-
-        # list of provided draft ids that do not explicity declare a version
-        self._id_drafts_without_version_list = []
-
-        # TODO: this approach adds up a massive tech debt, but its reduction will be done during
-        #       the refactoring task
+        self._fetcher       = fetcher
+        self._cache         = cache
+        self._rfc_index     = rfc_index
+        self._update        = update
+        self._stats         = stats
+        self._prefetched    = prefetched
+        self._backend       = backend
+        self._follow_updates = follow_updates
+        # the RFCs numbered above it have not been published, as of a recently downloaded RFC index (None if unknown)
+        self._highest_rfc_number = self._get_highest_rfc_number()
+        # each response is parsed once, and serialized into this format
+        self._output_format = get_format(output_format) if output_format is not None else BibtexFormat()
+
+        # canonical id of the documents which replaced updated drafts -> future of their response,
+        # fetched by the fetching threads as soon as they see that a draft has been updated
+        self._successors = {}
+
+        # urls whose content may change over time (i.e. drafts without a version), these are not cached permanently
+        self._revisable_urls = set()
+
+        # BibEntry records of the invalid ids, fetching errors and warnings, bucketed by category
         self._errors = Errors()
 
         self._draft_version_re = re.compile(r"(?P<id>.+)-(?P<version>\d+)$", re.I)
-        self._bibtex_id_re = re.compile(r"@\w+{(?P<bibtex_id>.+?),")
-        self._updated_id_re = re.compile(r'%% You should probably cite (?P<new_id>(rfc|draft)[-\d\w]+)')
 
-        if in_file_names:
+        self._stream = self.STDIN_FILE_NAME in in_file_names
+        if self._stream:
+            self._id_names = self._iter_unique_ids(itertools.chain(
+                id_names, itertools.chain.from_iterable(self._iter_ids_from_file(name) for name in in_file_names)))
+        else:
+            self._id_names = list(id_names)
             for in_file_name in in_file_names:
                 self._id_names += self._read_ids_from_file(in_file_name)
+            self._id_names = self._remove_duplicate_ids_preserving_order(self._id_names)
+
+    def _get_highest_rfc_number(self):
+        """
+        Record the highest RFC number of the RFC index (if any) in the cache, and return the one of the
+        most recent RFC index downloaded less than the cache's negative_ttl ago, or None. Without a
+        cache, only the RFC index of this run is considered, with the default negative_ttl.
+        """
+        sync = None
+        if self._rfc_index is not None and self._rfc_index.synced_at is not None and len(self._rfc_index):
+            sync = RFCIndexSync(self._rfc_index.highest_rfc_number, self._rfc_index.synced_at)
+        if self._cache is not None:
+            if sync is not None:
+                self._cache.put_rfc_index_sync(sync)
+            sync = self._cache.get_rfc_index_sync()
+        elif sync is not None and time.time() - sync.synced_at >= ResponseCache.DEFAULT_NEGATIVE_TTL:
+            sync = None
+        return sync.highest_rfc_number if sync is not None else None
+
+    @property
+    def id_names(self):
+        """The ids given inline and read from the inputs, without duplicates (an iterator when they are read from stdin)"""
+        return self._id_names
+
+    @property
+    def out_file_name(self):
+        return self._out_file_name
+
+    @property
+    def backend(self):
+        return self._backend
 
-        self._id_names = self._remove_duplicate_ids_preserving_order(self._id_names)
+    @property
+    def output_format(self):
+        """The format (e.g. BibtexFormat) of the entries"""
+        return self._output_format
+
+    @property
+    def errors(self):
+        """Errors holding the records of the ids which failed or deserve a warning"""
+        return self._errors
+
+    @property
+    def urllib_errors(self):
+        """URLs which could not be fetched (HTTP error statuses, network errors and timeouts)"""
+        return [record.url for record in self._errors.get(Errors.URL_ERROR)]
+
+    @property
+    def stats(self):
+        """Stats object holding the timing spans and counters of this instance"""
+        return self._stats
+
+    def add_hook(self, hook):
+        """
+        Register hook to be called with each timing span and counter increment, as they happen
+        (possibly from the fetching threads). See Stats for the events passed to it.
+        """
+        self._stats.add_hook(hook)
+
+    def remove_hook(self, hook):
+        self._stats.remove_hook(hook)
     
     def _remove_duplicate_ids_preserving_order(self, id_names):
-        id_names_without_duplicates = set()
+        """
+        Remove the ids whose key (see entry_key()) only differs from the one of a previous id by its
+        case, since BibTex keys are case-insensitive (earlier versions only removed the exact
+        duplicates, writing an entry for each case). Other spellings of the same document are kept
+        (and fetched only once).
+        """
+        return list(self._iter_unique_ids(id_names))
+
+    @classmethod
+    def _iter_unique_ids(cls, id_names):
+        """Lazy version of _remove_duplicate_ids_preserving_order(), whose memory does not grow with the input"""
         # local var resoluiton is faster
-        add_meth = id_names_without_duplicates.add
-        return [x for x in id_names if not (x in id_names_without_duplicates or add_meth(x))]
+        add_meth = IdSet().add
+        entry_key = cls.entry_key
+        return (x for x in id_names if add_meth(entry_key(x)))
+
+    @classmethod
+    def canonical_id(cls, id_name):
+        """Normalized form of id_name, which is the same for every spelling of a document id"""
+        match = cls.RFC_NUMBER_RE.match(id_name)
+        if match:
+            return 'rfc' + match.group('number')
+        return id_name.lower()
+
+    @classmethod
+    def entry_key(cls, id_name):
+        """Key of the entry of id_name: id_name itself, or its canonical id if it is not a valid BibTex key"""
+        if cls.BIBTEX_KEY_RE.match(id_name):
+            return id_name
+        return cls.canonical_id(id_name)
 
     @property
     def bibtex_entries(self):
-        # remove Nones (errors returned by urllib), so that they're not printed
-        return filter(None.__ne__, [self.get_bibtex_from_id(id_name) for id_name in self._id_names])
+        """
+        Lazy iterator over the BibTex entries, in the order of the ids. Each entry is yielded as
+        soon as it (and every entry before it) has been fetched.
+        """
+        for _, entry in self._iter_own_entries():
+            # skip Nones (errors returned by urllib), so that they're not printed
+            if entry is not None:
+                yield entry
+
+    def _iter_entries(self, id_names):
+        """Yield (id_name, entry) for each valid id, entry being None if it could not be obtained."""
+        # the responses are fetched concurrently, but processed in the order of the ids,
+        # so that both the output and the error lists follow the input order
+        #
+        # Each document is fetched once: the ids whose canonical form has already been submitted
+        # (other spellings, or the version an unversioned draft resolved to) are not fetched, but
+        # take the outcome of the first one, which is always handed back before them. Outcomes are
+        # only kept while more ids of the same document are to come.
+        remaining = Counter(self.canonical_id(id_name) for id_name in id_names)
+        shared = {} # canonical id -> future of its first fetch
+        submitted = set()
+        # documents with an entry, to which the successors of updated drafts are not added again
+        emitted = set(remaining)
+
+        def jobs():
+            for record in self._resolve_ids(id_names):
+                key = record.canonical_id
+                coalesced = key in submitted or key in shared
+                if remaining[key] > 1:
+                    submitted.add(key)
+                yield record, coalesced
+
+        for (record, coalesced), future in self._imap(self._fetch_job, jobs(), url_of=lambda job: job[0].url):
+            key = record.canonical_id
+            if coalesced:
+                future = shared[key]
+                self._stats.incr('coalesced')
+            elif remaining[key] > 1:
+                shared[key] = future
+
+            if record.url in self._revisable_urls:
+                self._share_with_version(record, future, remaining, shared)
+            remaining[key] -= 1
+            if not remaining[key]:
+                shared.pop(key, None)
+            entry = self._get_bibtex_from_response(record, future.result)
+            if self._follow_updates is not None and record.new_id is not None:
+                yield from self._follow_update(record, entry, emitted)
+            else:
+                yield record.id_name, entry
+
+    def _iter_own_entries(self):
+        """_iter_entries() over the ids of this instance, streaming them if they are read from stdin"""
+        if self._stream:
+            return self._iter_streamed_entries(self._id_names)
+        return self._iter_entries(self._id_names)
+
+    def _iter_streamed_entries(self, id_names):
+        """
+        Like _iter_entries(), for an iterator of ids of unknown length (e.g. read from stdin), which is
+        consumed as the entries are fetched, in bounded memory. The ids of a document are coalesced with
+        its spellings among the last STREAM_SHARED_DOCUMENTS documents, older ones are obtained again
+        (through the cache).
+        """
+        submitted = OrderedDict() # canonical ids of the recently submitted documents, least recent first
+        shared = OrderedDict() # canonical id -> future of its fetch, for the recently submitted documents
+        emitted = set() # successors of updated drafts with an entry
+
+        def remember(recent, key, value):
+            recent[key] = value
+            recent.move_to_end(key)
+            if len(recent) > self.STREAM_SHARED_DOCUMENTS:
+                recent.popitem(last=False)
+
+        def jobs():
+            for record in self._resolve_ids(id_names):
+                coalesced = record.canonical_id in submitted
+                remember(submitted, record.canonical_id, True)
+                yield record, coalesced
+
+        for (record, coalesced), future in self._imap(self._fetch_job, jobs(), url_of=lambda job: job[0].url):
+            key = record.canonical_id
+            if not coalesced:
+                remember(shared, key, future)
+                get_response = future.result
+            elif key in shared:
+                self._stats.incr('coalesced')
+                get_response = shared[key].result
+            else:
+                # the first spelling of the document is too far behind, it has been forgotten
+                get_response = lambda: self._get_response(record)
+
+            entry = self._get_bibtex_from_response(record, get_response)
+            if self._follow_updates is not None and record.new_id is not None:
+                yield from self._follow_update(record, entry, emitted)
+            else:
+                yield record.id_name, entry
+
+    def _imap(self, func, items, url_of):
+        """Fetcher.imap(), within the concurrency and batch size of the backend"""
+        return self._fetcher.imap(func, items, url_of=url_of, max_jobs=self._backend.max_concurrency,
+                                  batch_size=self._backend.batch_size)
+
+    def _fetch_job(self, job):
+        """Return the response of the (record, coalesced) job, or None if it takes the one of another id."""
+        record, coalesced = job
+        if coalesced:
+            return None
+        response = self._get_response(record)
+        if self._follow_updates is not None:
+            self._prefetch_successor(response)
+        return response
 
-    def _read_ids_from_plain_file(self, filename):
-        with open(filename, 'r') as f:
-            return [line.strip() for line in f ]
+    def _prefetch_successor(self, response):
+        """
+        If the response says that its draft has been updated, fetch the document which replaced it,
+        from the fetching thread, so that it is ready by the time the draft is post-processed.
+        """
+        if '%%' not in response:
+            return
+        match = ParsedEntry.UPDATED_ID_RE.search(response)
+        if match is None:
+            return
+        successor = self._new_successor_record(match.group('new_id'), match.group('new_id'))
+        if successor is None:
+            return
+        from concurrent.futures import Future
+        future = Future()
+        # setdefault is atomic: a single thread fetches each successor, the others wait for its future
+        if self._successors.setdefault(successor.canonical_id, future) is not future:
+            return
+        try:
+            future.set_result(self._get_response(successor))
+        except Exception as e:
+            future.set_exception(e)
 
-    def _read_ids_from_aux_file(self, filename):
-        with open(filename, 'r') as f:
-            rfcs = list([m.group(1) for line in f for m in [self.AUX_CITATION_RE.search(line)] if m])
-        return rfcs
+    def _new_successor_record(self, id_name, new_id):
+        """
+        Return the BibEntry of the document new_id, keyed by id_name, or None if new_id is not a
+        valid id (e.g. an RFC published after the last RFC index): the draft is then kept as is.
+        Unlike _new_record(), nothing is recorded in the errors.
+        """
+        record = BibEntry(id_name, canonical_id=self.canonical_id(new_id))
+        if self._id_is_rfc(new_id):
+            record.id_type = self.ID_TYPE_RFC
+            try:
+                record.url = self._get_url_from_rfc_id(new_id)
+            except BadRFCNumberException:
+                return None
+        elif self._id_is_draft(new_id):
+            record.id_type = self.ID_TYPE_INTERNET_DRAFT
+            record.url = self._get_url_from_draft_id(new_id)
+        else:
+            return None
+        return record
+
+    def _get_successor_entry(self, successor):
+        """Return the entry of the successor BibEntry, from its prefetched response when there is one."""
+        if successor is None:
+            return None
+        future = self._successors.get(successor.canonical_id)
+        self._stats.incr('followed_updates')
+        if future is None:
+            # not prefetched, i.e. the draft's response was fetched by someone else
+            return self._get_bibtex_from_response(successor, lambda: self._get_response(successor))
+        return self._get_bibtex_from_response(successor, future.result)
+
+    def _follow_update(self, record, entry, emitted):
+        """
+        Yield the (id_name, entry) pairs of the BibEntry of an updated draft: when adding, its entry
+        followed by the one of the document which replaced it (unless that document already has an
+        entry), when replacing, the entry of that document under the draft's key (or the draft's entry
+        if it could not be obtained).
+        """
+        if self._follow_updates == self.FOLLOW_UPDATES_REPLACE:
+            successor_entry = self._get_successor_entry(self._new_successor_record(record.id_name, record.new_id))
+            yield record.id_name, successor_entry if successor_entry is not None else entry
+            return
+
+        yield record.id_name, entry
+        key = self.canonical_id(record.new_id)
+        if key not in emitted:
+            emitted.add(key)
+            successor = self._new_successor_record(record.new_id, record.new_id)
+            if successor is not None:
+                yield record.new_id, self._get_successor_entry(successor)
+
+    def _share_with_version(self, record, future, remaining, shared):
+        """
+        The latest version of a draft was fetched for record: share it with the explicitly
+        versioned id of that same version, if it is yet to come.
+        """
+        if future.exception() is not None:
+            return
+        entry = ParsedEntry.parse(future.result())
+        if entry is None or entry.updated_id is not None:
+            # the entries of drafts which have been replaced differ from the ones of their versions
+            return
+        number = entry.get('number')
+        if number is not None:
+            key = self.canonical_id(number.strip('{}"'))
+            if remaining[key] and key not in shared:
+                shared[key] = future
+
+    def _resolve_ids(self, id_names):
+        """Yield the BibEntry of each valid id, skipping (and recording) the invalid ones."""
+        for id_name in id_names:
+            record = self._new_record(id_name)
+            if record.status is BibEntry.PENDING:
+                yield record
 
-    def _read_ids_from_tex_file(self, filename):
+    def _read_ids_from_plain_file(self, filename):
         with open(filename, 'r') as f:
-            rfcs = list([m.group(1) for line in f for m in [self.TEX_CITATION_RE.search(line)] if m])
-        return rfcs
+            return [line.strip() for line in f ]
 
-    def _read_ids_from_file(self, filename):
+    def _iter_ids_from_file(self, filename):
         """
-        Read identifiers from a text file. 
-        If the text file is a LaTeX .aux file, parse the \citation{} command.
-        If the text file is a LaTeX .tex file, parse the corresponding .aux file
+        Yield the ids of a file, like _read_ids_from_file(). Plain files and stdin (STDIN_FILE_NAME)
+        are read line by line, as the ids are consumed.
         """
-        filename = pathlib.Path(filename)
-
-        if filename.suffix == self.AUX_EXTENSION:
-            return self._read_ids_from_aux_file(filename)
-        elif filename.suffix == self.TEX_EXTENSION:
-            return self._read_ids_from_tex_file(filename)
+        if filename == self.STDIN_FILE_NAME:
+            for line in sys.stdin:
+                yield line.strip()
+        elif os.path.splitext(filename)[1] in (self.TEX_EXTENSION, self.AUX_EXTENSION, self.BCF_EXTENSION):
+            yield from self._read_ids_from_file(filename)
         else:
-            # file containing one ID per line 
-            return self._read_ids_from_plain_file(filename)
+            with open(filename, 'r') as f:
+                for line in f:
+                    yield line.strip()
+
+    def _read_ids_from_file(self, filename, inputs=None):
+        """
+        Read identifiers from a text file.
+        If the text file is a LaTeX .aux, .tex or biblatex .bcf file, extract the cited identifiers.
+        If inputs is a set, the real paths of the files read (the file and the ones it includes) are added to it.
+        """
+        filename = str(filename)
+
+        with self._stats.span('read_input', filename):
+            if os.path.splitext(filename)[1] in (self.TEX_EXTENSION, self.AUX_EXTENSION, self.BCF_EXTENSION):
+                # imported on demand, like the other modules which are only needed by some runs
+                from .scanner import CitationScanner
+                return CitationScanner().scan_file(filename, inputs)
+            else:
+                # file containing one ID per line
+                if inputs is not None:
+                    inputs.add(os.path.realpath(filename))
+                return self._read_ids_from_plain_file(filename)
 
     def _generate_bibtex(self, outfile=sys.stdout):
-        for entry in self.bibtex_entries:
-            output = '{}\n'.format(entry)
-            print(output, file=outfile)
+        output_format = self._output_format
+        print(output_format.HEADER, end='', file=outfile)
+        separator = ''
+        for id_name, entry in self._iter_own_entries():
+            if entry is None:
+                continue
+            with self._stats.span('write', id_name):
+                # flush, so that whoever reads the output can start processing it right away
+                print(separator + entry + output_format.TERMINATOR, end='', file=outfile, flush=True)
+            separator = output_format.SEPARATOR
+        print(output_format.FOOTER, end='', file=outfile, flush=True)
 
     def _print_errors(self):
-        if self._id_name_err_list:
+        if Errors.INVALID_ID in self._errors:
             print_red('The following identifier names are invalid:', file=sys.stderr)
-            for id_name in self._id_name_err_list:
-                print_red('\t* {}'.format(id_name), file=sys.stderr)
+            for record in self._errors.get(Errors.INVALID_ID):
+                if record.id_type == self.ID_TYPE_RFC:
+                    print_red('\t* {} (no RFC has been published with this number)'.format(record.id_name), file=sys.stderr)
+                else:
+                    print_red('\t* {}'.format(record.id_name), file=sys.stderr)
 
-        if self._remote_fetch_err_list:
+        if Errors.REMOTE_FETCH_ERROR in self._errors:
             print_red('Errors in fetching from the following URLs:\n', file=sys.stderr)
-            for err_tuple in self._remote_fetch_err_list:
-                type_name = err_tuple[0] if err_tuple[0] == self.ID_TYPE_RFC else 'Internet Draft'
-                print('\t* Type:{} | ID:{} | URL:{}'.format(type_name, err_tuple[1], err_tuple[2]), file=sys.stderr)
+            for record in self._errors.get(Errors.REMOTE_FETCH_ERROR):
+                type_name = record.id_type if record.id_type == self.ID_TYPE_RFC else 'Internet Draft'
+                print('\t* Type:{} | ID:{} | URL:{}'.format(type_name, record.id_name, record.url), file=sys.stderr)
 
     def _print_no_explicit_version_warnings(self):
-        if self._id_drafts_without_version_list:
+        if Errors.DRAFT_WITHOUT_VERSION in self._errors:
             print_yellow('WARNING', file=sys.stderr)
             print_yellow('If the draft version is not explicitly defined in the draft ID, the latest one will be obtained,\n'
                   'which may be an RFC ID, in case the draft has been assigned one. If the latter happens, you will receive a\n'
                   'separate warning of the drafts that are now in the RFC stage. It is highly recommended to define the draft ID\n'
                   'explicitly, since there may be major document differences between two draft versions.\n', file=sys.stderr)
             print_yellow('No explicit version has been defined for following draft ids:', file=sys.stderr)
-            for draft_id in self._id_drafts_without_version_list:
-                print_yellow('\t* {}'.format(draft_id.lower()), file=sys.stderr)
+            for record in self._errors.get(Errors.DRAFT_WITHOUT_VERSION):
+                print_yellow('\t* {}'.format(record.id_name.lower()), file=sys.stderr)
 
     def _print_urllib_errors(self):
-        if self._urllib_err_list:
+        if Errors.URL_ERROR in self._errors:
             print_red('Errors when fetching the following URLs: ', file=sys.stderr)
-            for url in self._urllib_err_list:
-                print_red('\t* {}'.format(url), file=sys.stderr)
-    
-    def _print_updated_id_errors(self):
-        # TODO: find a more elegant way of testing if an iterator has elements
-        rfc_errors = list(self._errors.draft_updated_to_rfc)
-        draft_errors = list(self._errors.draft_updated_to_draft)
+            for record in self._errors.get(Errors.URL_ERROR):
+                print_red('\t* {}'.format(record.url), file=sys.stderr)
 
-        if draft_errors:
+    def _print_updated_id_errors(self):
+        if Errors.UPDATED_TO_DRAFT in self._errors:
             print_yellow('The following drafts have been updated to a new draft version:', file=sys.stderr)
-            for updated_entity in draft_errors:
+            for updated_entity in self._errors.draft_updated_to_draft:
                 print_yellow('\t* {} --> {}'.format(updated_entity.old_id.lower(), updated_entity.new_id), file=sys.stderr)
 
-        if rfc_errors:
+        if Errors.UPDATED_TO_RFC in self._errors:
             print_red('The following drafts have been updated to an RFC:', file=sys.stderr)
-            for updated_entity in rfc_errors:
+            for updated_entity in self._errors.draft_updated_to_rfc:
                 print_red('\t* {} --> {}'.format(updated_entity.old_id.lower(), updated_entity.new_id), file=sys.stderr)
 
+    def _updates_existing_file(self):
+        return (self._out_file_name is not None and self._update and self._output_format.BIB_FILE
+                and os.path.exists(self._out_file_name))
+
+    def _ids_missing_from(self, bib_file):
+        """The ids missing from bib_file, and the drafts without an explicit version (which may have changed since)"""
+        return [id_name for id_name in self._id_names
+                if self.entry_key(id_name) not in bib_file or self._id_is_draft_without_version(id_name)]
+
+    def read_ids(self, filename, inputs=None):
+        """
+        Read the ids of an input file, e.g. again after it changed. If inputs is a set, the real paths
+        of the files read (the file and the ones it includes) are added to it.
+        """
+        return self._read_ids_from_file(filename, inputs)
+
+    def unique_ids(self, id_names):
+        """List of the ids without duplicates, as the ones given to the constructor"""
+        return self._remove_duplicate_ids_preserving_order(id_names)
+
+    def iter_entries(self, id_names):
+        """
+        Lazy iterator over the (id, entry) pairs of the given ids (e.g. read again with read_ids()),
+        in order, the entry being None for the ids which could not be obtained. With follow_updates,
+        the successor of an updated draft follows it. The errors are recorded in errors, and printed
+        by print_reports().
+        """
+        return self._iter_entries(id_names)
+
+    def definitive_failures(self):
+        """
+        Set of the ids recorded in errors which would fail again: the invalid ones, and the ones which
+        do not exist (see MISSING_STATUSES), unlike the ones which failed with a transient error.
+        """
+        failures = {record.id_name for record in self._errors.get(Errors.INVALID_ID)}
+        failures.update(record.id_name for record in self._errors.get(Errors.REMOTE_FETCH_ERROR))
+        failures.update(record.id_name for record in self._errors.get(Errors.URL_ERROR)
+                        if record.http_status in self.MISSING_STATUSES)
+        return failures
+
+    def existing_entries(self):
+        """
+        Dict of the entries of the existing output file (by key) which an update keeps, i.e. all but
+        the drafts without an explicit version, which may have changed since. Empty unless updating.
+        """
+        if not self._updates_existing_file():
+            return {}
+        bib_file = BibFile.read(self._out_file_name)
+        return {key: bib_file.get(key) for key in bib_file.keys if not self._id_is_draft_without_version(key)}
+
+    def planned_ids(self):
+        """List of the ids which generate_bibtex() obtains"""
+        if self._updates_existing_file():
+            return self._ids_missing_from(BibFile.read(self._out_file_name))
+        return list(self._id_names)
+
+    def fetch_responses(self):
+        """
+        Fetch the responses of the ids, without post-processing them, and return a dict mapping
+        the canonical id of each valid id to the completed future of its response.
+        """
+        responses = {}
+        records = self._resolve_ids(self._id_names)
+        for record, future in self._imap(self._get_response, records, url_of=lambda record: record.url):
+            responses[record.canonical_id] = future
+        return responses
+
+    def _update_bibtex(self):
+        """
+        Merge the entries into the existing output file. Only the ids missing from it, and the drafts
+        without an explicit version (which may have changed since), are obtained. The existing entries
+        are kept byte-for-byte, unless an updated draft differs from its current entry.
+        """
+        bib_file = BibFile.read(self._out_file_name)
+        id_names = self._ids_missing_from(bib_file)
+
+        for id_name, entry in self._iter_entries(id_names):
+            if entry is not None:
+                bib_file.set(self.entry_key(id_name), entry)
+
+        with self._stats.span('write', self._out_file_name), atomic_open(self._out_file_name) as out_file:
+            out_file.write(str(bib_file))
+
     def generate_bibtex(self):
-        if self._out_file_name is not None:
-            with open(self._out_file_name, 'w') as out_file:
+        if self._updates_existing_file():
+            self._update_bibtex()
+        elif self._out_file_name is not None:
+            with atomic_open(self._out_file_name) as out_file:
                 self._generate_bibtex(out_file)
         else:
             self._generate_bibtex(sys.stdout)
 
+        self.print_reports()
+
+    def print_reports(self):
+        """Print the errors and warnings of the ids obtained so far to stderr."""
+        if self._output_format.STRUCTURED_REPORTS:
+            import json
+            for report in self._errors.reports():
+                print(json.dumps(report), file=sys.stderr)
+            return
+
         # TODO: refactor error collection and printing
         self._print_no_explicit_version_warnings()
         self._print_updated_id_errors()
         self._print_errors()
         self._print_urllib_errors()
 
-    def _make_title_uppercase(self, response):
-        r = re.compile(r'(title = )({.*})')
-        res =  r.sub(r'\1{\2}', response)
-        return res
-
-    def _replace_bibtex_name_if_needed(self, response, id_name):
-        bibtex_id = self._get_id_from_bibtex(response)
-        if (self._id_is_rfc(id_name) or self._id_is_draft(id_name)):
-            new_response = re.sub(bibtex_id, id_name, response, count=1)
-            return new_response
-        else:
-            # id is neither RFC, nor draft, this should nenver happen
-            raise Exception("Unexpected entry id: {id_name}. Expecting either an RFC or a draft".format(id_name))
-    
-    def _collect_updated_ids(self, old_id, response):
-        match = self._updated_id_re.search(response)
-        if match:
-            new_id = match.group('new_id')
-            self._errors.add_updated_entity(old_id, new_id)
-    
     def get_bibtex_from_id(self, id_name):
-        try:
-            url, id_type, id_name = self._get_url_from_id_name(id_name)
-            response = self._get_response_from_url(url)
-            self._collect_updated_ids(id_name, response)
-            # override ids for drafts
-            response = self._replace_bibtex_name_if_needed(response, id_name)
-        except urllib.error.HTTPError:
-            self._urllib_err_list.append(url)
+        record = self._new_record(id_name)
+        if record.status is not BibEntry.PENDING:
             return None
-        except BadIDNameException:
+        return self._get_bibtex_from_response(record, lambda: self._get_response(record))
+
+    def _get_bibtex_from_response(self, record, get_response):
+        """
+        Post-process the response of a single BibEntry. get_response() either returns the
+        response text, or raises the error that occurred while fetching it.
+        """
+        try:
+            response = get_response()
+        except urllib.error.URLError as e:
+            # HTTP error statuses, as well as network errors and timeouts which persisted after the retries
+            record.http_status = getattr(e, 'code', None)
+            self._errors.add(Errors.URL_ERROR, record)
+            self._stats.incr('fetch_errors')
             return None
 
+        with self._stats.span('post_process', record.id_name):
+            return self._post_process_response(record, response)
+
+    def _post_process_response(self, record, response):
+        """
+        Parse the response once, then record whether the draft has been updated, use the id
+        as the key of the entry (see entry_key()) and brace its title.
+        """
         if response.startswith(self.URL_ERROR_MSG):
-            self._remote_fetch_err_list += [(id_type, id_name, url)]
+            self._errors.add(Errors.REMOTE_FETCH_ERROR, record)
             return None # None type objects will be ignored by the output
-        response = self._make_title_uppercase(response)
-        response = response.strip()
-        return response
+
+        entry = ParsedEntry.parse(response)
+        if entry is None:
+            # not a BibTex entry
+            return None
+        if entry.updated_id is not None:
+            self._errors.add_updated_entry(record, entry.updated_id)
+        entry.key = self.entry_key(record.id_name)
+        entry.brace_title()
+        record.status = BibEntry.OK
+        return self._output_format.format_entry(entry)
 
     def _get_url_from_rfc_id(self, rfc_id):
-        return self.URL_FMT_RFC_OR_DRAFT_WITHOUT_ID.format(id_name=rfc_id)
+        """
+        Raise BadRFCNumberException for the numbers which cannot be those of a published RFC: 0, and
+        the ones above the highest number of a recently downloaded RFC index.
+        """
+        match = self.RFC_NUMBER_RE.match(rfc_id)
+        if match:
+            number = int(match.group('number'))
+            if number == 0 or (self._highest_rfc_number is not None and number > self._highest_rfc_number):
+                raise BadRFCNumberException('no RFC has been published with the number {}'.format(number))
+        if match and not rfc_id[3:].isdigit():
+            # datatracker does not know about the spellings with a separator
+            rfc_id = 'rfc' + match.group('number')
+        return self._backend.url(rfc_id)
 
     def _get_url_from_draft_id(self, draft_id):
         match = self._draft_version_re.search(draft_id)
@@ -219,60 +704,256 @@ class RFCBibtex(object):
             # draft version has been found
             draft_id_without_version = match.group('id')
             draft_version = match.group('version')
-            return self.URL_FMT_DRAFT.format(id_name=draft_id_without_version, version=draft_version)
+            return self._backend.url(draft_id_without_version, draft_version)
         else:
-            self._id_drafts_without_version_list.append(draft_id)
-            return self.URL_FMT_RFC_OR_DRAFT_WITHOUT_ID.format(id_name=draft_id)
+            url = self._backend.url(draft_id)
+            self._revisable_urls.add(url)
+            return url
 
     @staticmethod
     def _id_is_draft(id_name):
-        return bool(re.match(RFCBibtex.ID_TYPE_INTERNET_DRAFT, id_name, re.I))
+        return RFCBibtex.DRAFT_ID_RE.match(id_name) is not None
     
+    def _id_is_draft_without_version(self, id_name):
+        return self._id_is_draft(id_name) and not self._draft_version_re.search(id_name)
+
     @staticmethod
     def _id_is_rfc(id_name):
-        return bool(re.match(RFCBibtex.ID_TYPE_RFC, id_name, re.I))
-    
-    def _get_id_from_bibtex(self, bibtex):
-        match = self._bibtex_id_re.search(bibtex)
-        if match:
-            return match.group('bibtex_id')
-        raise BadIDNameException('Could not parse id of the bibtex: {}'.format(bibtex))
-
-    def _get_url_from_id_name(self, id_name):
-        id_type = None # needed for error reporting
+        return RFCBibtex.RFC_ID_RE.match(id_name) is not None
 
+    def _new_record(self, id_name):
+        """
+        Return the BibEntry of id_name, with its type and URL. Invalid ids (including the numbers of
+        unpublished RFCs) and drafts without an explicit version are recorded in the corresponding
+        Errors category.
+        """
+        record = BibEntry(id_name, canonical_id=self.canonical_id(id_name))
         if self._id_is_rfc(id_name):
-            return self._get_url_from_rfc_id(id_name), self.ID_TYPE_RFC, id_name
+            record.id_type = self.ID_TYPE_RFC
+            try:
+                record.url = self._get_url_from_rfc_id(id_name)
+            except BadRFCNumberException:
+                # rejected without asking datatracker
+                self._errors.add(Errors.INVALID_ID, record)
+                self._stats.incr('rejected_rfc_numbers')
         elif self._id_is_draft(id_name):
-            return self._get_url_from_draft_id(id_name), self.ID_TYPE_RFC, id_name
+            record.id_type = self.ID_TYPE_INTERNET_DRAFT
+            record.url = self._get_url_from_draft_id(id_name)
+            if record.url in self._revisable_urls:
+                self._errors.add(Errors.DRAFT_WITHOUT_VERSION, record)
         else:
             # we have an error in an id, but let's not fail the program
             # letting the valid names complete. We'll simply notify the user
             # of the error at the end.
-            self._id_name_err_list += [id_name]
-            raise BadIDNameException()
+            self._errors.add(Errors.INVALID_ID, record)
+        return record
+
+    def _get_response(self, record):
+        """
+        Return the response for the BibEntry, built from the local RFC index when possible
+        and fetched from its URL otherwise.
+        """
+        if self._prefetched is not None:
+            future = self._prefetched.get(record.canonical_id)
+            if future is not None:
+                return future.result()
+        with self._stats.span('fetch', record.id_name):
+            if not self._backend.cacheable:
+                # e.g. the offline archive, which takes precedence over the RFC index
+                try:
+                    response = self._backend.get(record.url)[0]
+                except urllib.error.URLError:
+                    response = self._get_indexed_response(record)
+                    if response is None:
+                        raise
+                    return response
+                self._stats.incr('{}_hits'.format(self._backend.NAME))
+                return response
+            response = self._get_indexed_response(record)
+            if response is not None:
+                return response
+            return self._get_response_from_url(record.url)
+
+    def _get_indexed_response(self, record):
+        """Return the response for the BibEntry built from the local RFC index, or None if it is not indexed."""
+        if self._rfc_index is None or record.id_type != self.ID_TYPE_RFC:
+            return None
+        response = self._rfc_index.get_bibtex(record.id_name)
+        if response is not None:
+            self._stats.incr('rfc_index_hits')
+        return response
 
     def _get_response_from_url(self, url):
+        if self._cache is None:
+            return self._download(url)[0]
+
+        cached = self._cache.get(url)
+        if cached is not None and self._cache.is_fresh(cached):
+            self._stats.incr('cache_hits')
+            return cached.body
+
+        failure = self._cache.get_failure(url)
+        if failure is not None:
+            # the document did not exist a moment ago, do not ask again before the failure expires
+            self._stats.incr('negative_cache_hits')
+            if failure == self.ERROR_PAGE_STATUS:
+                return self.URL_ERROR_MSG
+            raise urllib.error.HTTPError(url, failure, 'Not Found (cached)', {}, None)
+        self._stats.incr('cache_misses')
+
+        headers = {}
+        if cached is not None:
+            # the cached response is stale, ask the server whether it has changed since
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            response, response_headers = self._download(url, headers)
+        except urllib.error.HTTPError as e:
+            if cached is not None and e.code == 304:
+                self._stats.incr('cache_revalidations')
+                self._cache.touch(url)
+                return cached.body
+            if e.code in self.MISSING_STATUSES:
+                self._cache.put_failure(url, e.code)
+            raise
+
+        if response.startswith(self.URL_ERROR_MSG):
+            self._cache.put_failure(url, self.ERROR_PAGE_STATUS)
+        else:
+            self._cache.put(url, response, response_headers.get('ETag'), response_headers.get('Last-Modified'),
+                            permanent=url not in self._revisable_urls)
+        return response
+
+    def _download(self, url, headers=None):
+        """Download the resource at url from the backend, returning its decoded body and the response headers."""
         uagent = random.choice(self.USER_AGENTS)
-        req = request.Request(
-            url,
-            data=None,
-            headers={
-                'User-Agent': uagent
-            }
-        )
-        with request.urlopen(url) as response:
-            return response.read().decode()
-
-def run():
+        req_headers = {'User-Agent': uagent}
+        if headers:
+            req_headers.update(headers)
+        return self._backend.get(url, req_headers, self._fetcher)
+
+def open_cache(parser):
+    """Open the response cache selected by the parsed command line args, or return None."""
+    # offline runs never go to the network, so there is nothing to cache
+    if parser.no_cache or parser.offline is not None:
+        return None
+    import sqlite3
+    try:
+        return ResponseCache(parser.cache_dir, ttl=parser.cache_ttl, refresh=parser.refresh, negative_ttl=parser.negative_ttl)
+    except (OSError, sqlite3.Error) as e:
+        print_yellow('Could not open the cache, continuing without it: {}'.format(e), file=sys.stderr)
+        return None
+
+def open_fetcher(parser, stats, share=1):
+    """
+    Return the Fetcher configured by the parsed command line args, to be closed by the caller.
+    share is the number of fetchers (e.g. of worker processes) splitting the request rate.
+    """
+    scheduler = RequestScheduler(retries=parser.retries, deadline=parser.deadline, rate=parser.rate / share, stats=stats)
+    return Fetcher(jobs=parser.jobs, max_per_host=parser.max_per_host, timeout=parser.timeout, scheduler=scheduler,
+                   stats=stats)
+
+def default_fetcher(backend, stats):
+    """The Fetcher of the instances which are not given one: a single job, within the rate of the backend"""
+    return Fetcher(scheduler=RequestScheduler(rate=backend.rate, stats=stats), stats=stats)
+
+def open_sources(parser):
+    """
+    Return the Backend (to be closed by the caller) and the RFCIndex (or None) selected by the parsed
+    command line args.
+    """
+    # the modules only needed by some runs are imported on demand, to keep the startup fast
+    if parser.offline is not None:
+        from .archive import Archive
+        try:
+            backend = ArchiveBackend(Archive(parser.offline))
+        except (OSError, ArchiveFormatException) as e:
+            parser.error('cannot open the archive: {}'.format(e))
+    elif parser.mirror is not None:
+        backend = MirrorBackend(parser.mirror, max_concurrency=parser.max_per_host, rate=parser.rate)
+    else:
+        backend = DatatrackerBackend(max_concurrency=parser.max_per_host, rate=parser.rate)
+
+    rfc_index = None
+    if parser.rfc_index is not None:
+        from .rfc_index import RFCIndex
+        rfc_index = RFCIndex.from_file(parser.rfc_index)
+    return backend, rfc_index
+
+def generate(parser, fetcher, cache, stats, rfc_bibtex_class=RFCBibtex):
+    """
+    Generate the BibTex requested by the parsed command line args with the given fetcher and cache,
+    which are left open. Shared by run() and by the daemon, which keeps them across runs.
+    """
+    backend, rfc_index = open_sources(parser)
+
+    if parser.manifest is not None:
+        # imported here, since batch imports this module
+        from .batch import Batch
+        try:
+            projects = Batch.read_manifest(parser.manifest)
+        except (OSError, ManifestException) as e:
+            parser.error(str(e))
+        obj = Batch(projects, fetcher=fetcher, cache=cache, rfc_index=rfc_index, update=parser.update, stats=stats,
+                    backend=backend, follow_updates=parser.follow_updates, output_format=parser.output_format,
+                    rfc_bibtex_class=rfc_bibtex_class)
+    elif parser.processes > 1:
+        from .processes import ShardedRFCBibtex
+        obj = ShardedRFCBibtex(parser.inline_args, parser.in_files, parser.out_file, processes=parser.processes,
+                               worker_args=parser.args, worker_class=rfc_bibtex_class, fetcher=fetcher, cache=cache,
+                               rfc_index=rfc_index, update=parser.update, stats=stats, backend=backend,
+                               follow_updates=parser.follow_updates, output_format=parser.output_format)
+    elif parser.watch:
+        from .watch import Watcher
+        # the inputs are read by the watcher
+        obj = Watcher(rfc_bibtex_class(parser.inline_args, None, parser.out_file, fetcher=fetcher, cache=cache,
+                                       rfc_index=rfc_index, update=parser.update, stats=stats, backend=backend,
+                                       follow_updates=parser.follow_updates, output_format=parser.output_format),
+                      parser.in_files)
+    else:
+        obj = rfc_bibtex_class(parser.inline_args, parser.in_files, parser.out_file, fetcher=fetcher, cache=cache,
+                               rfc_index=rfc_index, update=parser.update, stats=stats, backend=backend,
+                               follow_updates=parser.follow_updates, output_format=parser.output_format)
+    if parser.watch:
+        obj.watch()
+    else:
+        obj.generate_bibtex()
+
+    if parser.stats:
+        stats.print_summary(file=sys.stderr)
+    if parser.trace_json is not None:
+        stats.write_trace(parser.trace_json)
+    backend.close()
+
+def run(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    # subcommands, imported here since they import this module
+    if args[:1] == ['mirror']:
+        from .mirror import run_mirror
+        return run_mirror(args[1:])
+    if args[:1] == ['daemon']:
+        from .daemon import run_daemon
+        return run_daemon(args[1:])
+
     parser = Parser()
-    parser = parser.parse_args()
+    parser = parser.parse_args(args)
 
-    if len(sys.argv) < 2:
+    if not args:
         parser.print_help()
 
-    obj = RFCBibtex(parser.inline_args, parser.in_files, parser.out_file)
-    obj.generate_bibtex()
+    stats = Stats(keep_spans=parser.stats or parser.trace_json is not None)
+    fetcher = open_fetcher(parser, stats)
+    cache = open_cache(parser)
+    try:
+        generate(parser, fetcher, cache, stats)
+    finally:
+        fetcher.close()
+        if cache is not None:
+            cache.close()
 
 if __name__ == '__main__':
     run()
@@ -0,0 +1,125 @@
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+
+
+class RFCIndex(object):
+    """
+    Index of the RFCs listed in an rfc-index.xml file, as published by the RFC Editor
+    (https://www.rfc-editor.org/rfc-index.xml). It allows building the BibTex of every
+    listed RFC locally, in the same format as the one returned by datatracker, without
+    any network access.
+    """
+    RFC_NUMBER_RE = re.compile(r'rfc(?P<number>\d+)$', re.I)
+    MONTHS = {'january': 'jan', 'february': 'feb', 'march': 'mar', 'april': 'apr', 'may': 'may', 'june': 'jun',
+              'july': 'jul', 'august': 'aug', 'september': 'sep', 'october': 'oct', 'november': 'nov', 'december': 'dec'}
+    LATEX_SPECIAL_CHARS_RE = re.compile(r'([{}%&$#_])')
+
+    @classmethod
+    def from_file(cls, filename):
+        """Load the index from an rfc-index.xml file, streaming through it."""
+        entries = {}
+        for _, element in ElementTree.iterparse(str(filename)):
+            if cls._tag(element) == 'rfc-entry':
+                entry = cls._parse_entry(element)
+                if entry is not None:
+                    entries[entry['number']] = entry
+                element.clear()
+        return cls(entries, synced_at=os.path.getmtime(str(filename)))
+
+    def __init__(self, entries, synced_at=None):
+        """
+        entries maps an RFC number (int) to the dict of its fields, as built by _parse_entry().
+        synced_at is the time the index was downloaded (the modification time of its file), if known.
+        """
+        self._entries = entries
+        self._synced_at = synced_at
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, rfc_id):
+        return self._get_entry(rfc_id) is not None
+
+    @property
+    def highest_rfc_number(self):
+        return max(self._entries, default=0)
+
+    @property
+    def synced_at(self):
+        return self._synced_at
+
+    @staticmethod
+    def _tag(element):
+        # strip the XML namespace, if any
+        return element.tag.rsplit('}', 1)[-1]
+
+    @classmethod
+    def _children(cls, element, tag):
+        return [child for child in element if cls._tag(child) == tag]
+
+    @classmethod
+    def _child_text(cls, element, tag):
+        for child in cls._children(element, tag):
+            return ' '.join(''.join(child.itertext()).split())
+        return None
+
+    @classmethod
+    def _parse_entry(cls, element):
+        match = cls.RFC_NUMBER_RE.match(cls._child_text(element, 'doc-id') or '')
+        if not match:
+            return None
+
+        number = int(match.group('number'))
+        date = (cls._children(element, 'date') or [None])[0]
+        formats = cls._children(element, 'format')
+        abstract = (cls._children(element, 'abstract') or [None])[0]
+
+        return {
+            'number': number,
+            'title': cls._child_text(element, 'title'),
+            'authors': [cls._child_text(author, 'name') for author in cls._children(element, 'author')],
+            'year': cls._child_text(date, 'year') if date is not None else None,
+            'month': cls._child_text(date, 'month') if date is not None else None,
+            'pages': formats and cls._child_text(formats[0], 'page-count'),
+            'abstract': ' '.join(' '.join(''.join(p.itertext()).split()) for p in abstract) if abstract is not None else None,
+            'doi': cls._child_text(element, 'doi') or '10.17487/RFC{:04d}'.format(number),
+        }
+
+    def _get_entry(self, rfc_id):
+        match = self.RFC_NUMBER_RE.match(rfc_id)
+        if not match:
+            return None
+        return self._entries.get(int(match.group('number')))
+
+    def _escape(self, text):
+        return self.LATEX_SPECIAL_CHARS_RE.sub(r'\\\1', text.replace('\\', '\\textbackslash '))
+
+    def get_bibtex(self, rfc_id):
+        """Return the BibTex of the RFC with the given id (e.g. rfc5246), or None if it is not indexed."""
+        entry = self._get_entry(rfc_id)
+        if entry is None:
+            return None
+
+        number = entry['number']
+        lines = ['@misc{{rfc{},'.format(number),
+                 '\tseries =\t{Request for Comments},',
+                 '\tnumber =\t{},'.format(number),
+                 '\thowpublished =\t{{RFC {}}},'.format(number),
+                 '\tpublisher =\t{RFC Editor},',
+                 '\tdoi =\t\t{{{}}},'.format(entry['doi']),
+                 '\turl =\t\t{{https://rfc-editor.org/rfc/rfc{}.txt}},'.format(number)]
+        if entry['authors']:
+            lines.append('\tauthor =\t{{{}}},'.format(' and '.join(self._escape(author) for author in entry['authors'] if author)))
+        if entry['title']:
+            lines.append('\ttitle =\t\t{{{{{}}}}},'.format(self._escape(entry['title'])))
+        if entry['pages']:
+            lines.append('\tpagetotal =\t{},'.format(entry['pages']))
+        if entry['year']:
+            lines.append('\tyear =\t\t{},'.format(entry['year']))
+        if entry['month']:
+            lines.append('\tmonth =\t\t{},'.format(self.MONTHS.get(entry['month'].lower(), entry['month'])))
+        if entry['abstract']:
+            lines.append('\tabstract =\t{{{}}},'.format(self._escape(entry['abstract'])))
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
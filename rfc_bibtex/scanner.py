@@ -0,0 +1,106 @@
+import mmap
+import os.path
+import re
+
+
+class CitationScanner(object):
+    """
+    Single-pass scanner extracting the RFC and Internet Draft keys cited in LaTeX files.
+
+    Each file is memory-mapped and tokenized with one combined regular expression, which
+    finds every citation command of a line (not just the first one), with any number of
+    optional arguments and comma-separated keys. It understands:
+
+    * .tex files: \\cite, \\citep, \\parencite, \\autocite, \\nocite, \\cites (and other natbib and
+      biblatex variants), ignoring comments and following \\input, \\include and \\subfile
+    * .aux files: \\citation and biblatex's \\abx@aux@cite
+    * .bcf files: biblatex's <bcf:citekey> elements
+    """
+    ID_RE = re.compile(r'(rfc.+|draft-.+)$', re.I)
+
+    # \\ and \% are matched (and ignored), so that the % in them is not taken as the start of a comment
+    TEX_TOKEN_RE = re.compile(rb'''
+        \\[\\%]
+        | %[^\n]*
+        | \\(?P<command>(?!bibcite)[A-Za-z]*cite[A-Za-z]*)\*?
+          (?P<arguments>(?:\s*\[[^\]]*\])*(?:\s*\{[^}]*\}(?:\s*\[[^\]]*\])*)*)
+        | \\(?:input|include|subfile)\s*\{(?P<input>[^}]+)\}
+        ''', re.X)
+    AUX_TOKEN_RE = re.compile(rb'\\(?:citation|abx@aux@cite(?:\{[^}]*\})?)\{(?P<keys>[^}]+)\}')
+    BCF_TOKEN_RE = re.compile(rb'<bcf:citekey\b[^>]*>(?P<keys>[^<]+)</bcf:citekey>')
+    GROUP_RE = re.compile(rb'\{([^}]*)\}')
+
+    TEX_EXTENSION = '.tex'
+    AUX_EXTENSION = '.aux'
+    BCF_EXTENSION = '.bcf'
+    EXTENSIONS = (TEX_EXTENSION, AUX_EXTENSION, BCF_EXTENSION)
+
+    def scan_file(self, filename, visited=None):
+        """
+        Return the list of RFC and draft keys cited in filename, in order of appearance. If visited
+        is a set, the real paths of the files read (filename and the files it includes) are added to it.
+        """
+        filename = str(filename)
+        if visited is None:
+            visited = set()
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == self.AUX_EXTENSION:
+            visited.add(os.path.realpath(filename))
+            return list(self._scan_keys(filename, self.AUX_TOKEN_RE))
+        elif extension == self.BCF_EXTENSION:
+            visited.add(os.path.realpath(filename))
+            return list(self._scan_keys(filename, self.BCF_TOKEN_RE))
+        return list(self._scan_tex(filename, visited))
+
+    @staticmethod
+    def _map(filename):
+        """Return the contents of the file, memory-mapped unless it is empty (which mmap refuses)."""
+        with open(filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _ids_from_keys(self, keys):
+        for key in keys.decode('utf-8', 'replace').split(','):
+            key = key.strip()
+            if self.ID_RE.match(key):
+                yield key
+
+    def _scan_keys(self, filename, token_re):
+        data = self._map(filename)
+        try:
+            for match in token_re.finditer(data):
+                yield from self._ids_from_keys(match.group('keys'))
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def _resolve_input(self, name, including_file):
+        """Find the file of an \\input{name}, relative to the including file or to the working directory."""
+        candidates = [name] if os.path.splitext(name)[1] else [name + self.TEX_EXTENSION, name]
+        for directory in (os.path.dirname(including_file), ''):
+            for candidate in candidates:
+                path = os.path.join(directory, candidate)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def _scan_tex(self, filename, visited):
+        real_path = os.path.realpath(filename)
+        if real_path in visited:
+            return
+        visited.add(real_path)
+
+        data = self._map(filename)
+        try:
+            for match in self.TEX_TOKEN_RE.finditer(data):
+                if match.group('command') is not None:
+                    for group in self.GROUP_RE.finditer(match.group('arguments')):
+                        yield from self._ids_from_keys(group.group(1))
+                elif match.group('input') is not None:
+                    included = self._resolve_input(match.group('input').decode('utf-8', 'replace').strip(), filename)
+                    if included is not None:
+                        yield from self._scan_tex(included, visited)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
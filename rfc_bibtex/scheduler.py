@@ -0,0 +1,153 @@
+import random
+import threading
+import time
+import urllib.error
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket limiting the request rate, which adapts to the server:
+    the rate is halved whenever the server throttles the requests and grows back
+    additively (up to the initial rate) with each successful request.
+    """
+    MIN_RATE = 0.5
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def __init__(self, rate, burst=None):
+        self._max_rate = rate
+        self._rate = rate
+        self._burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self._burst
+        self._last = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            # reserve a token, waiting for it to become available if it is not yet
+            self._tokens -= 1
+            wait = max(-self._tokens / self._rate, self._not_before - now)
+        if wait > 0:
+            time.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        """The server asked to slow down, optionally telling for how many seconds to pause."""
+        with self._lock:
+            self._rate = max(self.MIN_RATE, self._rate / 2)
+            if retry_after:
+                self._not_before = max(self._not_before, time.monotonic() + retry_after)
+
+    def succeed(self):
+        with self._lock:
+            self._rate = min(self._max_rate, self._rate + 1 / self._rate)
+
+
+class RequestScheduler(object):
+    """
+    Runs requests with retries (exponential backoff with full jitter, honoring Retry-After),
+    an optional overall deadline and an optional adaptive rate limit.
+    Transient failures are retried: network errors and the RETRY_STATUS_CODES. A request whose
+    Retry-After is longer than MAX_BACKOFF fails instead, rather than pausing every request.
+    """
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF = 0.5
+    MAX_BACKOFF = 30
+    DEFAULT_RATE = 10
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    THROTTLE_STATUS_CODES = (429, 503)
+
+    @property
+    def retries(self):
+        """Number of retries made so far"""
+        return self._retry_count
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, deadline=None, rate=DEFAULT_RATE, stats=None):
+        """
+        deadline is the number of seconds after which no more requests are sent (None for no deadline),
+        rate the maximum number of requests per second (None or 0 to not limit it).
+        If stats (a Stats object) is given, the retries and throttling responses are counted in it.
+        """
+        self._retries = retries
+        self._backoff = backoff
+        self._deadline = time.monotonic() + deadline if deadline is not None else None
+        self._rate_limiter = TokenBucket(rate) if rate else None
+        self._retry_count = 0
+        self._stats = stats
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_retry_after(error):
+        """Seconds to wait according to the Retry-After header of the HTTPError, if any."""
+        value = error.headers.get('Retry-After') if error.headers is not None else None
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        # HTTP dates are rare, and email is slow to import
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _check_deadline(self, url, delay=0):
+        if self._deadline is not None and time.monotonic() + delay > self._deadline:
+            raise urllib.error.URLError('deadline exceeded before fetching {}'.format(url))
+
+    def call(self, func, url):
+        """
+        Return func(), which requests url, retrying it on transient errors. The last error is
+        raised when the retries are exhausted, and a URLError once the deadline is exceeded or
+        when the server asks to wait for more than MAX_BACKOFF seconds.
+        """
+        attempt = 0
+        while True:
+            self._check_deadline(url)
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+
+            retry_after = None
+            try:
+                result = func()
+            except urllib.error.HTTPError as e:
+                if e.code not in self.RETRY_STATUS_CODES or attempt >= self._retries:
+                    raise
+                retry_after = self._get_retry_after(e)
+                too_long = retry_after is not None and retry_after > self.MAX_BACKOFF
+                if e.code in self.THROTTLE_STATUS_CODES:
+                    if self._stats is not None:
+                        self._stats.incr('throttled')
+                    if self._rate_limiter is not None:
+                        # the pause applies to every request, it is not waited for if too long
+                        self._rate_limiter.throttle(None if too_long else retry_after)
+                if too_long:
+                    raise urllib.error.URLError('{} asked to retry in {:.0f} seconds'.format(url, retry_after))
+            except urllib.error.URLError:
+                if attempt >= self._retries:
+                    raise
+            else:
+                if self._rate_limiter is not None:
+                    self._rate_limiter.succeed()
+                return result
+
+            delay = retry_after if retry_after is not None else random.uniform(0, min(self.MAX_BACKOFF, self._backoff * 2 ** attempt))
+            self._check_deadline(url, delay)
+            with self._lock:
+                self._retry_count += 1
+            if self._stats is not None:
+                self._stats.incr('retries')
+            attempt += 1
+            time.sleep(delay)
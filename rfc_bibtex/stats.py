@@ -0,0 +1,201 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+
+class Stats(object):
+    """
+    Thread-safe collector of timing spans (one per id and phase) and of counters
+    (cache hits and misses, retries, connections, ...).
+
+    The spans are kept only if keep_spans is set (for --stats and --trace-json); otherwise only
+    their count, total and maximum duration per phase are, so that memory does not grow with
+    the number of ids, and the summary has no percentiles.
+
+    Hooks registered with add_hook() are called synchronously, from the thread which
+    produced the event, with a dict describing it:
+
+    * {'type': 'span', 'phase': ..., 'id': ..., 'start': ..., 'duration': ...}
+    * {'type': 'counter', 'name': ..., 'increment': ...}
+
+    start and duration are in seconds, start being relative to the creation of the Stats.
+    """
+    # upper bounds (in seconds) of the buckets of the latency histograms
+    HISTOGRAM_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float('inf'))
+    HISTOGRAM_WIDTH = 40
+
+    @property
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    @property
+    def spans(self):
+        """List of (phase, id, thread id, start, duration) tuples, empty unless keep_spans is set"""
+        with self._lock:
+            return list(self._spans)
+
+    @property
+    def keep_spans(self):
+        return self._keep_spans
+
+    @property
+    def phases(self):
+        """Dict of the (count, total, max) durations of the spans of each phase"""
+        with self._lock:
+            return OrderedDict((phase, tuple(aggregate)) for phase, aggregate in self._phases.items())
+
+    @property
+    def origin(self):
+        """perf_counter() at the creation of the Stats, which the starts of the spans are relative to"""
+        return self._origin
+
+    def __init__(self, keep_spans=True):
+        self._origin = time.perf_counter()
+        self._keep_spans = keep_spans
+        self._spans = []
+        # phase -> [count, total, max] of the durations of its spans
+        self._phases = OrderedDict()
+        self._counters = Counter()
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    @contextmanager
+    def span(self, phase, id_name=None):
+        """Time the enclosed block as the given phase of the processing of id_name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(phase, id_name, start - self._origin, time.perf_counter() - start)
+
+    def _aggregate(self, phase, count, total, maximum):
+        aggregate = self._phases.get(phase)
+        if aggregate is None:
+            self._phases[phase] = [count, total, maximum]
+        else:
+            aggregate[0] += count
+            aggregate[1] += total
+            aggregate[2] = max(aggregate[2], maximum)
+
+    def add_span(self, phase, id_name, start, duration):
+        with self._lock:
+            self._aggregate(phase, 1, duration, duration)
+            if self._keep_spans:
+                self._spans.append((phase, id_name, threading.get_ident(), start, duration))
+        for hook in self._hooks:
+            hook({'type': 'span', 'phase': phase, 'id': id_name, 'start': start, 'duration': duration})
+
+    def incr(self, name, increment=1):
+        with self._lock:
+            self._counters[name] += increment
+        for hook in self._hooks:
+            hook({'type': 'counter', 'name': name, 'increment': increment})
+
+    def merge(self, spans, counters, origin, phases=None):
+        """
+        Add the spans and counters of another Stats, e.g. of a worker process (perf_counter() is
+        system-wide), whose origin is given. If that Stats does not keep its spans, the (count,
+        total, max) of its phases (see phases) are given instead, or in addition.
+        """
+        shift = origin - self._origin
+        with self._lock:
+            for phase, (count, total, maximum) in (phases or {}).items():
+                self._aggregate(phase, count, total, maximum)
+        for phase, id_name, tid, start, duration in spans:
+            with self._lock:
+                if phases is None:
+                    self._aggregate(phase, 1, duration, duration)
+                if self._keep_spans:
+                    self._spans.append((phase, id_name, tid, start + shift, duration))
+            for hook in self._hooks:
+                hook({'type': 'span', 'phase': phase, 'id': id_name, 'start': start + shift, 'duration': duration})
+        for name, increment in counters.items():
+            self.incr(name, increment)
+
+    def _durations_by_phase(self):
+        durations = OrderedDict()
+        for phase, _, _, _, duration in self.spans:
+            durations.setdefault(phase, []).append(duration)
+        return durations
+
+    @staticmethod
+    def _percentile(sorted_values, fraction):
+        return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+    def summary(self):
+        """
+        Per-phase count, total, mean, median, 95th percentile and maximum durations, and the counters.
+        The percentiles are None unless the spans are kept.
+        """
+        durations_by_phase = self._durations_by_phase()
+        phases = OrderedDict()
+        for phase, (count, total, maximum) in self.phases.items():
+            durations = sorted(durations_by_phase.get(phase, ()))
+            phases[phase] = {
+                'count': count,
+                'total': total,
+                'mean': total / count,
+                'p50': self._percentile(durations, 0.5) if durations else None,
+                'p95': self._percentile(durations, 0.95) if durations else None,
+                'max': maximum,
+            }
+        return {'phases': phases, 'counters': self.counters}
+
+    def _histogram(self, durations):
+        counts = [0] * len(self.HISTOGRAM_BUCKETS)
+        for duration in durations:
+            for i, bound in enumerate(self.HISTOGRAM_BUCKETS):
+                if duration < bound:
+                    counts[i] += 1
+                    break
+        return counts
+
+    @staticmethod
+    def _format_seconds(seconds):
+        if seconds is None:
+            return '-'
+        return '{:.0f}ms'.format(seconds * 1000) if seconds < 1 else '{:.1f}s'.format(seconds)
+
+    def print_summary(self, file=sys.stderr):
+        summary = self.summary()
+        print('Timings:', file=file)
+        for phase, values in summary['phases'].items():
+            print('\t* {:<13} count={:<6} total={:<8} mean={:<8} p50={:<8} p95={:<8} max={}'.format(
+                  phase, values['count'], *(self._format_seconds(values[key]) for key in ('total', 'mean', 'p50', 'p95', 'max'))),
+                  file=file)
+
+        for phase, durations in self._durations_by_phase().items():
+            counts = self._histogram(durations)
+            print('Histogram of {} times:'.format(phase), file=file)
+            lower = 0
+            for bound, count in zip(self.HISTOGRAM_BUCKETS, counts):
+                if count:
+                    bar = '#' * max(1, round(self.HISTOGRAM_WIDTH * count / len(durations)))
+                    label = '>= {}'.format(self._format_seconds(lower)) if bound == float('inf') else '< {}'.format(self._format_seconds(bound))
+                    print('\t{:>9} {:<6} {}'.format(label, count, bar), file=file)
+                lower = bound
+
+        if summary['counters']:
+            print('Counters:', file=file)
+            for name, value in sorted(summary['counters'].items()):
+                print('\t* {}: {}'.format(name, value), file=file)
+
+    def write_trace(self, filename):
+        """Write the spans in the Trace Event format (viewable in chrome://tracing or Perfetto) and the counters as JSON."""
+        pid = os.getpid()
+        events = [{'name': phase, 'cat': 'rfcbibtex', 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': start * 1e6, 'dur': duration * 1e6, 'args': {'id': id_name}}
+                  for phase, id_name, tid, start, duration in self.spans]
+        import json
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'counters': self.counters, 'summary': self.summary()['phases']}, f)
@@ -1,13 +1,51 @@
+import os
+import os.path
+import stat
 import sys
+from contextlib import contextmanager
 
 def print_red(text, end='\n', file=sys.stdout):
-    print(f'\u001b[1m\u001b[31m{text}\u001b[0m', end=end)
+    print(f'\u001b[1m\u001b[31m{text}\u001b[0m', end=end, file=file)
 
 def print_green(text, end='\n', file=sys.stdout):
-    print(f'\u001b[1m\u001b[32m{text}\u001b[0m', end=end)
+    print(f'\u001b[1m\u001b[32m{text}\u001b[0m', end=end, file=file)
 
 def print_yellow(text, end='\n', file=sys.stdout):
-    print(f'\u001b[33m\u001b[33m{text}\u001b[0m', end=end)
+    print(f'\u001b[33m\u001b[33m{text}\u001b[0m', end=end, file=file)
 
 def print_magenta(text, end='\n', file=sys.stdout):
-    print(f'\u001b[35m\u001b[31m{text}\u001b[0m', end=end)
\ No newline at end of file
+    print(f'\u001b[35m\u001b[31m{text}\u001b[0m', end=end, file=file)
+
+
+@contextmanager
+def atomic_open(filename, mode='w'):
+    """
+    Open a temporary file next to filename for writing, and atomically rename it over filename
+    once the block exits without errors. Readers never see a partially written file.
+
+    An existing file keeps its permissions, a new one gets the ones open() would give it. If filename
+    is a symbolic link, the file it points to is replaced, and the link kept.
+    """
+    filename = os.path.realpath(filename)
+    try:
+        permissions = stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        permissions = None
+    directory, name = os.path.split(filename)
+    while True:
+        tmp_name = os.path.join(directory, '.{}.{}.tmp'.format(name, os.urandom(6).hex()))
+        try:
+            # created like open() does, the umask applies (reading it would change it for every thread)
+            fd = os.open(tmp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        if permissions is not None:
+            os.chmod(tmp_name, permissions)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        os.remove(tmp_name)
+        raise
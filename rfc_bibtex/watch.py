@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+
+from .utils import atomic_open, print_green
+
+
+class Watcher(object):
+    """
+    Keeps the output file of an RFCBibtex up to date with its input files, for live previews.
+
+    The inputs, and the files they \\input, are polled every interval seconds (their modification
+    time, size and inode, so that editors replacing the file on save are noticed too). Only the
+    inputs with a changed file are scanned again, only the ids without an entry yet are fetched
+    (except the invalid and missing ones, while the ones which failed with a transient error are
+    tried again at each poll), and the output is atomically rewritten when its contents change. The
+    entries already obtained are kept in memory, so removing a citation and adding it back fetches
+    nothing.
+    """
+    DEFAULT_INTERVAL = 0.5
+
+    @property
+    def interval(self):
+        return self._interval
+
+    def __init__(self, rfc_bibtex, in_file_names, interval=DEFAULT_INTERVAL):
+        """
+        rfc_bibtex holds the inline ids and the output file, in_file_names are the inputs to watch.
+        If rfc_bibtex updates its output, the entries of the existing output are reused.
+        """
+        self._rfc_bibtex = rfc_bibtex
+        self._inline_ids = list(rfc_bibtex.id_names)
+        self._in_file_names = [str(name) for name in in_file_names]
+        self._interval = interval
+
+        self._ids = {}        # input file -> ids read from it
+        self._signatures = {} # input file -> {path of a file it reads: its signature}
+        self._entries = {}    # id -> its entries (its own, and the one of its successor, see --follow-updates)
+        self._failed = set()  # ids which are invalid or do not exist, not fetched again while watching
+        self._written = None  # contents of the output, as last written
+
+        for key, entry in rfc_bibtex.existing_entries().items():
+            self._entries[key] = [entry.rstrip()]
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _has_changed(self, in_file_name):
+        signatures = self._signatures.get(in_file_name)
+        if signatures is None:
+            return True
+        return any(self._signature(path) != signature for path, signature in signatures.items())
+
+    def _scan(self, in_file_name):
+        """Read the ids of the input, recording the signatures of the files read."""
+        inputs = set()
+        try:
+            self._ids[in_file_name] = self._rfc_bibtex.read_ids(in_file_name, inputs)
+        except OSError:
+            # e.g. between the removal and the creation of the file by an editor, try again next time
+            self._ids[in_file_name] = []
+            inputs.add(os.path.realpath(in_file_name))
+        self._signatures[in_file_name] = {path: self._signature(path) for path in inputs}
+
+    def id_names(self):
+        """The ids of the inline args and of the inputs, as last scanned, without duplicates"""
+        id_names = list(self._inline_ids)
+        for in_file_name in self._in_file_names:
+            id_names += self._ids.get(in_file_name, [])
+        return self._rfc_bibtex.unique_ids(id_names)
+
+    def _fetch(self, id_names, cited):
+        """Obtain the entries of the ids, printing the warnings and errors of these ids only."""
+        rfc_bibtex = self._rfc_bibtex
+        rfc_bibtex.errors.clear()
+        requested = set(id_names)
+        current = None
+        for id_name, entry in rfc_bibtex.iter_entries(id_names):
+            if id_name in requested:
+                current = id_name
+                if entry is not None:
+                    self._entries[id_name] = [entry]
+            elif entry is not None and current in self._entries and rfc_bibtex.canonical_id(id_name) not in cited:
+                # the successor of an updated draft, which goes right after it
+                self._entries[current].append(entry)
+        # the transient failures (network errors, timeouts, 5xx) are tried again by the next refresh
+        self._failed.update(id_name for id_name in rfc_bibtex.definitive_failures() if id_name not in self._entries)
+        rfc_bibtex.print_reports()
+
+    def refresh(self):
+        """
+        Scan the changed inputs again, obtain the entries of the new ids, and rewrite the output if
+        its contents changed. Return whether the output was written.
+        """
+        for in_file_name in self._in_file_names:
+            if self._has_changed(in_file_name):
+                self._scan(in_file_name)
+
+        id_names = self.id_names()
+        missing = [id_name for id_name in id_names if id_name not in self._entries and id_name not in self._failed]
+        if missing:
+            self._fetch(missing, {self._rfc_bibtex.canonical_id(id_name) for id_name in id_names})
+
+        written_ids = [id_name for id_name in id_names if id_name in self._entries]
+        contents = self._rfc_bibtex.output_format.join(entry for id_name in written_ids for entry in self._entries[id_name])
+        if contents == self._written:
+            return False
+        with atomic_open(self._rfc_bibtex.out_file_name) as out_file:
+            out_file.write(contents)
+        self._written = contents
+        obtained = sum(id_name in self._entries for id_name in missing)
+        print_green('{}: {} IDs, {} new'.format(self._rfc_bibtex.out_file_name, len(written_ids), obtained), file=sys.stderr)
+        return True
+
+    def watch(self):
+        """Refresh the output every interval seconds, until interrupted (Ctrl+C)."""
+        try:
+            while True:
+                self.refresh()
+                time.sleep(self._interval)
+        except KeyboardInterrupt:
+            pass
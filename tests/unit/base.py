@@ -0,0 +1,33 @@
+"""
+Base classes shared by the unit tests.
+"""
+from rfc_bibtex.backends import DatatrackerBackend, FixtureBackend
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+
+RESPONSE_FMT = '@misc{{{name},\n\ttitle =\t\t{{{{Title of {name}}}}},\n}}\n'
+
+def fake_response(name):
+    """Minimal BibTex entry of the document name, keyed by it"""
+    return RESPONSE_FMT.format(name=name)
+
+def fake_datatracker(missing=(), default=fake_response, responses=None):
+    """
+    FixtureBackend that stands for datatracker (same URLs and concurrency) without going to the
+    network. The documents listed in missing fail with a 404, the others not in responses are
+    answered by default (see FixtureBackend), with fake_response() unless given.
+    """
+    fixture = {id_name: 404 for id_name in missing}
+    fixture.update(responses or {})
+    return FixtureBackend(fixture, base_url=DatatrackerBackend.BASE_URL,
+                          max_concurrency=DatatrackerBackend.DEFAULT_MAX_CONCURRENCY, default=default)
+
+class FakeRemoteRFCBibtex(RFCBibtex):
+    """
+    RFCBibtex fetching from fake_backend() instead of the backend it is given, for the code which
+    builds its own instances from a class (workers, mirrors, runs of the daemon).
+    """
+    def __init__(self, *args, backend=None, **kwargs):
+        super().__init__(*args, backend=self.fake_backend(), **kwargs)
+
+    def fake_backend(self):
+        return fake_datatracker()
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from rfc_bibtex.aio import AsyncRFCBibtex
+from rfc_bibtex.errors import Errors
+from .base import fake_datatracker, fake_response
+
+class SlowResponses(object):
+    """
+    Default responses of a fake datatracker, which take delay seconds to answer, recording the
+    highest number of simultaneous requests in max_active
+    """
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self._active_lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._active_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            return fake_response(name)
+        finally:
+            with self._active_lock:
+                self.active -= 1
+
+def run(coroutine):
+    """asyncio.run(), which is not available before Python 3.7"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+class AsyncRFCBibtexTestCase(unittest.TestCase):
+
+    def test_results_hold_entries_and_errors(self):
+        rfc_bibtex = AsyncRFCBibtex(backend=fake_datatracker(missing=('rfc2',)))
+        results = run(rfc_bibtex.entries(['rfc1', 'nothing', 'rfc2', 'RFC-1', 'rfc1']))
+
+        self.assertEqual([result.id_name for result in results], ['rfc1', 'nothing', 'rfc2', 'RFC-1'])
+        self.assertEqual([result.ok for result in results], [True, False, False, True])
+        self.assertEqual([result.error for result in results], [None, Errors.INVALID_ID, Errors.URL_ERROR, None])
+        self.assertTrue(results[3].entry.startswith('@misc{RFC-1,'))
+        self.assertEqual(sorted(rfc_bibtex.backend.requests), ['https://datatracker.ietf.org/doc/rfc1/bibtex/',
+                                                               'https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+
+    def test_concurrency_is_limited(self):
+        responses = SlowResponses(delay=0.02)
+        rfc_bibtex = AsyncRFCBibtex(['rfc{}'.format(number) for number in range(8)], concurrency=3,
+                                    backend=fake_datatracker(default=responses))
+
+        async def collect():
+            return [result async for result in rfc_bibtex.aiter_entries()]
+
+        self.assertEqual(len(run(collect())), 8)
+        self.assertEqual(responses.max_active, 3)
+
+    def test_closing_the_generator_cancels_the_remaining_fetches(self):
+        rfc_bibtex = AsyncRFCBibtex(['rfc{}'.format(number) for number in range(1, 11)], concurrency=1,
+                                    backend=fake_datatracker(default=SlowResponses(delay=0.05)))
+
+        async def first():
+            results = rfc_bibtex.aiter_entries()
+            result = await results.__anext__()
+            await results.aclose()
+            return result
+
+        self.assertTrue(run(first()).ok)
+        time.sleep(0.2)
+        self.assertLessEqual(len(rfc_bibtex.backend.requests), 2)
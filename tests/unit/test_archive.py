@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from rfc_bibtex.archive import Archive
+from rfc_bibtex.backends import ArchiveBackend
+from rfc_bibtex.exceptions import ArchiveFormatException
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.mirror import Mirror
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import FakeRemoteRFCBibtex
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.file_name = os.path.join(tmp_dir.name, 'mirror.rfcbib')
+
+    def open_archive(self):
+        archive = Archive(self.file_name)
+        self.addCleanup(archive.close)
+        return archive
+
+    def test_responses_are_read_back(self):
+        responses = {'rfc{}'.format(number): '@misc{{rfc{0},\n\ttitle = {{Été {0}}},\n}}\n'.format(number)
+                     for number in range(1, 2000)}
+        Archive.write(self.file_name, responses)
+        archive = self.open_archive()
+
+        self.assertEqual(len(archive), len(responses))
+        for key, response in responses.items():
+            self.assertEqual(archive.get(key), response)
+        self.assertEqual(dict(archive.items()), responses)
+        self.assertNotIn('rfc2000', archive)
+        self.assertIsNone(archive.get('draft-missing'))
+
+    def test_empty_archive(self):
+        Archive.write(self.file_name, {})
+        archive = self.open_archive()
+        self.assertEqual(len(archive), 0)
+        self.assertNotIn('rfc1', archive)
+
+    def test_other_files_are_rejected(self):
+        for content in (b'', b'@misc{rfc1,\n\ttitle = {{A title that is long enough}},\n}\n'):
+            with open(self.file_name, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(ArchiveFormatException):
+                Archive(self.file_name)
+
+    def test_corrupted_headers_are_rejected(self):
+        Archive.write(self.file_name, {'rfc1': '@misc{rfc1,\n}\n'})
+        with open(self.file_name, 'rb') as f:
+            data = f.read()
+        for count, slot_count in ((0, 0), (1, 12), (5, 8), (1, 16)):
+            with open(self.file_name, 'wb') as f:
+                f.write(Archive.HEADER.pack(Archive.MAGIC, count, slot_count) + data[Archive.HEADER.size:])
+            with self.assertRaises(ArchiveFormatException):
+                Archive(self.file_name)
+
+    def test_lookups_stop_on_a_full_table(self):
+        Archive.write(self.file_name, {'rfc1': '@misc{rfc1,\n}\n'})
+        with open(self.file_name, 'r+b') as f:
+            f.seek(Archive.HEADER.size)
+            f.write(Archive.SLOT.pack(1, Archive.HEADER.size, 1) * 8)
+        self.assertIsNone(self.open_archive().get('rfc2'))
+
+    def test_offline_entries_are_read_from_the_archive(self):
+        Archive.write(self.file_name, {'rfc1': '@misc{rfc1,\n\ttitle = {Archived},\n}\n'})
+        rfc_bibtex = RFCBibtex(['RFC-1', 'rfc2'], backend=ArchiveBackend(self.open_archive()))
+        entries = list(rfc_bibtex.bibtex_entries)
+
+        self.assertEqual(entries, ['@misc{RFC-1,\n\ttitle = {{Archived}},\n}'])
+        self.assertEqual(len(rfc_bibtex.urllib_errors), 1)
+        self.assertEqual(rfc_bibtex.stats.counters['archive_hits'], 1)
+
+    def test_mirror_only_fetches_the_missing_ids(self):
+        mirror = Mirror(['rfc1', 'RFC2', 'nothing'] + Mirror.rfc_ids(3, 4), fetcher=Fetcher(jobs=4),
+                        rfc_bibtex_class=FakeRemoteRFCBibtex)
+        self.assertEqual(mirror.build(self.file_name), 4)
+        self.assertEqual(mirror.failed, [('nothing', 'invalid id')])
+
+        mirror = Mirror(Mirror.rfc_ids(1, 5), rfc_bibtex_class=FakeRemoteRFCBibtex)
+        self.assertEqual(mirror.build(self.file_name), 1)
+        archive = self.open_archive()
+        self.assertEqual(sorted(key for key, _ in archive.items()), ['rfc1', 'rfc2', 'rfc3', 'rfc4', 'rfc5'])
+        self.assertIn('Title of RFC2', archive.get('rfc2'))
@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+
+from rfc_bibtex.backends import DatatrackerBackend, FixtureBackend, MirrorBackend
+from rfc_bibtex.cache import ResponseCache
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.parser import Parser
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+
+RFC_RESPONSE = '@misc{rfc5246,\n\ttitle =\t\t{{The TLS Protocol Version 1.2}},\n}\n'
+DRAFT_RESPONSE = '@techreport{I-D.ietf-tls-tls13,\n\ttitle =\t\t{{TLS 1.3}},\n}\n'
+
+class BackendsTestCase(unittest.TestCase):
+
+    def test_urls_and_keys(self):
+        backend = MirrorBackend('http://mirror.example/')
+        self.assertEqual(backend.url('rfc5246'), 'http://mirror.example/doc/rfc5246/bibtex/')
+        self.assertEqual(backend.url('Draft-IETF-TLS-TLS13', '21'), 'http://mirror.example/doc/Draft-IETF-TLS-TLS13/21/bibtex/')
+        self.assertEqual(backend.key('http://mirror.example/doc/Draft-IETF-TLS-TLS13/21/bibtex/'), 'draft-ietf-tls-tls13-21')
+        self.assertEqual(backend.key('http://mirror.example/doc/rfc5246/bibtex/'), 'rfc5246')
+        self.assertIsNone(backend.key('http://mirror.example/'))
+
+    def test_the_default_fetcher_follows_the_rate_of_the_backend(self):
+        rfc_bibtex = RFCBibtex(['rfc1'], backend=DatatrackerBackend(rate=5))
+        self.assertEqual(rfc_bibtex._fetcher.scheduler.rate_limiter.rate, 5)
+        rfc_bibtex = RFCBibtex(['rfc1'], backend=MirrorBackend('http://mirror.example/'))
+        self.assertIsNone(rfc_bibtex._fetcher.scheduler.rate_limiter)
+
+    def test_datatracker_urls_are_the_ones_of_the_url_formats(self):
+        backend = DatatrackerBackend()
+        self.assertEqual(backend.url('rfc5246'), RFCBibtex.URL_FMT_RFC_OR_DRAFT_WITHOUT_ID.format(id_name='rfc5246'))
+        self.assertEqual(backend.url('draft-ietf-tls-tls13', '21'),
+                         RFCBibtex.URL_FMT_DRAFT.format(id_name='draft-ietf-tls-tls13', version='21'))
+        self.assertEqual(MirrorBackend('http://mirror.example/').batch_size, 1)
+
+    def test_entries_and_errors_come_from_the_fixture(self):
+        backend = FixtureBackend({'rfc5246': RFC_RESPONSE, 'draft-ietf-tls-tls13-21': DRAFT_RESPONSE, 'rfc410': 410})
+        rfc_bibtex = RFCBibtex(['RFC 5246', 'draft-ietf-tls-tls13-21', 'rfc410', 'rfc404'], backend=backend,
+                               fetcher=Fetcher(jobs=4))
+        entries = list(rfc_bibtex.bibtex_entries)
+
+        self.assertEqual([entry.split(',')[0] for entry in entries], ['@misc{rfc5246', '@techreport{draft-ietf-tls-tls13-21'])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://fixture.invalid/doc/rfc410/bibtex/',
+                                                    'https://fixture.invalid/doc/rfc404/bibtex/'])
+        self.assertEqual(len(backend.requests), 4)
+
+    def test_fixture_answers_the_other_ids_with_its_default(self):
+        backend = FixtureBackend({'rfc410': 410}, default=lambda name: RFC_RESPONSE.replace('rfc5246', name))
+        rfc_bibtex = RFCBibtex(['RFC5246', 'draft-ietf-tls-tls13-21', 'rfc410'], backend=backend)
+
+        self.assertEqual([entry.split(',')[0] for entry in rfc_bibtex.bibtex_entries],
+                         ['@misc{RFC5246', '@misc{draft-ietf-tls-tls13-21'])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://fixture.invalid/doc/rfc410/bibtex/'])
+
+    def test_fixture_responses_are_cached(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            backend = FixtureBackend({'rfc5246': RFC_RESPONSE})
+            for _ in range(2):
+                cache = ResponseCache(cache_dir)
+                list(RFCBibtex(['rfc5246', 'rfc404'], backend=backend, cache=cache).bibtex_entries)
+                cache.close()
+        self.assertEqual(backend.requests, ['https://fixture.invalid/doc/rfc5246/bibtex/',
+                                            'https://fixture.invalid/doc/rfc404/bibtex/'])
+
+    def test_fetching_options_default_to_the_backend(self):
+        parser = Parser().parse_args(['rfc1'])
+        self.assertEqual((parser.max_per_host, parser.rate), (DatatrackerBackend.DEFAULT_MAX_CONCURRENCY,
+                                                              DatatrackerBackend.DEFAULT_RATE))
+        parser = Parser().parse_args(['--mirror', 'http://mirror.example', 'rfc1'])
+        self.assertEqual((parser.max_per_host, parser.rate), (MirrorBackend.DEFAULT_MAX_CONCURRENCY, 0))
+        parser = Parser().parse_args(['--mirror', 'http://mirror.example', '--rate', '5', '--max-per-host', '2', 'rfc1'])
+        self.assertEqual((parser.max_per_host, parser.rate), (2, 5))
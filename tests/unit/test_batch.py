@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from rfc_bibtex.batch import Batch
+from rfc_bibtex.bibfile import BibFile
+from rfc_bibtex.exceptions import ManifestException
+from rfc_bibtex.fetcher import Fetcher
+from .base import fake_datatracker
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        # records the downloads of every instance, i.e. of the plan and of all of the projects
+        self.backend = fake_datatracker()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def write_manifest(self, projects):
+        return self.write('manifest.json', json.dumps({'projects': projects}))
+
+    def run_batch(self, manifest, **kwargs):
+        batch = Batch(Batch.read_manifest(manifest), backend=self.backend, **kwargs)
+        with redirect_stderr(StringIO()):
+            batch.generate_bibtex()
+        return batch
+
+    def keys(self, name):
+        return BibFile.read(os.path.join(self.tmp_dir, name)).keys
+
+    def test_overlapping_projects_are_fetched_once(self):
+        self.write('a/ids.txt', 'rfc1\nrfc2\ndraft-x-01\n')
+        self.write('b/ids.txt', 'RFC2\nrfc3\nrfc1\n')
+        manifest = self.write_manifest([
+            {'files': ['a/ids.txt'], 'output': 'a/refs.bib'},
+            {'files': ['b/ids.txt'], 'ids': ['rfc-3', 'nothing'], 'output': 'b/refs.bib'},
+        ])
+        batch = self.run_batch(manifest, fetcher=Fetcher(jobs=4))
+
+        self.assertEqual(self.keys('a/refs.bib'), ['rfc1', 'rfc2', 'draft-x-01'])
+        self.assertEqual(self.keys('b/refs.bib'), ['rfc-3', 'RFC2', 'rfc3', 'rfc1'])
+        self.assertEqual(len(self.backend.requests), 4)
+        self.assertEqual([record.id_name for record in batch.projects[1].errors.get(batch.projects[1].errors.INVALID_ID)],
+                         ['nothing'])
+
+    def test_projects_updating_their_output_only_fetch_missing_ids(self):
+        self.write('a/ids.txt', 'rfc1\nrfc2\n')
+        self.write('a/refs.bib', '@misc{rfc1,\n\ttitle = {{Kept}},\n}\n')
+        manifest = self.write_manifest([{'files': ['a/ids.txt'], 'output': 'a/refs.bib', 'update': True}])
+        self.run_batch(manifest)
+
+        self.assertEqual(self.keys('a/refs.bib'), ['rfc1', 'rfc2'])
+        self.assertEqual(self.backend.requests, ['https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+
+    def test_invalid_manifests_are_rejected(self):
+        for manifest in ('[]', '{"projects": [{"files": []}]}', '{"projects": [{"output": "a.bib", "out": 1}]}', '{'):
+            with self.assertRaises(ManifestException):
+                Batch.read_manifest(self.write('manifest.json', manifest))
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from rfc_bibtex.bibfile import BibFile
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import fake_datatracker
+
+BIB = ('@misc{rfc1,\n\ttitle =\t\t{{One}},\n\tabstract =\t{nested {braces}\n@ at line start},\n}\n\n'
+       '%% You should probably cite rfc8446 instead of this I-D.\n\n'
+       '@techreport{draft-a,\n\ttitle =\t\t{{A}},\n}\n\n')
+
+class BibFileTestCase(unittest.TestCase):
+    def test_unmodified_file_is_reproduced_byte_for_byte(self):
+        bib_file = BibFile(BIB)
+        self.assertEqual(str(bib_file), BIB)
+        self.assertEqual(bib_file.keys, ['rfc1', 'draft-a'])
+
+    def test_entries_are_replaced_in_place_and_added_at_the_end(self):
+        bib_file = BibFile(BIB)
+        bib_file.set('rfc1', '@misc{rfc1,\n\ttitle =\t\t{{One}},\n\tabstract =\t{nested {braces}\n@ at line start},\n}')
+        bib_file.set('draft-a', '@techreport{draft-a,\n\ttitle =\t\t{{A v2}},\n}')
+        bib_file.set('rfc2', '@misc{rfc2,\n}')
+        # the comment preceding draft-a is part of its entry, so it is replaced as well
+        self.assertEqual(str(bib_file), BIB.replace('{{A}}', '{{A v2}}').replace('%% You should probably cite rfc8446 instead of this I-D.\n\n', '')
+                         + '@misc{rfc2,\n}\n\n')
+
+class UpdateModeTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.out_file_name = os.path.join(self._tmp_dir.name, 'refs.bib')
+
+    def test_only_missing_ids_and_unversioned_drafts_are_fetched(self):
+        RFCBibtex(['rfc1', 'draft-a', 'draft-b-01'], out_file_name=self.out_file_name,
+                  backend=fake_datatracker()).generate_bibtex()
+        with open(self.out_file_name) as f:
+            original = f.read()
+
+        rfc_bibtex = RFCBibtex(['rfc1', 'draft-a', 'rfc2', 'draft-b-01'], out_file_name=self.out_file_name, update=True,
+                               backend=fake_datatracker())
+        rfc_bibtex.generate_bibtex()
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/draft-a/bibtex/',
+                                                       'https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+        with open(self.out_file_name) as f:
+            self.assertEqual(f.read(), original + '@misc{rfc2,\n\ttitle =\t\t{{Title of rfc2}},\n}\n\n')
@@ -0,0 +1,168 @@
+import tempfile
+import time
+import unittest
+import urllib.error
+
+from rfc_bibtex.backends import DatatrackerBackend, FixtureBackend
+from rfc_bibtex.cache import MemoryCache, ResponseCache
+from rfc_bibtex.errors import Errors
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from rfc_bibtex.rfc_index import RFCIndex
+from .base import fake_datatracker
+
+DRAFT_BIBTEX = '@techreport{I-D.ietf-tls-tls13,\n\ttitle =\t\t{{TLS 1.3}},\n}\n'
+
+class ETagBackend(FixtureBackend):
+    """
+    Fake datatracker answering every document with DRAFT_BIBTEX and an ETag, or with a 304 to the
+    conditional requests if not_modified. The headers of the requests are recorded in headers.
+    """
+    def __init__(self, not_modified=False):
+        super().__init__(base_url=DatatrackerBackend.BASE_URL, default=DRAFT_BIBTEX)
+        self.headers = []
+        self._not_modified = not_modified
+
+    def get(self, url, headers=None, fetcher=None):
+        response, _ = super().get(url, headers, fetcher)
+        conditional = {name: value for name, value in headers.items() if name.startswith('If-')}
+        self.headers.append(conditional)
+        if self._not_modified and conditional:
+            raise urllib.error.HTTPError(url, 304, 'Not Modified', {}, None)
+        return response, {'ETag': '"v1"'}
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _cache(self, **kwargs):
+        cache = ResponseCache(self._tmp_dir.name, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_cached_responses_survive_reopening(self):
+        self._cache().put('https://example/rfc1/', 'body', etag='"x"', permanent=True)
+        cached = self._cache().get('https://example/rfc1/')
+        self.assertEqual(cached.body, 'body')
+        self.assertEqual(cached.etag, '"x"')
+        self.assertTrue(cached.permanent)
+
+    def test_only_non_permanent_responses_expire(self):
+        cache = self._cache(ttl=-1)
+        cache.put('https://example/rfc1/', 'body', permanent=True)
+        cache.put('https://example/draft-a/', 'body', permanent=False)
+        self.assertTrue(cache.is_fresh(cache.get('https://example/rfc1/')))
+        self.assertFalse(cache.is_fresh(cache.get('https://example/draft-a/')))
+
+    def test_refresh_ignores_cached_responses(self):
+        self._cache().put('https://example/rfc1/', 'body', permanent=True)
+        self.assertIsNone(self._cache(refresh=True).get('https://example/rfc1/'))
+
+    def test_rfcs_and_versioned_drafts_are_fetched_once(self):
+        for _ in range(2):
+            rfc_bibtex = RFCBibtex(['rfc5246', 'draft-ietf-tls-tls13-21'], cache=self._cache(ttl=-1), backend=ETagBackend())
+            list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(rfc_bibtex.backend.requests, [])
+
+    def test_stale_unversioned_drafts_are_revalidated(self):
+        rfc_bibtex = RFCBibtex(['draft-ietf-tls-tls13'], cache=self._cache(), backend=ETagBackend())
+        rfc_bibtex.get_bibtex_from_id('draft-ietf-tls-tls13')
+
+        backend = ETagBackend(not_modified=True)
+        rfc_bibtex = RFCBibtex(['draft-ietf-tls-tls13'], cache=self._cache(ttl=-1), backend=backend)
+        entry = rfc_bibtex.get_bibtex_from_id('draft-ietf-tls-tls13')
+        self.assertIn('{draft-ietf-tls-tls13,', entry)
+        self.assertEqual(backend.requests, ['https://datatracker.ietf.org/doc/draft-ietf-tls-tls13/bibtex/'])
+        self.assertEqual(backend.headers, [{'If-None-Match': '"v1"'}])
+
+class NegativeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _cache(self, **kwargs):
+        cache = ResponseCache(self._tmp_dir.name, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_failures_expire_and_are_cleared_by_responses(self):
+        self._cache().put_failure('https://example/rfc404/', 404)
+        self.assertEqual(self._cache().get_failure('https://example/rfc404/'), 404)
+        self.assertIsNone(self._cache(negative_ttl=-1).get_failure('https://example/rfc404/'))
+        self.assertIsNone(self._cache(refresh=True).get_failure('https://example/rfc404/'))
+
+        self._cache().put('https://example/rfc404/', 'body', permanent=True)
+        self.assertIsNone(self._cache().get_failure('https://example/rfc404/'))
+
+    def test_missing_ids_are_not_requested_again(self):
+        for _ in range(2):
+            rfc_bibtex = RFCBibtex(['rfc404', 'rfc1'], cache=self._cache(ttl=-1),
+                                   backend=fake_datatracker(missing=('rfc404',)))
+            list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(rfc_bibtex.backend.requests, [])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc404/bibtex/'])
+        self.assertEqual(rfc_bibtex.stats.counters['negative_cache_hits'], 1)
+
+        rfc_bibtex = RFCBibtex(['rfc404'], cache=self._cache(negative_ttl=-1), backend=fake_datatracker(missing=('rfc404',)))
+        list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc404/bibtex/'])
+
+    def test_error_pages_are_cached(self):
+        error_page = RFCBibtex.URL_ERROR_MSG + ' draft-unknown-00'
+        for _ in range(2):
+            rfc_bibtex = RFCBibtex(['draft-unknown-00'], cache=self._cache(), backend=fake_datatracker(default=error_page))
+            list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(rfc_bibtex.backend.requests, [])
+        self.assertEqual([record.id_name for record in rfc_bibtex.errors.get(Errors.REMOTE_FETCH_ERROR)], ['draft-unknown-00'])
+
+    def test_memory_cache_without_backend(self):
+        cache = MemoryCache()
+        cache.put_failure('https://example/rfc404/', 410)
+        self.assertEqual(cache.get_failure('https://example/rfc404/'), 410)
+        cache.put('https://example/rfc404/', 'body')
+        self.assertIsNone(cache.get_failure('https://example/rfc404/'))
+
+class RFCNumberRangeTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _cache(self, **kwargs):
+        cache = ResponseCache(self._tmp_dir.name, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def invalid_ids(self, rfc_bibtex):
+        return [record.id_name for record in rfc_bibtex.errors.get(Errors.INVALID_ID)]
+
+    def test_numbers_above_the_last_rfc_index_are_rejected(self):
+        rfc_index = RFCIndex({9000: {}}, synced_at=time.time())
+        RFCBibtex([], cache=self._cache(), rfc_index=rfc_index, backend=fake_datatracker())
+
+        # the highest number is remembered by the next runs, without the index
+        rfc_bibtex = RFCBibtex(['rfc9001', 'RFC 9999', 'rfc0', 'rfc9000'], cache=self._cache(),
+                               backend=fake_datatracker())
+        list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(self.invalid_ids(rfc_bibtex), ['rfc9001', 'RFC 9999', 'rfc0'])
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc9000/bibtex/'])
+        self.assertEqual(rfc_bibtex.stats.counters['rejected_rfc_numbers'], 3)
+
+    def test_old_rfc_indexes_do_not_bound_the_numbers(self):
+        rfc_index = RFCIndex({9000: {}}, synced_at=time.time() - 2 * ResponseCache.DEFAULT_NEGATIVE_TTL)
+        rfc_bibtex = RFCBibtex(['rfc9001'], cache=self._cache(), rfc_index=rfc_index, backend=fake_datatracker())
+        list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(self.invalid_ids(rfc_bibtex), [])
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc9001/bibtex/'])
+
+    def test_the_rfc_index_of_the_run_bounds_the_numbers_without_a_cache(self):
+        rfc_index = RFCIndex({9000: {}}, synced_at=time.time())
+        rfc_bibtex = RFCBibtex(['rfc9001'], rfc_index=rfc_index, backend=fake_datatracker())
+        list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(self.invalid_ids(rfc_bibtex), ['rfc9001'])
+        self.assertEqual(rfc_bibtex.backend.requests, [])
+
+    def test_rfc0_is_rejected_without_a_cache(self):
+        rfc_bibtex = RFCBibtex(['rfc0', 'rfc-000'], backend=fake_datatracker())
+        list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(self.invalid_ids(rfc_bibtex), ['rfc0', 'rfc-000'])
+        self.assertEqual(rfc_bibtex.backend.requests, [])
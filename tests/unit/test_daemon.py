@@ -0,0 +1,111 @@
+import os
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+
+from rfc_bibtex.cache import MemoryCache
+from rfc_bibtex.client import default_socket_path, forward, send
+from rfc_bibtex.daemon import Daemon
+from .base import FakeRemoteRFCBibtex, fake_datatracker
+
+class SharedFakeRemoteRFCBibtex(FakeRemoteRFCBibtex):
+    """The runs served by the daemon, which all fetch from shared_backend"""
+    shared_backend = None
+
+    def fake_backend(self):
+        return self.shared_backend
+
+class MemoryCacheTestCase(unittest.TestCase):
+
+    def test_least_recently_used_responses_are_evicted(self):
+        cache = MemoryCache(capacity=2)
+        cache.put('a', 'A', permanent=True)
+        cache.put('b', 'B', permanent=True)
+        cache.get('a')
+        cache.put('c', 'C', permanent=True)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a').body, 'A')
+        self.assertTrue(cache.is_fresh(cache.get('c')))
+
+@unittest.skipUnless(hasattr(os, 'getuid'), 'requires Unix sockets')
+class DaemonTestCase(unittest.TestCase):
+    def setUp(self):
+        SharedFakeRemoteRFCBibtex.shared_backend = fake_datatracker()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+        self.socket_path = os.path.join(self.tmp_dir, 'rfcbibtex.sock')
+
+        self.daemon = Daemon(self.socket_path, rfc_bibtex_class=SharedFakeRemoteRFCBibtex)
+        self.daemon.bind()
+        thread = threading.Thread(target=self.daemon.serve)
+        thread.start()
+        self.addCleanup(self.daemon.close)
+        self.addCleanup(thread.join)
+        self.addCleanup(send, {'stop': True}, self.socket_path)
+
+    def forward(self, args):
+        stdout, stderr = StringIO(), StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            status = forward(args, self.socket_path)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_runs_share_the_cache(self):
+        for _ in range(2):
+            status, stdout, _ = self.forward(['rfc1', 'rfc2'])
+            self.assertEqual(status, 0)
+            self.assertEqual(stdout.count('@misc{'), 2)
+        self.assertEqual(len(SharedFakeRemoteRFCBibtex.shared_backend.requests), 2)
+
+    def test_runs_in_the_working_directory_of_the_caller(self):
+        with open(os.path.join(self.tmp_dir, 'ids.txt'), 'w') as f:
+            f.write('rfc1\n')
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            status, _, _ = self.forward(['-f', 'ids.txt', '-o', 'refs.bib'])
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(status, 0)
+        with open(os.path.join(self.tmp_dir, 'refs.bib')) as f:
+            self.assertIn('@misc{rfc1,', f.read())
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_errors_are_sent_back(self):
+        status, _, stderr = self.forward(['--update', 'rfc1'])
+        self.assertEqual(status, 2)
+        self.assertIn('--update requires an output file', stderr)
+
+    def test_subcommands_are_not_forwarded(self):
+        self.assertIsNone(forward(['mirror', 'rfc1'], self.socket_path))
+        self.assertIsNone(forward(['-f', 'paper.tex', '-o', 'refs.bib', '--watch'], self.socket_path))
+        self.assertIsNone(forward(['-f', '-', '-o', 'refs.bib'], self.socket_path))
+        # combined short options are recognized too
+        self.assertIsNone(forward(['-f', 'paper.tex', '-uwo', 'refs.bib'], self.socket_path))
+        self.assertIsNone(forward(['-f', 'paper.tex', '-o', 'refs.bib', '-wu'], self.socket_path))
+        self.assertEqual(SharedFakeRemoteRFCBibtex.shared_backend.requests, [])
+
+    def test_nothing_is_forwarded_without_a_daemon(self):
+        self.assertIsNone(forward(['rfc1'], os.path.join(self.tmp_dir, 'missing.sock')))
+
+    def test_nothing_is_forwarded_to_a_socket_others_may_replace(self):
+        os.chmod(self.socket_path, 0o722)
+        self.assertIsNone(forward(['rfc1'], self.socket_path))
+        os.chmod(self.socket_path, 0o700)
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            self.assertIsNone(forward(['rfc1'], self.socket_path))
+        self.assertEqual(SharedFakeRemoteRFCBibtex.shared_backend.requests, [])
+
+class ClientTestCase(unittest.TestCase):
+
+    def test_nothing_is_forwarded_without_unix_sockets(self):
+        with patch('rfc_bibtex.client.os', wraps=os) as os_without_users:
+            del os_without_users.getuid
+            self.assertIsNone(default_socket_path())
+            self.assertIsNone(forward(['rfc1']))
@@ -0,0 +1,67 @@
+import unittest
+
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import fake_datatracker
+
+DRAFT_FMT = '@techreport{{draft-a,\n\tnumber =\t{{{number}}},\n\ttitle =\t\t{{{{Title of draft-a}}}},\n}}\n'
+# the draft without a version is its version 05
+VERSIONED_RESPONSES = {'draft-a': DRAFT_FMT.format(number='draft-a-05'), 'draft-a-04': DRAFT_FMT.format(number='draft-a-04')}
+
+class CanonicalIdTestCase(unittest.TestCase):
+
+    def test_spellings_of_an_rfc_have_the_same_canonical_id(self):
+        for id_name in ('RFC5246', 'rfc5246', 'rfc-5246', 'RFC 5246', 'Rfc_5246'):
+            self.assertEqual(RFCBibtex.canonical_id(id_name), 'rfc5246')
+        self.assertEqual(RFCBibtex.canonical_id('draft-IETF-tls-tls13-21'), 'draft-ietf-tls-tls13-21')
+
+    def test_ids_differing_by_case_are_removed(self):
+        rfc_bibtex = RFCBibtex(['RFC5246', 'rfc5246', 'draft-a', 'DRAFT-A'])
+        self.assertEqual(rfc_bibtex._id_names, ['RFC5246', 'draft-a'])
+
+    def test_ids_differing_by_case_get_one_entry_under_the_first_case(self):
+        rfc_bibtex = RFCBibtex(['RFC1', 'rfc1', 'rfc-2', 'Rfc1', 'RFC-2'], backend=fake_datatracker())
+        self.assertEqual([entry.split(',')[0] for entry in rfc_bibtex.bibtex_entries], ['@misc{RFC1', '@misc{rfc-2'])
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/RFC1/bibtex/',
+                                                       'https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+
+    def test_each_document_is_fetched_once_and_emitted_for_each_spelling(self):
+        for jobs in (1, 4):
+            rfc_bibtex = RFCBibtex(['RFC5246', 'rfc1', 'rfc-5246', 'Rfc_5246', 'rfc2'], fetcher=Fetcher(jobs=jobs),
+                                   backend=fake_datatracker())
+            entries = list(rfc_bibtex.bibtex_entries)
+
+            self.assertEqual([entry.split(',')[0] for entry in entries],
+                             ['@misc{RFC5246', '@misc{rfc1', '@misc{rfc-5246', '@misc{Rfc_5246', '@misc{rfc2'])
+            self.assertEqual(sorted(rfc_bibtex.backend.requests), ['https://datatracker.ietf.org/doc/RFC5246/bibtex/',
+                                                                   'https://datatracker.ietf.org/doc/rfc1/bibtex/',
+                                                                   'https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+            self.assertEqual(rfc_bibtex.stats.counters['coalesced'], 2)
+
+    def test_spellings_which_are_not_keys_are_keyed_by_their_canonical_id(self):
+        rfc_bibtex = RFCBibtex(['RFC 5246', 'rfc1', 'rfc 1', 'RFC\t2'], backend=fake_datatracker())
+        self.assertEqual(rfc_bibtex._id_names, ['RFC 5246', 'rfc1', 'RFC\t2'])
+        self.assertEqual([entry.split(',')[0] for entry in rfc_bibtex.bibtex_entries],
+                         ['@misc{rfc5246', '@misc{rfc1', '@misc{rfc2'])
+
+    def test_errors_are_reported_for_each_spelling(self):
+        rfc_bibtex = RFCBibtex(['rfc2', 'rfc-2'], backend=fake_datatracker(missing=('rfc2',)))
+        self.assertEqual(list(rfc_bibtex.bibtex_entries), [])
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+        self.assertEqual(len(rfc_bibtex.urllib_errors), 2)
+
+    def test_spelling_with_a_separator_is_fetched_without_it(self):
+        rfc_bibtex = RFCBibtex(['rfc-5246'], backend=fake_datatracker())
+        list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc5246/bibtex/'])
+
+    def test_latest_draft_is_shared_with_its_version(self):
+        rfc_bibtex = RFCBibtex(['draft-a', 'rfc1', 'draft-a-05', 'draft-a-04'],
+                               backend=fake_datatracker(responses=VERSIONED_RESPONSES))
+        entries = list(rfc_bibtex.bibtex_entries)
+
+        self.assertEqual(len(entries), 4)
+        self.assertTrue(entries[2].startswith('@techreport{draft-a-05,'))
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/draft-a/bibtex/',
+                                                       'https://datatracker.ietf.org/doc/rfc1/bibtex/',
+                                                       'https://datatracker.ietf.org/doc/draft-a/04/bibtex/'])
@@ -0,0 +1,60 @@
+import unittest
+
+from rfc_bibtex.entry import ParsedEntry
+from rfc_bibtex.errors import BibEntry
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+
+class ParsedEntryTestCase(unittest.TestCase):
+    DRAFT_RESPONSE = ('%% You should probably cite rfc8446 instead of this I-D.\n\n'
+                      '@techreport{I-D.ietf-tls-tls13,\n'
+                      '\tnumber =\t{draft-ietf-tls-tls13-21},\n'
+                      '\tauthor =\t{Eric Rescorla},\n'
+                      '\ttitle =\t\t{{The Transport Layer Security (TLS) Protocol Version 1.3}},\n'
+                      '\tabstract =\t{Keys, {nested = groups}, and "quotes", title = {not a field}},\n'
+                      '\tyear =\t\t2017,\n'
+                      '}\n'
+                      '% trailing comment\n')
+
+    def test_structure_is_parsed(self):
+        entry = ParsedEntry.parse(self.DRAFT_RESPONSE)
+        self.assertEqual(entry.entry_type, 'techreport')
+        self.assertEqual(entry.key, 'I-D.ietf-tls-tls13')
+        self.assertEqual(entry.updated_id, 'rfc8446')
+        self.assertEqual(entry.trailing, '\n% trailing comment\n')
+        self.assertEqual([name for name, _ in entry.fields], ['number', 'author', 'title', 'abstract', 'year'])
+        self.assertEqual(entry.get('abstract'), '{Keys, {nested = groups}, and "quotes", title = {not a field}}')
+        self.assertEqual(entry.get('year'), '2017')
+        self.assertIsNone(entry.get('doi'))
+
+    def test_unchanged_entry_is_reproduced_exactly(self):
+        self.assertEqual(str(ParsedEntry.parse(self.DRAFT_RESPONSE)), self.DRAFT_RESPONSE)
+
+    def test_key_with_regex_metacharacters_is_replaced(self):
+        entry = ParsedEntry.parse('@misc{a.b+(c),\n\ttitle = {{X}},\n}')
+        entry.key = 'rfc1'
+        self.assertEqual(str(entry), '@misc{rfc1,\n\ttitle = {{X}},\n}')
+
+    def test_title_is_braced_once(self):
+        for title, braced in (('{Title}', '{{Title}}'), ('"Title"', '{{Title}}'), ('{{Title}}', '{{Title}}'),
+                              ('{{A} and {B}}', '{{{A} and {B}}}')):
+            entry = ParsedEntry.parse('@misc{rfc1,\n\ttitle = ' + title + ',\n}')
+            entry.brace_title()
+            self.assertEqual(entry.get('title'), braced)
+            self.assertEqual(str(entry), '@misc{rfc1,\n\ttitle = ' + braced + ',\n}')
+
+    def test_non_entry_is_not_parsed(self):
+        self.assertIsNone(ParsedEntry.parse('<html><title>404 Not Found</title></html>'))
+
+
+class PostProcessingTestCase(unittest.TestCase):
+
+    def test_entry_is_post_processed(self):
+        rfc_bibtex = RFCBibtex()
+        record = BibEntry('draft-ietf-tls-tls13', 'draft', 'url')
+        entry = rfc_bibtex._post_process_response(record, ParsedEntryTestCase.DRAFT_RESPONSE)
+        self.assertTrue(entry.startswith('%% You should probably cite rfc8446'))
+        self.assertIn('@techreport{draft-ietf-tls-tls13,\n', entry)
+        self.assertTrue(entry.endswith('% trailing comment'))
+        updated, = rfc_bibtex.errors.draft_updated_to_rfc
+        self.assertIs(updated, record)
+        self.assertEqual((updated.old_id, updated.new_id, updated.status), ('draft-ietf-tls-tls13', 'rfc8446', BibEntry.OK))
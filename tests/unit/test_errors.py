@@ -0,0 +1,62 @@
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+from rfc_bibtex.errors import Errors, BibEntry, UpdatedEntity
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import fake_datatracker
+
+class ErrorsTestCase(unittest.TestCase):
+
+    def test_records_are_bucketed_by_category(self):
+        errors = Errors()
+        invalid = BibEntry('nothing')
+        failed = BibEntry('rfc2', 'rfc', 'https://datatracker.ietf.org/doc/rfc2/bibtex/')
+        errors.add(Errors.INVALID_ID, invalid)
+        errors.add(Errors.URL_ERROR, failed)
+
+        self.assertIn(Errors.INVALID_ID, errors)
+        self.assertNotIn(Errors.REMOTE_FETCH_ERROR, errors)
+        self.assertEqual(errors.get(Errors.URL_ERROR), [failed])
+        self.assertEqual((invalid.status, failed.status), (Errors.INVALID_ID, Errors.URL_ERROR))
+
+    def test_updated_entities_are_split_when_added(self):
+        errors = Errors()
+        errors.add_updated_entity('draft-a', 'rfc1')
+        errors.add_updated_entity('draft-b', 'draft-b-02')
+        record = BibEntry('draft-c', 'draft')
+        errors.add_updated_entry(record, 'rfc2')
+
+        self.assertEqual([(e.old_id, e.new_id) for e in errors.draft_updated_to_rfc], [('draft-a', 'rfc1'), ('draft-c', 'rfc2')])
+        self.assertEqual([(e.old_id, e.new_id) for e in errors.draft_updated_to_draft], [('draft-b', 'draft-b-02')])
+        self.assertEqual(len(list(errors.updated_entity)), 3)
+
+    def test_records_have_no_instance_dict(self):
+        self.assertFalse(hasattr(BibEntry('rfc1'), '__dict__'))
+        self.assertFalse(hasattr(UpdatedEntity('draft-a', 'rfc1'), '__dict__'))
+
+    def test_each_id_gets_one_record(self):
+        rfc_bibtex = RFCBibtex(['rfc1', 'nothing', 'draft-a', 'rfc2'], backend=fake_datatracker(missing=('rfc2',)))
+        list(rfc_bibtex.bibtex_entries)
+
+        errors = rfc_bibtex.errors
+        self.assertEqual([record.id_name for record in errors.get(Errors.INVALID_ID)], ['nothing'])
+        self.assertEqual([record.id_name for record in errors.get(Errors.DRAFT_WITHOUT_VERSION)], ['draft-a'])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+        self.assertEqual(errors.get(Errors.DRAFT_WITHOUT_VERSION)[0].status, BibEntry.OK)
+
+    def test_reports_go_to_stderr(self):
+        rfc_bibtex = RFCBibtex(['rfc1', 'nothing', 'draft-a', 'rfc404'], backend=fake_datatracker(missing=('rfc404',)))
+        stdout, stderr = StringIO(), StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            rfc_bibtex.generate_bibtex()
+
+        # the output only holds the entries, so that it can be redirected to a .bib file
+        self.assertEqual([line for line in stdout.getvalue().splitlines() if line.startswith('@')],
+                         ['@misc{rfc1,', '@misc{draft-a,'])
+        self.assertNotIn('\u001b', stdout.getvalue())
+        self.assertNotIn('nothing', stdout.getvalue())
+        self.assertNotIn('rfc404', stdout.getvalue())
+        # the invalid id, the fetching error, and the warning about the draft without a version
+        for reported in ('nothing', 'rfc404', 'draft-a'):
+            self.assertIn(reported, stderr.getvalue())
@@ -0,0 +1,26 @@
+import unittest
+
+from benchmarks.fake_datatracker import FakeDatatracker
+from rfc_bibtex.backends import MirrorBackend
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from rfc_bibtex.scheduler import RequestScheduler
+
+class FakeDatatrackerTestCase(unittest.TestCase):
+    """End-to-end run over HTTP, against the local stand-in used by the benchmarks"""
+    def setUp(self):
+        self.fake = FakeDatatracker(error_rate=0.3, updated_rate=0.5).start()
+        self.addCleanup(self.fake.stop)
+
+    def test_generated_entries_and_errors(self):
+        ids = ['rfc{}'.format(i) for i in range(1, 21)] + ['draft-a-{:02d}'.format(i) for i in range(20)]
+        fetcher = Fetcher(jobs=4, scheduler=RequestScheduler(rate=None))
+        rfc_bibtex = RFCBibtex(list(ids), fetcher=fetcher, backend=MirrorBackend(self.fake.base_url))
+        entries = list(rfc_bibtex.bibtex_entries)
+        fetcher.close()
+
+        self.assertEqual(len(entries) + len(rfc_bibtex.urllib_errors), len(ids))
+        self.assertTrue(rfc_bibtex.urllib_errors)
+        self.assertTrue(list(rfc_bibtex.errors.draft_updated_to_rfc))
+        self.assertEqual(self.fake.requests_served, len(ids))
+        self.assertLess(fetcher.connection_pool.connections_opened, len(ids))
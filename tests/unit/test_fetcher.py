@@ -0,0 +1,76 @@
+import threading
+import time
+import unittest
+
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import fake_datatracker, fake_response
+
+class FetcherTestCase(unittest.TestCase):
+    def test_results_are_returned_in_input_order(self):
+        delays = {'http://a/1': 0.05, 'http://a/2': 0.0, 'http://b/3': 0.02, 'http://b/4': 0.0}
+        def fetch(url):
+            time.sleep(delays[url])
+            return url
+
+        fetcher = Fetcher(jobs=4)
+        results = [(item, future.result()) for item, future in fetcher.imap(fetch, list(delays))]
+        self.assertEqual(results, [(url, url) for url in delays])
+
+    def test_exceptions_are_raised_by_the_future(self):
+        def fetch(url):
+            raise ValueError(url)
+
+        fetcher = Fetcher(jobs=2)
+        for item, future in fetcher.imap(fetch, ['http://a/1', 'http://a/2']):
+            with self.assertRaises(ValueError):
+                future.result()
+
+    def test_concurrent_fetching_preserves_order_of_entries_and_errors(self):
+        id_names = ['rfc1', 'rfc2', 'rfc3', 'rfc4', 'rfc5', 'rfc6']
+        def respond(name):
+            # the first ids are the slowest ones
+            time.sleep(0.01 * (len(id_names) - id_names.index(name)))
+            return 404 if name in ('rfc2', 'rfc5') else fake_response(name)
+
+        rfc_bibtex = RFCBibtex(list(id_names), fetcher=Fetcher(jobs=6), backend=fake_datatracker(default=respond))
+        entries = list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(len(entries), 4)
+        for entry, id_name in zip(entries, ['rfc1', 'rfc3', 'rfc4', 'rfc6']):
+            self.assertTrue(entry.startswith('@misc{' + id_name + ','))
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc2/bibtex/',
+                                                        'https://datatracker.ietf.org/doc/rfc5/bibtex/'])
+
+    def test_items_are_consumed_lazily(self):
+        consumed = []
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield 'http://a/{}'.format(i)
+
+        fetcher = Fetcher(jobs=2)
+        results = fetcher.imap(lambda url: url, items())
+        item, future = next(results)
+        self.assertEqual(future.result(), 'http://a/0')
+        self.assertLessEqual(len(consumed), Fetcher.WINDOW_FACTOR * 2)
+        results.close()
+
+    def test_items_are_fetched_in_batches_by_at_most_max_jobs(self):
+        threads = set()
+        def fetch(url):
+            threads.add(threading.get_ident())
+            if url.endswith('/3'):
+                raise ValueError(url)
+            return url
+
+        fetcher = Fetcher(jobs=8)
+        urls = ['http://a/{}'.format(i) for i in range(10)]
+        results = []
+        for item, future in fetcher.imap(fetch, urls, max_jobs=2, batch_size=3):
+            results.append(future.exception() is None and future.result())
+        self.assertEqual(results, urls[:3] + [False] + urls[4:])
+        self.assertLessEqual(len(threads), 2)
+
+        threads.clear()
+        list(fetcher.imap(fetch, urls, max_jobs=1))
+        self.assertEqual(threads, {threading.get_ident()})
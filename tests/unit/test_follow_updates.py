@@ -0,0 +1,67 @@
+import time
+import unittest
+
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from rfc_bibtex.rfc_index import RFCIndex
+from .base import fake_datatracker, fake_response
+
+UPDATED = {'draft-old': 'rfc9000', 'draft-older': 'rfc9000', 'draft-gone': 'rfc9001'}
+
+def updating_response(name):
+    """The drafts listed in UPDATED say that they have been replaced by another document"""
+    response = fake_response(name)
+    new_id = UPDATED.get(name)
+    if new_id is not None:
+        response = '%% You should probably cite {} instead of this I-D.\n\n{}'.format(new_id, response)
+    return response
+
+class FollowUpdatesTestCase(unittest.TestCase):
+
+    def keys(self, entries):
+        # the entries of updated drafts start with datatracker's comment
+        return [entry[entry.index('@'):].split(',')[0] for entry in entries]
+
+    def test_successors_are_added_once(self):
+        for jobs in (1, 4):
+            rfc_bibtex = RFCBibtex(['draft-old-02', 'rfc1', 'draft-older-01'], fetcher=Fetcher(jobs=jobs),
+                                   backend=fake_datatracker(default=updating_response), follow_updates='add')
+            entries = list(rfc_bibtex.bibtex_entries)
+
+            self.assertEqual(self.keys(entries), ['@misc{draft-old-02', '@misc{rfc9000', '@misc{rfc1', '@misc{draft-older-01'])
+            self.assertEqual(rfc_bibtex.backend.requests.count('https://datatracker.ietf.org/doc/rfc9000/bibtex/'), 1)
+            self.assertEqual(len(list(rfc_bibtex.errors.draft_updated_to_rfc)), 2)
+
+    def test_cited_successors_are_not_added(self):
+        rfc_bibtex = RFCBibtex(['draft-old-02', 'RFC9000'], backend=fake_datatracker(default=updating_response),
+                               follow_updates='add')
+        self.assertEqual(self.keys(rfc_bibtex.bibtex_entries), ['@misc{draft-old-02', '@misc{RFC9000'])
+
+    def test_successors_replace_the_drafts(self):
+        rfc_bibtex = RFCBibtex(['draft-old-02', 'draft-gone-01', 'rfc1'],
+                               backend=fake_datatracker(missing=('rfc9001',), default=updating_response),
+                               follow_updates='replace')
+        entries = list(rfc_bibtex.bibtex_entries)
+
+        self.assertEqual(self.keys(entries), ['@misc{draft-old-02', '@misc{draft-gone-01', '@misc{rfc1'])
+        self.assertIn('Title of rfc9000', entries[0])
+        # the draft is kept when its successor could not be fetched
+        self.assertIn('Title of draft-gone', entries[1])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc9001/bibtex/'])
+
+    def test_successors_above_the_last_rfc_index_are_not_followed(self):
+        # the draft says it became rfc9000, which the RFC index of this run does not know about yet
+        rfc_index = RFCIndex({8999: {}}, synced_at=time.time())
+        for follow_updates in ('add', 'replace'):
+            rfc_bibtex = RFCBibtex(['draft-old-02', 'rfc1'], rfc_index=rfc_index,
+                                   backend=fake_datatracker(default=updating_response), follow_updates=follow_updates)
+            entries = list(rfc_bibtex.bibtex_entries)
+
+            self.assertEqual(self.keys(entries), ['@misc{draft-old-02', '@misc{rfc1'])
+            self.assertIn('Title of draft-old', entries[0])
+            self.assertNotIn('https://datatracker.ietf.org/doc/rfc9000/bibtex/', rfc_bibtex.backend.requests)
+
+    def test_successors_are_not_fetched_by_default(self):
+        rfc_bibtex = RFCBibtex(['draft-old-02'], backend=fake_datatracker(default=updating_response))
+        self.assertEqual(self.keys(rfc_bibtex.bibtex_entries), ['@misc{draft-old-02'])
+        self.assertEqual(len(rfc_bibtex.backend.requests), 1)
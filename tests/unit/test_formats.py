@@ -0,0 +1,72 @@
+import json
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+
+from rfc_bibtex.entry import ParsedEntry
+from rfc_bibtex.formats import get_format
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import fake_datatracker
+
+class FormatsTestCase(unittest.TestCase):
+    RFC_RESPONSE = ('@misc{rfc5246,\n\tseries =\t{Request for Comments},\n\tnumber =\t5246,\n\thowpublished =\t{RFC 5246},\n'
+                    '\tpublisher =\t{RFC Editor},\n\tdoi =\t\t{10.17487/RFC5246},\n\turl =\t\t{https://rfc-editor.org/rfc/rfc5246.txt},\n'
+                    '        author =\t{Eric Rescorla and Tim Dierks},\n\ttitle =\t\t{{The Transport Layer Security (TLS) Protocol '
+                    'Version 1.2}},\n\tpagetotal =\t104,\n\tyear =\t\t2008,\n\tmonth =\t\taug,\n\tabstract =\t{This document '
+                    'specifies Version 1.2 of the\n\tTLS protocol. {[}STANDARDS-TRACK{]}},\n}\n')
+    DRAFT_RESPONSE = ('%% You should probably cite rfc8446 instead of this I-D.\n@techreport{ietf-tls-tls13-21,\n'
+                      '\tnumber =\t{draft-ietf-tls-tls13-21},\n\ttype =\t\t{Internet-Draft},\n\tinstitution =\t{Internet '
+                      'Engineering Task Force},\n\tnote =\t\t{Work in Progress},\n        author =\t{Eric Rescorla},\n'
+                      '\ttitle =\t\t{{The Transport Layer Security (TLS) Protocol Version 1.3}},\n\tpagetotal =\t143,\n'
+                      '\tyear =\t\t2017,\n\tmonth =\t\tjul,\n\tday =\t\t3,\n\tdoi =\t\t,\n}\n')
+
+    def format_entry(self, name, response, key):
+        entry = ParsedEntry.parse(response)
+        entry.key = key
+        entry.brace_title()
+        return get_format(name).format_entry(entry)
+
+    def test_biblatex(self):
+        self.assertEqual(self.format_entry('biblatex', self.DRAFT_RESPONSE, 'draft-ietf-tls-tls13-21'),
+                         '%% You should probably cite rfc8446 instead of this I-D.\n\n'
+                         '@report{draft-ietf-tls-tls13-21,\n\tnumber = {draft-ietf-tls-tls13-21},\n\ttype = {Internet-Draft},\n'
+                         '\tinstitution = {Internet Engineering Task Force},\n\tnote = {Work in Progress},\n'
+                         '\tauthor = {Eric Rescorla},\n\ttitle = {{The Transport Layer Security (TLS) Protocol Version 1.3}},\n'
+                         '\tpagetotal = 143,\n\tdate = {2017-07-03}\n}')
+
+    def test_jsonl(self):
+        record = json.loads(self.format_entry('jsonl', self.DRAFT_RESPONSE, 'draft-ietf-tls-tls13-21'))
+        self.assertEqual(record['id'], 'draft-ietf-tls-tls13-21')
+        self.assertEqual(record['type'], 'techreport')
+        self.assertEqual(record['updated_id'], 'rfc8446')
+        self.assertEqual(record['fields']['title'], 'The Transport Layer Security (TLS) Protocol Version 1.3')
+
+    def test_csl_json(self):
+        item = json.loads(self.format_entry('csl-json', self.RFC_RESPONSE, 'RFC5246'))
+        self.assertEqual(item, {
+            'id': 'RFC5246', 'type': 'report', 'collection-title': 'Request for Comments', 'number': '5246',
+            'publisher': 'RFC Editor', 'DOI': '10.17487/RFC5246', 'URL': 'https://rfc-editor.org/rfc/rfc5246.txt',
+            'author': [{'family': 'Rescorla', 'given': 'Eric'}, {'family': 'Dierks', 'given': 'Tim'}],
+            'title': 'The Transport Layer Security (TLS) Protocol Version 1.2', 'number-of-pages': '104',
+            'abstract': 'This document specifies Version 1.2 of the TLS protocol. [STANDARDS-TRACK]',
+            'issued': {'date-parts': [[2008, 8]]}})
+
+    def test_csl_json_output_is_an_array(self):
+        for id_names, count in ((['rfc1', 'rfc2'], 2), (['nothing'], 0)):
+            rfc_bibtex = RFCBibtex(id_names, output_format='csl-json', backend=fake_datatracker())
+            output = StringIO()
+            rfc_bibtex._generate_bibtex(output)
+            self.assertEqual(len(json.loads(output.getvalue())), count)
+
+    def test_jsonl_reports(self):
+        rfc_bibtex = RFCBibtex(['rfc1', 'nothing', 'rfc404'], backend=fake_datatracker(missing=('rfc404',)),
+                               output_format='jsonl')
+        output, errors = StringIO(), StringIO()
+        rfc_bibtex._generate_bibtex(output)
+        with redirect_stderr(errors):
+            rfc_bibtex.print_reports()
+
+        self.assertEqual([json.loads(line)['id'] for line in output.getvalue().splitlines()], ['rfc1'])
+        self.assertEqual([json.loads(line) for line in errors.getvalue().splitlines()], [
+            {'level': 'error', 'category': 'invalid_id', 'id': 'nothing'},
+            {'level': 'error', 'category': 'url_error', 'id': 'rfc404', 'url': 'https://datatracker.ietf.org/doc/rfc404/bibtex/'}])
@@ -0,0 +1,64 @@
+import threading
+import unittest
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rfc_bibtex.http_client import HTTPConnectionPool
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    user_agents = []
+
+    def do_GET(self):
+        self.user_agents.append(self.headers.get('User-Agent'))
+        if self.path == '/redirect/':
+            self._reply(302, b'', location='/doc/rfc1/bibtex/')
+        elif self.path == '/doc/rfc1/bibtex/':
+            self._reply(200, b'@misc{rfc1,\n}')
+        else:
+            self._reply(404, b'Not Found')
+
+    def _reply(self, status, body, location=None):
+        self.send_response(status)
+        if location:
+            self.send_header('Location', location)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class HTTPConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        KeepAliveHandler.user_agents = []
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._base_url = 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+        self._pool = HTTPConnectionPool(headers={'User-Agent': 'rfcbibtex-test'})
+
+    def tearDown(self):
+        self._pool.close()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def test_connections_are_reused_and_headers_sent(self):
+        for _ in range(3):
+            body, _ = self._pool.request(self._base_url + '/doc/rfc1/bibtex/')
+            self.assertEqual(body, '@misc{rfc1,\n}')
+        self.assertEqual(self._pool.requests_sent, 3)
+        self.assertEqual(self._pool.connections_opened, 1)
+        self.assertEqual(self._pool.connections_reused, 2)
+        self.assertEqual(KeepAliveHandler.user_agents, ['rfcbibtex-test'] * 3)
+
+    def test_redirects_are_followed(self):
+        body, _ = self._pool.request(self._base_url + '/redirect/')
+        self.assertEqual(body, '@misc{rfc1,\n}')
+
+    def test_error_status_raises_http_error(self):
+        with self.assertRaises(urllib.error.HTTPError) as cm:
+            self._pool.request(self._base_url + '/doc/rfc9999/bibtex/')
+        self.assertEqual(cm.exception.code, 404)
+        # the connection is still usable after an error response
+        self._pool.request(self._base_url + '/doc/rfc1/bibtex/')
+        self.assertEqual(self._pool.connections_opened, 1)
@@ -0,0 +1,40 @@
+import unittest
+
+from rfc_bibtex.errors import Errors
+from rfc_bibtex.processes import ShardedRFCBibtex
+from .base import FakeRemoteRFCBibtex, fake_datatracker
+from .test_follow_updates import updating_response
+
+class FakeRemoteWorker(FakeRemoteRFCBibtex):
+    def fake_backend(self):
+        return fake_datatracker(missing=('rfc404',))
+
+class UpdatingWorker(FakeRemoteRFCBibtex):
+    def fake_backend(self):
+        return fake_datatracker(default=updating_response)
+
+class ShardedRFCBibtexTestCase(unittest.TestCase):
+
+    def keys(self, entries):
+        return [entry[entry.index('@'):].split(',')[0] for entry in entries]
+
+    def test_entries_are_merged_in_order(self):
+        id_names = ['rfc{}'.format(number) for number in range(1, 10)] + ['nothing', 'rfc404', 'RFC-3', 'rfc10']
+        rfc_bibtex = ShardedRFCBibtex(id_names, processes=3, chunk_size=2, worker_args=['--no-cache'],
+                                      worker_class=FakeRemoteWorker)
+
+        self.assertEqual(self.keys(rfc_bibtex.bibtex_entries), ['@misc{{rfc{}'.format(number) for number in range(1, 10)] +
+                         ['@misc{RFC-3', '@misc{rfc10'])
+        self.assertEqual([record.id_name for record in rfc_bibtex.errors.get(Errors.INVALID_ID)], ['nothing'])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc404/bibtex/'])
+        # the spellings of a document go to the same worker, which fetches it once
+        self.assertEqual(rfc_bibtex.stats.counters['coalesced'], 1)
+        self.assertEqual(rfc_bibtex.stats.summary()['phases']['fetch']['count'], 11)
+
+    def test_successors_are_added_once(self):
+        rfc_bibtex = ShardedRFCBibtex(['draft-old-02', 'rfc1', 'draft-older-01', 'rfc2'], processes=2, chunk_size=1,
+                                      worker_args=['--no-cache', '--follow-updates', 'add'],
+                                      worker_class=UpdatingWorker)
+
+        self.assertEqual(self.keys(rfc_bibtex.bibtex_entries), ['@misc{draft-old-02', '@misc{rfc9000', '@misc{rfc1',
+                                                                '@misc{draft-older-01', '@misc{rfc2'])
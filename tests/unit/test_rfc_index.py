@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+import unittest
+
+from rfc_bibtex.cache import ResponseCache
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from rfc_bibtex.rfc_index import RFCIndex
+from .base import fake_datatracker
+
+RFC_INDEX_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<rfc-index xmlns="https://www.rfc-editor.org/rfc-index">
+  <rfc-not-issued-entry><doc-id>RFC1849</doc-id></rfc-not-issued-entry>
+  <rfc-entry>
+    <doc-id>RFC5246</doc-id>
+    <title>The Transport Layer Security (TLS) Protocol Version 1.2</title>
+    <author><name>T. Dierks</name></author>
+    <author><name>E. Rescorla</name></author>
+    <date><month>August</month><year>2008</year></date>
+    <format><file-format>ASCII</file-format><page-count>104</page-count></format>
+    <abstract><p>This document specifies Version 1.2 of the TLS protocol.</p><p>100% secure.</p></abstract>
+    <doi>10.17487/RFC5246</doi>
+  </rfc-entry>
+</rfc-index>
+'''
+
+DRAFT_BIBTEX = '@techreport{I-D.ietf-tls-tls13,\n\ttitle =\t\t{{TLS 1.3}},\n}\n'
+
+class RFCIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.xml', delete=False) as f:
+            f.write(RFC_INDEX_XML)
+        self.addCleanup(os.remove, f.name)
+        self.rfc_index_file = f.name
+        # downloaded long ago, so that the RFCs missing from it are fetched
+        self.rfc_index = self.read_rfc_index(age=2 * ResponseCache.DEFAULT_NEGATIVE_TTL)
+
+    def read_rfc_index(self, age):
+        """The index, as a file modified age seconds ago"""
+        modified = time.time() - age
+        os.utime(self.rfc_index_file, (modified, modified))
+        return RFCIndex.from_file(self.rfc_index_file)
+
+    def test_only_issued_rfcs_are_indexed(self):
+        self.assertEqual(len(self.rfc_index), 1)
+        self.assertIn('RFC5246', self.rfc_index)
+        self.assertNotIn('rfc1849', self.rfc_index)
+        self.assertIsNone(self.rfc_index.get_bibtex('rfc1849'))
+
+    def test_bibtex_is_built_in_datatracker_format(self):
+        self.assertEqual(self.rfc_index.get_bibtex('rfc5246'),
+                         '@misc{rfc5246,\n'
+                         '\tseries =\t{Request for Comments},\n'
+                         '\tnumber =\t5246,\n'
+                         '\thowpublished =\t{RFC 5246},\n'
+                         '\tpublisher =\t{RFC Editor},\n'
+                         '\tdoi =\t\t{10.17487/RFC5246},\n'
+                         '\turl =\t\t{https://rfc-editor.org/rfc/rfc5246.txt},\n'
+                         '\tauthor =\t{T. Dierks and E. Rescorla},\n'
+                         '\ttitle =\t\t{{The Transport Layer Security (TLS) Protocol Version 1.2}},\n'
+                         '\tpagetotal =\t104,\n'
+                         '\tyear =\t\t2008,\n'
+                         '\tmonth =\t\taug,\n'
+                         '\tabstract =\t{This document specifies Version 1.2 of the TLS protocol. 100\\% secure.},\n'
+                         '}\n')
+
+    def test_only_drafts_and_unindexed_rfcs_are_fetched(self):
+        rfc_bibtex = RFCBibtex(['RFC5246', 'draft-ietf-tls-tls13-21', 'rfc8446'], rfc_index=self.rfc_index,
+                               backend=fake_datatracker(default=DRAFT_BIBTEX))
+        entries = list(rfc_bibtex.bibtex_entries)
+        self.assertEqual(len(entries), 3)
+        self.assertTrue(entries[0].startswith('@misc{RFC5246,'))
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/draft-ietf-tls-tls13/21/bibtex/',
+                                                       'https://datatracker.ietf.org/doc/rfc8446/bibtex/'])
+
+    def test_rfcs_above_a_recently_modified_index_are_rejected(self):
+        rfc_bibtex = RFCBibtex(['RFC5246', 'rfc4346', 'rfc8446'], rfc_index=self.read_rfc_index(age=60),
+                               backend=fake_datatracker(default=DRAFT_BIBTEX))
+        self.assertEqual(len(list(rfc_bibtex.bibtex_entries)), 2)
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc4346/bibtex/'])
+        self.assertEqual([record.id_name for record in rfc_bibtex.errors.get(rfc_bibtex.errors.INVALID_ID)], ['rfc8446'])
+
+        # the bound expires with the modification time of the file, not with the time it was read
+        rfc_bibtex = RFCBibtex(['rfc8446'], rfc_index=self.read_rfc_index(age=ResponseCache.DEFAULT_NEGATIVE_TTL + 1),
+                               backend=fake_datatracker(default=DRAFT_BIBTEX))
+        self.assertEqual(len(list(rfc_bibtex.bibtex_entries)), 1)
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc8446/bibtex/'])
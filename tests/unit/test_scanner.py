@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from rfc_bibtex.scanner import CitationScanner
+
+class CitationScannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _write(self, name, content):
+        path = os.path.join(self._tmp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_tex_citation_commands(self):
+        path = self._write('paper.tex',
+                           'See \\cite{rfc1, RFC2,knuth84} and \\citep[see][p.~3]{draft-a-01}, \\parencite*{rfc3}.\n'
+                           '\\autocite[12]{rfc4}\\textcite{other} \\cites[a]{rfc5}[b]{rfc6} \\nocite{*}\n'
+                           '% \\cite{rfc7} is commented out\n100\\% of \\cite{rfc8} % \\cite{rfc9}\n')
+        self.assertEqual(CitationScanner().scan_file(path), ['rfc1', 'RFC2', 'draft-a-01', 'rfc3', 'rfc4', 'rfc5', 'rfc6', 'rfc8'])
+
+    def test_tex_inputs_are_followed_once(self):
+        self._write('intro.tex', '\\cite{rfc2}\\input{paper}')
+        self._write('appendix.tex', '\\cite{rfc3}')
+        path = self._write('paper.tex', '\\cite{rfc1}\n\\input{intro}\n\\include{appendix.tex}\n\\includegraphics{rfc9}\n\\input{missing}')
+        self.assertEqual(CitationScanner().scan_file(path), ['rfc1', 'rfc2', 'rfc3'])
+
+    def test_aux_citations(self):
+        path = self._write('paper.aux', '\\citation{rfc1,rfc2}\\citation{draft-a}\n\\bibcite{rfc3}{1}\n\\abx@aux@cite{0}{rfc4}\n\\citation{*}\n')
+        self.assertEqual(CitationScanner().scan_file(path), ['rfc1', 'rfc2', 'draft-a', 'rfc4'])
+
+    def test_bcf_citekeys(self):
+        path = self._write('paper.bcf', '<bcf:section number="0">\n'
+                           '  <bcf:citekey order="1" intorder="1">rfc5246</bcf:citekey>\n'
+                           '  <bcf:citekey order="2" intorder="1">knuth84</bcf:citekey>\n'
+                           '  <bcf:citekey order="3" intorder="1">draft-ietf-tls-tls13-21</bcf:citekey>\n</bcf:section>\n')
+        self.assertEqual(CitationScanner().scan_file(path), ['rfc5246', 'draft-ietf-tls-tls13-21'])
+
+    def test_empty_file(self):
+        self.assertEqual(CitationScanner().scan_file(self._write('empty.aux', '')), [])
@@ -0,0 +1,76 @@
+import time
+import unittest
+import urllib.error
+
+from rfc_bibtex.scheduler import RequestScheduler, TokenBucket
+
+URL = 'https://datatracker.ietf.org/doc/rfc5246/bibtex/'
+
+def failing(*errors):
+    """Return a function raising the given errors, one per call, and then returning 'ok'."""
+    errors = list(errors)
+    def func():
+        if errors:
+            raise errors.pop(0)
+        return 'ok'
+    return func
+
+def http_error(code, headers=None):
+    return urllib.error.HTTPError(URL, code, 'Error', headers or {}, None)
+
+class RequestSchedulerTestCase(unittest.TestCase):
+    def test_transient_errors_are_retried(self):
+        scheduler = RequestScheduler(backoff=0, rate=None)
+        self.assertEqual(scheduler.call(failing(http_error(503), urllib.error.URLError('timed out')), URL), 'ok')
+        self.assertEqual(scheduler.retries, 2)
+
+    def test_permanent_errors_are_not_retried(self):
+        scheduler = RequestScheduler(backoff=0, rate=None)
+        with self.assertRaises(urllib.error.HTTPError):
+            scheduler.call(failing(http_error(404)), URL)
+        self.assertEqual(scheduler.retries, 0)
+
+    def test_last_error_is_raised_when_retries_are_exhausted(self):
+        scheduler = RequestScheduler(retries=1, backoff=0, rate=None)
+        with self.assertRaises(urllib.error.HTTPError):
+            scheduler.call(failing(http_error(502), http_error(502)), URL)
+
+    def test_retry_after_is_honored_and_throttles_the_rate(self):
+        scheduler = RequestScheduler(backoff=0, rate=100)
+        start = time.monotonic()
+        self.assertEqual(scheduler.call(failing(http_error(429, {'Retry-After': '0.2'})), URL), 'ok')
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertLess(scheduler.rate_limiter.rate, 100)
+
+    def test_long_retry_after_raises_url_error_without_pausing(self):
+        scheduler = RequestScheduler(backoff=0, rate=100)
+        start = time.monotonic()
+        with self.assertRaises(urllib.error.URLError) as context:
+            scheduler.call(failing(http_error(503, {'Retry-After': '3600'})), URL)
+        self.assertNotIsInstance(context.exception, urllib.error.HTTPError)
+        self.assertEqual(scheduler.retries, 0)
+        # the other requests are slowed down, but not paused for an hour
+        scheduler.rate_limiter.acquire()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertLess(scheduler.rate_limiter.rate, 100)
+
+    def test_deadline_exceeded_raises_url_error(self):
+        scheduler = RequestScheduler(deadline=0.05, rate=None)
+        with self.assertRaises(urllib.error.URLError):
+            scheduler.call(failing(http_error(503, {'Retry-After': '1'})), URL)
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_rate_is_limited(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_rate_recovers_after_throttling(self):
+        bucket = TokenBucket(rate=8)
+        bucket.throttle()
+        self.assertEqual(bucket.rate, 4)
+        for _ in range(100):
+            bucket.succeed()
+        self.assertEqual(bucket.rate, 8)
@@ -0,0 +1,14 @@
+import subprocess
+import sys
+import unittest
+
+class LazyImportsTestCase(unittest.TestCase):
+    """The modules only needed by some runs are not imported along with the command line entry point"""
+    LAZY_MODULES = ('http.client', 'ssl', 'email.utils', 'concurrent.futures', 'sqlite3', 'xml.etree.ElementTree',
+                    'rfc_bibtex.http_client', 'rfc_bibtex.scanner', 'rfc_bibtex.rfc_index', 'rfc_bibtex.archive')
+
+    def test_entry_point_imports_no_lazy_module(self):
+        code = 'import sys, rfc_bibtex.client, rfc_bibtex.rfc_bibtex; print("\\n".join(sys.modules))'
+        modules = set(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split())
+        self.assertIn('rfc_bibtex.rfc_bibtex', modules)
+        self.assertEqual(sorted(modules.intersection(self.LAZY_MODULES)), [])
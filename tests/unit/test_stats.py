@@ -0,0 +1,116 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.fake_datatracker import FakeDatatracker
+from rfc_bibtex.backends import MirrorBackend
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from rfc_bibtex.scheduler import RequestScheduler
+from rfc_bibtex.stats import Stats
+from .base import fake_datatracker
+
+class StatsTestCase(unittest.TestCase):
+
+    def test_spans_and_counters_are_summarized(self):
+        stats = Stats()
+        for duration in (0.1, 0.2, 0.3, 0.4):
+            stats.add_span('fetch', 'rfc1', 0.0, duration)
+        stats.incr('cache_hits')
+        stats.incr('cache_hits', 2)
+
+        summary = stats.summary()
+        self.assertEqual(summary['counters'], {'cache_hits': 3})
+        self.assertEqual(summary['phases']['fetch']['count'], 4)
+        self.assertAlmostEqual(summary['phases']['fetch']['total'], 1.0)
+        self.assertEqual(summary['phases']['fetch']['p50'], 0.3)
+        self.assertEqual(summary['phases']['fetch']['max'], 0.4)
+
+        output = io.StringIO()
+        stats.print_summary(file=output)
+        self.assertIn('Histogram of fetch times:', output.getvalue())
+        self.assertIn('cache_hits: 3', output.getvalue())
+
+    def test_only_aggregates_are_kept_without_keep_spans(self):
+        events = []
+        stats = Stats(keep_spans=False)
+        stats.add_hook(events.append)
+        for duration in (0.1, 0.2, 0.3):
+            stats.add_span('fetch', 'rfc1', 0.0, duration)
+        stats.merge([], {}, stats.origin, phases={'fetch': (2, 1.0, 0.6)})
+
+        self.assertEqual(stats.spans, [])
+        self.assertEqual(len(events), 3)
+        fetch = stats.summary()['phases']['fetch']
+        self.assertEqual((fetch['count'], fetch['max'], fetch['p50']), (5, 0.6, None))
+        self.assertAlmostEqual(fetch['total'], 1.6)
+
+        output = io.StringIO()
+        stats.print_summary(file=output)
+        self.assertIn('p50=-', output.getvalue())
+        self.assertNotIn('Histogram', output.getvalue())
+
+    def test_hooks_receive_every_event(self):
+        events = []
+        stats = Stats()
+        stats.add_hook(events.append)
+        with stats.span('post_process', 'rfc1'):
+            pass
+        stats.incr('retries')
+        stats.remove_hook(events.append)
+        stats.incr('retries')
+
+        self.assertEqual([event['type'] for event in events], ['span', 'counter'])
+        self.assertEqual(events[0]['phase'], 'post_process')
+        self.assertEqual(events[0]['id'], 'rfc1')
+        self.assertEqual(events[1], {'type': 'counter', 'name': 'retries', 'increment': 1})
+
+    def test_trace_is_written_in_trace_event_format(self):
+        stats = Stats()
+        stats.add_span('fetch', 'rfc1', 0.5, 0.25)
+        stats.incr('cache_misses')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'trace.json')
+            stats.write_trace(filename)
+            with open(filename) as f:
+                trace = json.load(f)
+
+        event, = trace['traceEvents']
+        self.assertEqual((event['name'], event['ph'], event['ts'], event['dur']), ('fetch', 'X', 500000, 250000))
+        self.assertEqual(event['args'], {'id': 'rfc1'})
+        self.assertEqual(trace['counters'], {'cache_misses': 1})
+
+
+class RFCBibtexStatsTestCase(unittest.TestCase):
+
+    def test_phases_are_recorded_per_id(self):
+        events = []
+        rfc_bibtex = RFCBibtex(['rfc1', 'draft-a-01', 'rfc2'], backend=fake_datatracker(missing=('rfc2',)))
+        rfc_bibtex.add_hook(events.append)
+        with open(os.devnull, 'w') as devnull:
+            rfc_bibtex._generate_bibtex(devnull)
+
+        spans = {(event['phase'], event['id']) for event in events if event['type'] == 'span'}
+        self.assertEqual(spans, {('fetch', 'rfc1'), ('fetch', 'draft-a-01'), ('fetch', 'rfc2'),
+                                 ('post_process', 'rfc1'), ('post_process', 'draft-a-01'),
+                                 ('write', 'rfc1'), ('write', 'draft-a-01')})
+        self.assertEqual(rfc_bibtex.stats.counters, {'fetch_errors': 1})
+
+    def test_connections_and_requests_are_recorded(self):
+        with FakeDatatracker() as fake:
+            stats = Stats()
+            fetcher = Fetcher(scheduler=RequestScheduler(rate=None, stats=stats), stats=stats)
+            rfc_bibtex = RFCBibtex(['rfc1', 'rfc2', 'rfc3'], fetcher=fetcher, backend=MirrorBackend(fake.base_url))
+            self.assertIs(rfc_bibtex.stats, stats)
+            self.assertEqual(len(list(rfc_bibtex.bibtex_entries)), 3)
+            fetcher.close()
+
+        counters = stats.counters
+        self.assertEqual(counters['requests_sent'], 3)
+        self.assertEqual(counters['connections_opened'], 1)
+        self.assertEqual(counters['connections_reused'], 2)
+        phases = stats.summary()['phases']
+        self.assertEqual(phases['connect']['count'], 1)
+        self.assertEqual(phases['request']['count'], 3)
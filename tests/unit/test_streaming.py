@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+
+from rfc_bibtex.fetcher import Fetcher
+from rfc_bibtex.idset import IdSet
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from .base import fake_datatracker, fake_response
+
+class IdSetTestCase(unittest.TestCase):
+
+    def test_ids_are_compared_case_insensitively(self):
+        ids = IdSet(['rfc1'])
+        self.assertEqual([ids.add(id_name) for id_name in ('RFC1', 'rfc8', 'rfc0008', 'draft-a', 'DRAFT-A', 'rfc-1')],
+                         [False, True, True, True, False, True])
+        self.assertIn('Rfc8', ids)
+        self.assertIn('draft-A', ids)
+        self.assertNotIn('rfc9', ids)
+        self.assertNotIn('rfc123456', ids)
+        self.assertEqual(len(ids), 5)
+
+class StreamedIdsTestCase(unittest.TestCase):
+
+    def stdin(self, lines, consumed):
+        """Lines of stdin, counting in consumed how many have been read"""
+        for line in lines:
+            consumed.append(line)
+            yield line + '\n'
+
+    def test_ids_are_fetched_as_they_are_read(self):
+        consumed = []
+        first_fetch = []
+
+        def respond(name):
+            first_fetch.append(len(consumed))
+            return fake_response(name)
+
+        lines = ['rfc{}'.format(number % 500 + 1) for number in range(5000)]
+        with patch('sys.stdin', self.stdin(lines, consumed)):
+            rfc_bibtex = RFCBibtex(['rfc1'], ['-'], fetcher=Fetcher(jobs=2), backend=fake_datatracker(default=respond))
+            entries = list(rfc_bibtex.bibtex_entries)
+
+        self.assertEqual(len(entries), 500)
+        self.assertEqual(len(consumed), 5000)
+        self.assertLess(first_fetch[0], 100)
+        self.assertEqual(len(rfc_bibtex.backend.requests), 500)
+
+    def test_spellings_are_coalesced_while_they_are_recent(self):
+        with patch('sys.stdin', self.stdin(['rfc1', 'RFC-1', 'rfc2', 'rfc3', 'rfc_1', 'nothing'], [])):
+            rfc_bibtex = RFCBibtex(in_file_names=['-'], backend=fake_datatracker())
+            rfc_bibtex.STREAM_SHARED_DOCUMENTS = 2
+            keys = [entry.split(',')[0] for entry in rfc_bibtex.bibtex_entries]
+
+        self.assertEqual(keys, ['@misc{rfc1', '@misc{RFC-1', '@misc{rfc2', '@misc{rfc3', '@misc{rfc_1'])
+        # rfc_1 comes too late to be coalesced
+        self.assertEqual(rfc_bibtex.stats.counters['coalesced'], 1)
+        self.assertEqual(rfc_bibtex.backend.requests.count('https://datatracker.ietf.org/doc/rfc1/bibtex/'), 2)
+        self.assertEqual([record.id_name for record in rfc_bibtex.errors.get(rfc_bibtex.errors.INVALID_ID)], ['nothing'])
@@ -0,0 +1,57 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from rfc_bibtex.utils import atomic_open
+
+class AtomicOpenTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.filename = os.path.join(self._tmp_dir.name, 'refs.bib')
+        with open(self.filename, 'w') as f:
+            f.write('old')
+
+    def test_file_is_replaced_on_success(self):
+        with atomic_open(self.filename) as f:
+            f.write('new')
+            with open(self.filename) as current:
+                self.assertEqual(current.read(), 'old')
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertEqual(os.listdir(self._tmp_dir.name), ['refs.bib'])
+
+    def test_permissions_are_kept(self):
+        os.chmod(self.filename, 0o640)
+        with atomic_open(self.filename) as f:
+            f.write('new')
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0o640)
+
+        # new files get the ones of open()
+        new_filename = os.path.join(self._tmp_dir.name, 'new.bib')
+        with atomic_open(new_filename) as f:
+            f.write('new')
+        with open(os.path.join(self._tmp_dir.name, 'opened.bib'), 'w') as f:
+            pass
+        self.assertEqual(stat.S_IMODE(os.stat(new_filename).st_mode), stat.S_IMODE(os.stat(f.name).st_mode))
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), 'requires symbolic links')
+    def test_symbolic_links_are_kept(self):
+        link = os.path.join(self._tmp_dir.name, 'link.bib')
+        os.symlink(self.filename, link)
+        with atomic_open(link) as f:
+            f.write('new')
+        self.assertTrue(os.path.islink(link))
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertEqual(sorted(os.listdir(self._tmp_dir.name)), ['link.bib', 'refs.bib'])
+
+    def test_file_is_untouched_on_failure(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.filename) as f:
+                f.write('new')
+                raise RuntimeError()
+        with open(self.filename) as f:
+            self.assertEqual(f.read(), 'old')
+        self.assertEqual(os.listdir(self._tmp_dir.name), ['refs.bib'])
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+import urllib.error
+from contextlib import redirect_stderr
+from io import StringIO
+
+from rfc_bibtex.rfc_bibtex import RFCBibtex
+from rfc_bibtex.watch import Watcher
+from .base import fake_datatracker, fake_response
+
+class FlakyResponses(object):
+    """Default responses of a fake datatracker, which fail with a network error while down is set"""
+    down = False
+
+    def __init__(self, missing=()):
+        self.missing = missing
+
+    def __call__(self, name):
+        if self.down:
+            raise urllib.error.URLError('timed out')
+        return 404 if name in self.missing else fake_response(name)
+
+class WatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.out_file = self.path('refs.bib')
+
+    def path(self, name):
+        return os.path.join(self._tmp_dir.name, name)
+
+    def write(self, name, content):
+        with open(self.path(name), 'w') as f:
+            f.write(content)
+
+    def refresh(self, watcher):
+        with redirect_stderr(StringIO()):
+            return watcher.refresh()
+
+    def keys(self):
+        with open(self.out_file) as f:
+            return [line[len('@misc{'):].rstrip(',\n') for line in f if line.startswith('@')]
+
+    def test_only_new_ids_are_fetched(self):
+        self.write('intro.tex', '\\cite{rfc2}')
+        self.write('paper.tex', '\\cite{rfc1}\n\\input{intro}')
+        rfc_bibtex = RFCBibtex(['rfc3'], out_file_name=self.out_file, backend=fake_datatracker(missing=('rfc404',)))
+        watcher = Watcher(rfc_bibtex, [self.path('paper.tex')])
+
+        self.assertTrue(self.refresh(watcher))
+        self.assertEqual(self.keys(), ['rfc3', 'rfc1', 'rfc2'])
+        self.assertEqual(len(rfc_bibtex.backend.requests), 3)
+        self.assertFalse(self.refresh(watcher))
+
+        # a change to an included file is noticed, only its new ids are fetched
+        self.write('intro.tex', '\\cite{rfc404, rfc4}')
+        self.assertTrue(self.refresh(watcher))
+        self.assertEqual(self.keys(), ['rfc3', 'rfc1', 'rfc4'])
+        self.assertEqual(rfc_bibtex.backend.requests[3:], ['https://datatracker.ietf.org/doc/rfc404/bibtex/',
+                                                           'https://datatracker.ietf.org/doc/rfc4/bibtex/'])
+        self.assertEqual(rfc_bibtex.urllib_errors, ['https://datatracker.ietf.org/doc/rfc404/bibtex/'])
+
+        # removed ids are kept in memory, and ids which failed are not fetched again
+        self.write('intro.tex', '\\cite{rfc404,rfc2}')
+        self.assertTrue(self.refresh(watcher))
+        self.assertEqual(self.keys(), ['rfc3', 'rfc1', 'rfc2'])
+        self.assertEqual(len(rfc_bibtex.backend.requests), 5)
+
+    def test_transient_failures_are_tried_again(self):
+        self.write('ids.txt', 'rfc1\nrfc404\nnothing\n')
+        responses = FlakyResponses(missing=('rfc404',))
+        responses.down = True
+        rfc_bibtex = RFCBibtex(out_file_name=self.out_file, backend=fake_datatracker(default=responses))
+        watcher = Watcher(rfc_bibtex, [self.path('ids.txt')])
+        self.refresh(watcher)
+        self.assertEqual(len(rfc_bibtex.backend.requests), 2)
+
+        responses.down = False
+        self.assertTrue(self.refresh(watcher))
+        self.assertEqual(self.keys(), ['rfc1'])
+        self.assertEqual(rfc_bibtex.backend.requests[2:], ['https://datatracker.ietf.org/doc/rfc1/bibtex/',
+                                                           'https://datatracker.ietf.org/doc/rfc404/bibtex/'])
+
+        # the ids which do not exist are not fetched again
+        self.assertFalse(self.refresh(watcher))
+        self.assertEqual(len(rfc_bibtex.backend.requests), 4)
+
+    def test_unchanged_inputs_are_not_scanned_again(self):
+        self.write('a.txt', 'rfc1\n')
+        self.write('b.txt', 'rfc2\n')
+        rfc_bibtex = RFCBibtex(out_file_name=self.out_file, backend=fake_datatracker())
+        watcher = Watcher(rfc_bibtex, [self.path('a.txt'), self.path('b.txt')])
+        self.refresh(watcher)
+
+        scanned = []
+        read_ids_from_file = rfc_bibtex._read_ids_from_file
+        rfc_bibtex._read_ids_from_file = lambda name, inputs: scanned.append(name) or read_ids_from_file(name, inputs)
+        self.write('b.txt', 'rfc2\nrfc3\n')
+        self.refresh(watcher)
+        self.assertEqual(scanned, [self.path('b.txt')])
+        self.assertEqual(self.keys(), ['rfc1', 'rfc2', 'rfc3'])
+
+    def test_existing_output_is_reused_when_updating(self):
+        self.write('refs.bib', '@misc{rfc1,\n\ttitle = {{Kept}},\n}\n')
+        self.write('ids.txt', 'rfc1\nrfc2\n')
+        rfc_bibtex = RFCBibtex(out_file_name=self.out_file, update=True, backend=fake_datatracker())
+        watcher = Watcher(rfc_bibtex, [self.path('ids.txt')])
+        self.refresh(watcher)
+
+        self.assertEqual(rfc_bibtex.backend.requests, ['https://datatracker.ietf.org/doc/rfc2/bibtex/'])
+        with open(self.out_file) as f:
+            self.assertIn('{{Kept}}', f.read())